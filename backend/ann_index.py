@@ -0,0 +1,426 @@
+"""
+Approximate nearest-neighbour index over profile embeddings.
+IVF-flat: vectors are bucketed by their nearest k-means centroid and a query
+only scans the closest few buckets instead of every user. Centroids are
+retrained in the background once the index outgrows its single exact bucket or
+its buckets become lopsided.
+"""
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from models import User, UserEmbedding
+from match_engine import select_top_k
+from config import settings
+
+
+class _InvertedList:
+    """One IVF bucket: user IDs plus a growable matrix of their vectors."""
+
+    def __init__(self, dim: int):
+        self.ids: List[int] = []
+        self.vectors = np.zeros((16, dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, user_id: int, vector: np.ndarray) -> int:
+        position = len(self.ids)
+        if position == len(self.vectors):
+            grown = np.zeros((len(self.vectors) * 2, self.vectors.shape[1]), dtype=np.float32)
+            grown[:position] = self.vectors
+            self.vectors = grown
+        self.ids.append(user_id)
+        self.vectors[position] = vector
+        return position
+
+    def remove(self, position: int) -> Optional[int]:
+        """Swap-remove the entry at position. Returns the ID that moved into it, if any."""
+        last = len(self.ids) - 1
+        moved = None
+        if position != last:
+            moved = self.ids[last]
+            self.ids[position] = moved
+            self.vectors[position] = self.vectors[last]
+        self.ids.pop()
+        return moved
+
+
+def _kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors. Returns unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for cluster in range(n_clusters):
+            members = vectors[assignment == cluster]
+            if len(members):
+                centroids[cluster] = members.sum(axis=0)
+            else:
+                # Re-seed empty clusters so every bucket stays useful
+                centroids[cluster] = vectors[rng.integers(len(vectors))]
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids = centroids / np.where(norms > 0, norms, 1.0)
+    return centroids.astype(np.float32)
+
+
+class IVFFlatIndex:
+    """
+    Inverted-file index with exact (flat) scoring inside each probed bucket.
+    Vectors must be unit-normalized so inner product equals cosine similarity.
+    """
+
+    def __init__(self, dim: int, centroids: Optional[np.ndarray] = None):
+        self.dim = dim
+        self.centroids = centroids if centroids is not None else np.zeros((1, dim), dtype=np.float32)
+        self.lists = [_InvertedList(dim) for _ in range(len(self.centroids))]
+        self.locations: Dict[int, Tuple[int, int]] = {}
+        self.watermark: Optional[datetime] = None  # Latest embedding update reflected in the index
+        self.trained_size = 0  # Vectors indexed when the centroids were last trained
+        self.writes_since_training = 0
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.locations
+
+    @classmethod
+    def build(cls, ids: np.ndarray, vectors: np.ndarray) -> "IVFFlatIndex":
+        """
+        Train centroids on the given vectors and insert all of them.
+        Small collections get a single bucket, which is an exact flat index.
+        """
+        dim = vectors.shape[1] if vectors.ndim == 2 and len(vectors) else 0
+        index = cls(dim, _train_centroids(vectors))
+        index._bulk_insert(ids, vectors, index._assign(vectors))
+        index.trained_size = len(index)
+        return index
+
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Copy out every indexed (user ID, vector) pair."""
+        with self.lock:
+            ids = np.array(list(self.locations.keys()), dtype=np.int64)
+            vectors = np.zeros((len(ids), self.dim), dtype=np.float32)
+            for row, user_id in enumerate(ids):
+                list_no, position = self.locations[int(user_id)]
+                vectors[row] = self.lists[list_no].vectors[position]
+        return ids, vectors
+
+    def needs_retrain(self) -> bool:
+        """
+        Whether the centroids no longer fit the data: the index has grown past
+        ANN_MIN_TRAIN_SIZE on a single bucket, or its largest bucket holds more
+        than ANN_REBALANCE_FACTOR times the mean. Rebalancing waits for writes
+        of a quarter of the index since the last training, so data that is
+        inherently clustered does not retrain in a loop.
+        """
+        with self.lock:
+            if len(self) < settings.ANN_MIN_TRAIN_SIZE:
+                return False
+            if len(self.centroids) == 1:
+                return True
+            if self.writes_since_training < self.trained_size / 4:
+                return False
+            largest = max(len(bucket) for bucket in self.lists)
+            return largest > settings.ANN_REBALANCE_FACTOR * len(self) / len(self.lists)
+
+    def retrain(self):
+        """
+        Retrain centroids on the current contents and re-bucket every vector.
+        Training runs without the lock; vectors written meanwhile are picked up
+        when the buckets are rebuilt.
+        """
+        _, vectors = self.snapshot()
+        centroids = _train_centroids(vectors)
+        if centroids is None:
+            return
+        with self.lock:
+            ids, vectors = self.snapshot()
+            self.centroids = centroids
+            self.lists = [_InvertedList(self.dim) for _ in range(len(centroids))]
+            self.locations = {}
+            self._bulk_insert(ids, vectors, self._assign(vectors))
+            self.trained_size = len(self)
+            self.writes_since_training = 0
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        """Nearest centroid for every row, computed in chunks to bound memory."""
+        if len(self.centroids) == 1:
+            return np.zeros(len(vectors), dtype=np.int64)
+        return np.concatenate([
+            np.argmax(vectors[start:start + chunk_size] @ self.centroids.T, axis=1)
+            for start in range(0, len(vectors), chunk_size)
+        ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+    def _bulk_insert(self, ids: np.ndarray, vectors: np.ndarray, assignments: np.ndarray):
+        with self.lock:
+            for user_id, vector, list_no in zip(ids, vectors, assignments):
+                user_id = int(user_id)
+                self.delete(user_id)
+                position = self.lists[int(list_no)].append(user_id, vector)
+                self.locations[user_id] = (int(list_no), position)
+
+    def _nearest_lists(self, vector: np.ndarray, count: int) -> np.ndarray:
+        similarities = self.centroids @ vector
+        count = min(count, len(similarities))
+        if count == len(similarities):
+            return np.argsort(-similarities)
+        nearest = np.argpartition(-similarities, count - 1)[:count]
+        return nearest[np.argsort(-similarities[nearest])]
+
+    def upsert(self, user_id: int, vector: np.ndarray, updated_at: Optional[datetime] = None):
+        """
+        Insert a vector, replacing any previous vector for the same user.
+        updated_at (the embedding's timestamp) advances the watermark, so a saved
+        index reloads without replaying the write.
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        with self.lock:
+            self.delete(user_id)
+            list_no = int(self._nearest_lists(vector, 1)[0]) if len(self.centroids) > 1 else 0
+            position = self.lists[list_no].append(user_id, vector)
+            self.locations[user_id] = (list_no, position)
+            self.writes_since_training += 1
+            if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+
+    def delete(self, user_id: int) -> bool:
+        """Remove a user from the index. Returns False if it was not indexed."""
+        with self.lock:
+            location = self.locations.pop(user_id, None)
+            if location is None:
+                return False
+            list_no, position = location
+            moved = self.lists[list_no].remove(position)
+            if moved is not None:
+                self.locations[moved] = (list_no, position)
+            return True
+
+    def search(self, vector: np.ndarray, k: int, exclude_user_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Find the k most similar vectors.
+
+        Args:
+            vector: Unit-normalized query vector
+            k: Number of neighbours to return
+            exclude_user_id: Optional user ID to leave out (usually the requester)
+
+        Returns:
+            List of (user_id, cosine similarity) tuples, most similar first
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        with self.lock:
+            probed = self._nearest_lists(vector, settings.ANN_NPROBE) if len(self.centroids) > 1 else [0]
+            ids: List[int] = []
+            blocks = []
+            for list_no in probed:
+                bucket = self.lists[list_no]
+                if len(bucket):
+                    ids.extend(bucket.ids)
+                    blocks.append(bucket.vectors[:len(bucket)])
+            if not blocks:
+                return []
+            similarities = np.vstack(blocks) @ vector
+
+        return select_top_k(np.array(ids, dtype=np.int64), similarities.astype(np.float64), k, exclude_user_id)
+
+    def save(self, path: str):
+        """Write the index to path atomically so readers never see a partial file."""
+        with self.lock:
+            ids, vectors = self.snapshot()
+            assignments = np.array([self.locations[int(user_id)][0] for user_id in ids], dtype=np.int64)
+            centroids = self.centroids
+            watermark = self.watermark.isoformat() if self.watermark else ""
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                centroids=centroids,
+                ids=ids,
+                vectors=vectors,
+                assignments=assignments,
+                watermark=np.array(watermark)
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFFlatIndex":
+        """Load an index written by save()."""
+        with np.load(path) as data:
+            centroids = data["centroids"]
+            index = cls(centroids.shape[1], centroids)
+            index._bulk_insert(data["ids"], data["vectors"], data["assignments"])
+            index.trained_size = len(index)
+            watermark = str(data["watermark"])
+        index.watermark = datetime.fromisoformat(watermark) if watermark else None
+        return index
+
+
+def _train_centroids(vectors: np.ndarray) -> Optional[np.ndarray]:
+    """k-means centroids for a collection, or None (single bucket) below ANN_MIN_TRAIN_SIZE."""
+    if len(vectors) < settings.ANN_MIN_TRAIN_SIZE:
+        return None
+    n_lists = int(min(4096, max(1, np.sqrt(len(vectors)))))
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), n_lists * 256), replace=False)]
+    return _kmeans(sample, n_lists)
+
+
+# Process-wide index, loaded lazily by get_index()
+_index: Optional[IVFFlatIndex] = None
+_index_lock = threading.Lock()
+_retrain_thread: Optional[threading.Thread] = None
+
+
+def _retrain_in_background():
+    try:
+        started = len(_index)
+        _index.retrain()
+        print(f"[ANN] Retrained index on {started} vectors into {len(_index.centroids)} buckets")
+        save_index()
+    except Exception as e:
+        print(f"[ANN] Retraining failed: {e}")
+
+
+def _maybe_retrain():
+    """Start a background retrain if the loaded index has outgrown its centroids."""
+    global _retrain_thread
+    if _index is None or (_retrain_thread is not None and _retrain_thread.is_alive()):
+        return
+    if _index.needs_retrain():
+        _retrain_thread = threading.Thread(target=_retrain_in_background, name="ann-retrain", daemon=True)
+        _retrain_thread.start()
+
+
+def _verified_embeddings_query(db: Session):
+    return db.query(UserEmbedding.user_id, UserEmbedding.embedding, UserEmbedding.updated_at).join(
+        User, User.id == UserEmbedding.user_id
+    ).filter(User.is_verified == True)
+
+
+def _catch_up(db: Session, index: IVFFlatIndex):
+    """Apply embeddings written since the index watermark (e.g. by other workers)."""
+    query = _verified_embeddings_query(db)
+    if index.watermark:
+        query = query.filter(UserEmbedding.updated_at > index.watermark)
+    for user_id, embedding, updated_at in query.all():
+        index.upsert(user_id, np.frombuffer(embedding, dtype=np.float32), updated_at)
+
+
+def get_index(db: Session) -> Optional[IVFFlatIndex]:
+    """
+    Get the process-wide ANN index, loading it from ANN_INDEX_PATH or building
+    it from the user_embeddings table on first use.
+
+    Args:
+        db: Database session
+
+    Returns:
+        The index, or None if there are no embeddings yet
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            path = settings.ANN_INDEX_PATH
+            if path and os.path.exists(path):
+                try:
+                    _index = IVFFlatIndex.load(path)
+                    _catch_up(db, _index)
+                    print(f"[ANN] Loaded index with {len(_index)} vectors from {path}")
+                    _maybe_retrain()
+                except Exception as e:
+                    print(f"[ANN] Could not load index from {path}: {e}")
+                    _index = None
+
+            if _index is None:
+                rows = _verified_embeddings_query(db).all()
+                if not rows:
+                    return None
+                ids = np.array([row[0] for row in rows], dtype=np.int64)
+                vectors = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+                _index = IVFFlatIndex.build(ids, vectors)
+                _index.watermark = max((row[2] for row in rows if row[2]), default=None)
+                print(f"[ANN] Built index with {len(_index)} vectors")
+                save_index()
+
+        return _index
+
+
+def save_index():
+    """Persist the process-wide index to ANN_INDEX_PATH, if one is loaded."""
+    if _index is None or not settings.ANN_INDEX_PATH:
+        return
+    try:
+        _index.save(settings.ANN_INDEX_PATH)
+    except Exception as e:
+        print(f"[ANN] Could not save index: {e}")
+
+
+def index_user(db: Session, user_id: int, vector: Optional[np.ndarray] = None):
+    """
+    Insert or refresh a user in the loaded index if they are verified.
+    Called when a profile is re-embedded or a user gets verified.
+    Does nothing until the index has been loaded by a query.
+    """
+    if _index is None:
+        return
+
+    user = db.query(User.is_verified).filter(User.id == user_id).first()
+    if not user or not user.is_verified:
+        _index.delete(user_id)
+        return
+
+    stored = db.query(UserEmbedding.embedding, UserEmbedding.updated_at).filter(UserEmbedding.user_id == user_id).first()
+    if vector is None:
+        if not stored:
+            return
+        vector = np.frombuffer(stored.embedding, dtype=np.float32)
+
+    _index.upsert(user_id, vector, stored.updated_at if stored else None)
+    _maybe_retrain()
+
+
+def index_users(db: Session, user_ids: List[int]):
+    """Bulk version of index_user for freshly embedded profiles."""
+    if _index is None or not user_ids:
+        return
+    rows = _verified_embeddings_query(db).filter(UserEmbedding.user_id.in_(user_ids)).all()
+    for user_id, embedding, updated_at in rows:
+        _index.upsert(user_id, np.frombuffer(embedding, dtype=np.float32), updated_at)
+    _maybe_retrain()
+
+
+def unindex_user(user_id: int):
+    """Remove a user from the loaded index."""
+    if _index is not None:
+        _index.delete(user_id)
+
+
+def apply_changes(db: Session, user_ids: List[int]):
+    """Re-read changed users and update the loaded index (used by the change feed)."""
+    if _index is None or not user_ids:
+        return
+    index_users(db, user_ids)
+    verified = {row[0] for row in db.query(User.id).filter(User.id.in_(user_ids), User.is_verified == True).all()}
+    for user_id in set(user_ids) - verified:
+        _index.delete(user_id)
+
+
+def resync(db: Session):
+    """
+    Bring the loaded index back in line with the database after changes may
+    have been missed: apply newer embeddings and drop users no longer verified.
+    """
+    if _index is None:
+        return
+    _catch_up(db, _index)
+    _maybe_retrain()
+    verified = {row[0] for row in db.query(User.id).filter(User.is_verified == True).all()}
+    with _index.lock:
+        for user_id in [user_id for user_id in _index.locations if user_id not in verified]:
+            _index.delete(user_id)
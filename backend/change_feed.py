@@ -0,0 +1,231 @@
+"""
+Change feed for in-memory indexes and caches.
+Triggers on users and user_embeddings NOTIFY the user_changes channel (see
+database/migration_add_user_change_feed.sql); a listener thread in each worker
+applies the changed rows to the LSH and ANN indexes it has loaded. Event writes
+NOTIFY event_changes, which invalidates this worker's cached feed pages (and,
+for RSVPs, the user's event recommendations), and real-time events published
+through pubsub arrive on realtime_events.
+Handlers run on a separate apply thread, so a slow resync never holds up
+real-time delivery.
+"""
+import json
+import queue
+import select
+import threading
+import time
+from functools import partial
+from typing import Callable, List, Optional, Set
+from sqlalchemy.orm import Session
+from database import SessionLocal, engine
+from ann_index import apply_changes as ann_apply_changes, resync as ann_resync
+from minhash import lsh_apply_changes, reset_lsh_index
+from feed_cache import EVENT_CHANNEL, EventChange, feed_cache
+from event_recommendations import invalidate_event_matrix, invalidate_user as invalidate_event_recommendations
+from pubsub import REALTIME_CHANNEL, broker
+
+CHANNEL = "user_changes"
+
+# How long to keep collecting notifications before applying them as one batch
+COALESCE_SECONDS = 0.05
+
+# Idle time after which the connection is pinged to detect silent drops
+KEEPALIVE_SECONDS = 30.0
+
+MAX_RECONNECT_DELAY_SECONDS = 30.0
+
+
+def _apply_changes(db: Session, user_ids: List[int]):
+    lsh_apply_changes(db, user_ids)
+    ann_apply_changes(db, user_ids)
+    for user_id in user_ids:
+        invalidate_event_recommendations(user_id)
+
+
+def _resync(db: Session):
+    # The LSH index is cheap to rebuild from stored signatures; the ANN index catches up in place
+    reset_lsh_index()
+    ann_resync(db)
+    feed_cache.clear()
+    invalidate_event_matrix()
+    # Real-time events sent while we were not listening are lost; clients refetch
+    broker.broadcast_local("resync", {})
+
+
+def _invalidate_feed(changes: List[EventChange]):
+    for change in changes:
+        feed_cache.invalidate(change)
+    if any(change.new_time is not None or change.old_time is not None for change in changes):
+        invalidate_event_matrix()
+
+
+def _invalidate_rsvp_rankings(changes: List[EventChange]):
+    # An RSVP changes the user's history and the events they are excluded from
+    for change in changes:
+        if change.user_id is not None:
+            invalidate_event_recommendations(change.user_id)
+
+
+# Called with (db, user_ids) for every batch of changes, and with (db) on resync
+change_handlers: List[Callable[[Session, List[int]], None]] = [_apply_changes]
+resync_handlers: List[Callable[[Session], None]] = [_resync]
+
+# Called with the batch of event writes from the event_changes channel
+event_change_handlers: List[Callable[[List[EventChange]], None]] = [_invalidate_feed, _invalidate_rsvp_rankings]
+
+
+class ChangeFeedListener(threading.Thread):
+    """
+    Background thread that LISTENs for changes. Real-time events are dispatched
+    as they arrive; everything else is queued for the apply thread, in order.
+    """
+
+    def __init__(self):
+        super().__init__(name="change-feed", daemon=True)
+        self._stopped = threading.Event()
+        self._connection = None
+        self._work: "queue.Queue[Optional[Callable[[], None]]]" = queue.Queue()
+        self._applier = threading.Thread(target=self._apply_work, name="change-feed-apply", daemon=True)
+
+    def stop(self):
+        self._stopped.set()
+        self._work.put(None)
+
+    def _apply_work(self):
+        while True:
+            work = self._work.get()
+            if work is None:
+                break
+            work()
+
+    def run(self):
+        self._applier.start()
+        delay = 1.0
+        while not self._stopped.is_set():
+            try:
+                self._connection = self._connect()
+                # Anything changed while we were not listening was missed
+                self._work.put(partial(self._run_handlers, resync_handlers))
+                print(f"[CHANGE FEED] Listening on {CHANNEL}")
+                delay = 1.0
+                self._listen()
+            except Exception as e:
+                if self._stopped.is_set():
+                    break
+                print(f"[CHANGE FEED] Connection lost ({e}); reconnecting in {delay:.0f}s")
+            finally:
+                self._close()
+            self._stopped.wait(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY_SECONDS)
+
+    def _connect(self):
+        # A dedicated connection outside the pool: it is held open for the life of the listener
+        pooled = engine.raw_connection()
+        connection = pooled.driver_connection
+        pooled.detach()
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+            cursor.execute(f"LISTEN {EVENT_CHANNEL}")
+            cursor.execute(f"LISTEN {REALTIME_CHANNEL}")
+        return connection
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+    def _listen(self):
+        connection = self._connection
+        last_activity = time.monotonic()
+        while not self._stopped.is_set():
+            ready, _, _ = select.select([connection], [], [], 1.0)
+            if not ready:
+                if time.monotonic() - last_activity > KEEPALIVE_SECONDS:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    last_activity = time.monotonic()
+                continue
+
+            # Coalesce a burst of notifications into one batch
+            user_ids: Set[int] = set()
+            event_changes: List[EventChange] = []
+            deadline = time.monotonic() + COALESCE_SECONDS
+            while True:
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    if notify.channel == REALTIME_CHANNEL:
+                        # Latency-sensitive, so delivered right away rather than batched or queued
+                        broker.dispatch(notify.payload)
+                    elif notify.channel == EVENT_CHANNEL:
+                        event_changes.extend(_parse_event_change(notify.payload))
+                    else:
+                        user_ids.update(_parse(notify.payload))
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([connection], [], [], remaining)[0]:
+                    break
+
+            last_activity = time.monotonic()
+            if user_ids:
+                self._work.put(partial(self._run_handlers, change_handlers, sorted(user_ids)))
+            if event_changes:
+                self._work.put(partial(self._run_event_handlers, event_changes))
+
+    def _run_event_handlers(self, event_changes: List[EventChange]):
+        for handler in event_change_handlers:
+            try:
+                handler(event_changes)
+            except Exception as e:
+                print(f"[CHANGE FEED] Handler {handler.__name__} failed: {e}")
+
+    def _run_handlers(self, handlers: list, *args):
+        db = SessionLocal()
+        try:
+            for handler in handlers:
+                try:
+                    handler(db, *args)
+                except Exception as e:
+                    db.rollback()
+                    print(f"[CHANGE FEED] Handler {handler.__name__} failed: {e}")
+        finally:
+            db.close()
+
+
+def _parse(payload: str) -> List[int]:
+    """Extract the user ID from a notification payload ({"table", "op", "id"})."""
+    try:
+        return [int(json.loads(payload)["id"])]
+    except (ValueError, KeyError, TypeError):
+        print(f"[CHANGE FEED] Ignoring malformed payload: {payload!r}")
+        return []
+
+
+def _parse_event_change(payload: str) -> List[EventChange]:
+    try:
+        return [EventChange.from_payload(payload)]
+    except (ValueError, KeyError, TypeError):
+        print(f"[CHANGE FEED] Ignoring malformed payload: {payload!r}")
+        return []
+
+
+_listener = None
+
+
+def start_change_feed():
+    """Start this worker's listener thread (idempotent)."""
+    global _listener
+    if _listener is None or not _listener.is_alive():
+        _listener = ChangeFeedListener()
+        _listener.start()
+
+
+def stop_change_feed():
+    """Stop this worker's listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
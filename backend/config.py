@@ -3,7 +3,7 @@ Configuration settings for the backend application.
 Loads environment variables from .env file.
 """
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -23,6 +23,73 @@ class Settings(BaseSettings):
     
     # OpenAI
     OPENAI_API_KEY: Optional[str] = None
+    EMBEDDING_BATCH_SIZE: int = 100  # Profile texts per embeddings request
+    EMBEDDING_API_BASE_URL: Optional[str] = None  # OpenAI-compatible endpoint override (e.g. a local fake server)
+    EMBEDDING_MAX_CONCURRENCY: int = 4  # Embeddings requests in flight per worker
+    EMBEDDING_MAX_RETRIES: int = 3  # Retries for rate limits, 5xx and network errors
+    EMBEDDING_BATCH_WAIT_MS: int = 10  # How long to wait for more texts before sending a partial batch
+    EMBEDDING_RETRY_SECONDS: int = 3600  # Profiles whose embedding failed are not retried for this long
+    EMBEDDING_BACKFILL_INTERVAL_SECONDS: int = 300  # Minimum time between background backfills per worker
+    
+    # Matching
+    MATCH_SCORING_MODE: str = "python"  # "python" (vectorized + cache) or "sql" (scored in PostgreSQL)
+    MATCH_CANDIDATE_SOURCE: str = "all"  # "all" verified users, or "lsh" interest-similar candidates only
+    
+    # Matching pipeline (see match_pipeline.py); stage names are comma-separated
+    MATCH_PIPELINE_SOURCES: Optional[str] = None  # Fallback chain, e.g. "lsh,cache,store,all"; unset = derived from the two settings above
+    MATCH_PIPELINE_FILTERS: str = "completed_profile,no_date_request"  # Same exclusions the "sql" source applies
+    MATCH_FEATURE_WEIGHTS: str = "school=0.4,year=0.2,interests=0.4"
+    MATCH_AI_SOURCES: str = "ann"
+    MATCH_AI_FEATURE_WEIGHTS: str = "embedding=1.0"
+    MATCH_RANKER: str = "weighted"
+    MATCH_PROFILING: bool = False  # Log per-stage timings of every matches request
+    MATCH_MAX_FETCH_LIMIT: int = 1000  # Most candidates a ranked source is asked for when filters leave a page short
+    
+    MATCH_SNAPSHOT_SIZE: int = 500  # Ranked candidates kept per /api/matches/browse snapshot
+    MATCH_SNAPSHOT_TTL_SECONDS: int = 900  # Cursors into a snapshot expire after this
+    
+    # MinHash / LSH: bands x rows are chosen for LSH_THRESHOLD unless both LSH_BANDS and LSH_ROWS are set
+    # (their product must equal MINHASH_NUM_PERM); check with `python minhash.py recall`
+    MINHASH_NUM_PERM: int = 96
+    LSH_THRESHOLD: float = 0.2  # Jaccard similarity candidates should reach, e.g. 1 shared interest out of 3 each
+    LSH_BANDS: Optional[int] = None
+    LSH_ROWS: Optional[int] = None
+    
+    # Recommendation cache (matches table)
+    RECOMMENDATION_CACHE_SIZE: int = 50  # Top-K stored per user
+    RECOMMENDATION_REFRESH_DEBOUNCE_SECONDS: float = 5.0  # Quiet period before a refresh runs
+    RECOMMENDATION_RECOMPUTE_WORKERS: int = 2  # Threads rebuilding dirty lists in the background
+    
+    # Memory-mapped feature store shared by all workers
+    FEATURE_STORE_DIR: str = "feature_store"
+    FEATURE_STORE_MAX_AGE_SECONDS: int = 300  # Older stores are rebuilt in the background
+    FEATURE_STORE_EMBEDDINGS: bool = False  # Also store profile embeddings
+    
+    # Events feed
+    EVENT_ARCHIVE_AFTER_HOURS: int = 24  # Events this long past are archived out of the upcoming feed
+    EVENT_FEED_CACHE_FRESH_SECONDS: float = 30.0  # Cached feed pages are served as is this long
+    EVENT_FEED_CACHE_STALE_SECONDS: float = 300.0  # ...and then served stale while refreshing, up to this age
+    EVENT_FEED_CACHE_MAX_ENTRIES: int = 1000
+    
+    # Event recommendations (see event_recommendations.py)
+    EVENT_RECOMMENDATION_MATRIX_TTL_SECONDS: int = 300  # Upcoming-events matrix is rebuilt at least this often
+    EVENT_RECOMMENDATION_TTL_SECONDS: int = 600  # Per-user rankings are recomputed at least this often
+    EVENT_RECOMMENDATION_CACHE_SIZE: int = 100  # Events kept per cached ranking
+    EVENT_RECOMMENDATION_MAX_USERS: int = 10000  # Cached rankings per worker
+    
+    # LISTEN/NOTIFY change feed keeping in-memory indexes fresh (needs migration_add_user_change_feed.sql)
+    CHANGE_FEED_ENABLED: bool = True
+    
+    # Real-time fan-out: "postgres" (NOTIFY, reaches every worker; needs CHANGE_FEED_ENABLED) or "memory" (one worker)
+    REALTIME_BROKER: str = "postgres"
+    REALTIME_SESSION_SWEEP_SECONDS: int = 30  # How often sockets with expired tokens or removed accounts are disconnected
+    
+    # ANN index over profile embeddings
+    ANN_INDEX_PATH: str = "ann_index.npz"  # Saved index, loaded on worker boot
+    ANN_NPROBE: int = 8  # Buckets scanned per query
+    ANN_MIN_TRAIN_SIZE: int = 1000  # Below this, a single exact bucket is used
+    ANN_REBALANCE_FACTOR: float = 4.0  # Retrain when the largest bucket is this many times the mean
+    ANN_VERIFIED_COUNT_TTL_SECONDS: int = 60  # How often the ANN source re-counts verified users to spot unindexed ones
     
     # Google OAuth
     GOOGLE_CLIENT_ID: Optional[str] = None
@@ -35,6 +102,22 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     
+    @property
+    def allowed_origins(self) -> List[str]:
+        """Origins allowed by CORS for the API and Socket.IO: the frontend plus common Vite dev server ports."""
+        return [
+            self.FRONTEND_URL,
+            "http://localhost:5173",
+            "http://localhost:5174",
+            "http://localhost:5175",
+            "http://localhost:5176",
+            "http://localhost:3000",
+            "http://127.0.0.1:5173",
+            "http://127.0.0.1:5174",
+            "http://127.0.0.1:5175",
+            "http://127.0.0.1:5176",
+        ]
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,161 @@
+"""
+Server-side inbox and read state.
+Each user has one conversations row per partner pointing at their latest message,
+updated as messages are sent, so an inbox page reads one index range of
+conversations whatever the message count. Read state is one cursor per
+(reader, partner) in conversation_reads; a message is read when its ID is at or
+below the receiver's cursor.
+"""
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+from models import User, ConversationRead
+from pagination import check_limit, decode_cursor, encode_cursor
+
+# Walks idx_conversations_user_last_message backwards and stops after :limit rows
+_CONVERSATIONS_SQL = text("""
+    SELECT c.other_id, latest.id, latest.sender_id, latest.content, latest.created_at,
+           (SELECT count(*) FROM messages unread  -- Range scan on idx_messages_receiver_sender_id
+            WHERE unread.receiver_id = :user_id AND unread.sender_id = c.other_id
+              AND unread.id > COALESCE(reads.last_read_message_id, 0)) AS unread_count
+    FROM conversations c
+    JOIN messages latest ON latest.id = c.last_message_id
+    LEFT JOIN conversation_reads reads ON reads.user_id = :user_id AND reads.other_id = c.other_id
+    WHERE c.user_id = :user_id
+      AND (CAST(:after_time AS TIMESTAMP) IS NULL OR (c.last_message_at, c.last_message_id) < (:after_time, :after_id))
+    ORDER BY c.last_message_at DESC, c.last_message_id DESC
+    LIMIT :limit
+""")
+
+# Point both participants' conversations at a new message. Rows are upserted in
+# user ID order so two users messaging each other at once cannot deadlock, and an
+# older message committed late never replaces a newer one.
+_RECORD_MESSAGE_SQL = text("""
+    INSERT INTO conversations (user_id, other_id, last_message_id, last_message_at)
+    SELECT side.user_id, side.other_id, m.id, m.created_at
+    FROM messages m
+    CROSS JOIN LATERAL (VALUES (m.sender_id, m.receiver_id), (m.receiver_id, m.sender_id)) AS side (user_id, other_id)
+    WHERE m.id = :message_id
+    ORDER BY side.user_id
+    ON CONFLICT (user_id, other_id) DO UPDATE SET
+        last_message_id = EXCLUDED.last_message_id,
+        last_message_at = EXCLUDED.last_message_at
+    WHERE (conversations.last_message_at, conversations.last_message_id)
+        < (EXCLUDED.last_message_at, EXCLUDED.last_message_id)
+""")
+
+# Advance the cursor to the newest message from other_id at or below :up_to; never moves it back
+_MARK_READ_SQL = text("""
+    INSERT INTO conversation_reads (user_id, other_id, last_read_message_id, updated_at)
+    SELECT :user_id, :other_id, max(id), now()
+    FROM messages
+    WHERE receiver_id = :user_id AND sender_id = :other_id AND (CAST(:up_to AS INTEGER) IS NULL OR id <= :up_to)
+    HAVING max(id) IS NOT NULL
+    ON CONFLICT (user_id, other_id) DO UPDATE SET
+        last_read_message_id = GREATEST(conversation_reads.last_read_message_id, EXCLUDED.last_read_message_id),
+        updated_at = EXCLUDED.updated_at
+    RETURNING last_read_message_id
+""")
+
+
+def get_conversations(db: Session, user_id: int, limit: int = 20, cursor: Optional[str] = None) -> dict:
+    """
+    Get one page of a user's conversations, most recently active first.
+
+    Args:
+        db: Database session
+        user_id: The viewing user's ID
+        limit: Page size
+        cursor: next_cursor from the previous page, or None for the first page
+
+    Returns:
+        Dict in ConversationPage shape: {"items": [...], "next_cursor": str or None}
+
+    Raises:
+        ValueError: If the cursor or limit is invalid
+    """
+    check_limit(limit)
+    after_time, after_id = decode_cursor(cursor, (datetime, int)) if cursor else (None, None)
+    rows = db.execute(_CONVERSATIONS_SQL, {
+        "user_id": user_id,
+        "after_time": after_time,
+        "after_id": after_id,
+        "limit": limit + 1
+    }).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].created_at, rows[-1].id])
+
+    users = {user.id: user for user in db.query(User).filter(User.id.in_([row.other_id for row in rows]))}
+    items = [
+        {
+            "user": users[row.other_id],
+            "last_message_id": row.id,
+            "last_message": row.content,
+            "last_sender_id": row.sender_id,
+            "last_message_at": row.created_at,
+            "unread_count": row.unread_count
+        }
+        for row in rows
+        if row.other_id in users
+    ]
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def record_message(db: Session, message_id: int):
+    """
+    Make a new message the latest in its sender's and receiver's conversations (caller commits).
+
+    Args:
+        db: Database session
+        message_id: ID of the message, already flushed
+    """
+    db.execute(_RECORD_MESSAGE_SQL, {"message_id": message_id})
+
+
+def mark_conversation_read(db: Session, user_id: int, other_id: int, up_to: Optional[int] = None) -> Optional[int]:
+    """
+    Mark a user's messages from a partner read, up to a message (caller commits).
+
+    Args:
+        db: Database session
+        user_id: The reader's ID
+        other_id: The partner's ID
+        up_to: Newest message ID seen, or None for everything received so far
+
+    Returns:
+        The cursor after the update, or None if there is nothing to read
+    """
+    cursor = db.execute(_MARK_READ_SQL, {"user_id": user_id, "other_id": other_id, "up_to": up_to}).scalar()
+    if cursor is None:
+        cursor = db.query(ConversationRead.last_read_message_id).filter(
+            ConversationRead.user_id == user_id,
+            ConversationRead.other_id == other_id
+        ).scalar()
+    return cursor
+
+
+def read_cursors(db: Session, user_id: int, other_id: Optional[int] = None) -> Dict[Tuple[int, int], int]:
+    """
+    Load the read cursors needed to derive is_read for a user's messages.
+
+    Args:
+        db: Database session
+        user_id: The viewing user's ID
+        other_id: Only the conversation with this partner, or None for all
+
+    Returns:
+        Dict mapping (reader_id, partner_id) to last_read_message_id, in both directions
+    """
+    if other_id is not None:
+        condition = or_(
+            (ConversationRead.user_id == user_id) & (ConversationRead.other_id == other_id),
+            (ConversationRead.user_id == other_id) & (ConversationRead.other_id == user_id)
+        )
+    else:
+        condition = or_(ConversationRead.user_id == user_id, ConversationRead.other_id == user_id)
+    rows = db.query(ConversationRead.user_id, ConversationRead.other_id, ConversationRead.last_read_message_id).filter(condition)
+    return {(row.user_id, row.other_id): row.last_read_message_id for row in rows}
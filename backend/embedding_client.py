@@ -0,0 +1,189 @@
+"""
+Asynchronous, batched embedding client.
+Texts requested by concurrent callers are coalesced into large batched requests,
+with a cap on in-flight requests and retries with exponential backoff.
+"""
+import asyncio
+import random
+from typing import List, Optional, Tuple
+import numpy as np
+from config import settings
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+
+class EmbeddingBackend:
+    """Interface for services that turn a batch of texts into vectors."""
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, returning one vector per text in the same order."""
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """
+    OpenAI embeddings API (or any OpenAI-compatible server, e.g. a local fake,
+    via EMBEDDING_API_BASE_URL).
+    """
+
+    def __init__(self, api_key: Optional[str], base_url: Optional[str] = None, model: str = EMBEDDING_MODEL):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self._client = None
+        self._loop = None
+
+    def _get_client(self):
+        # The HTTP connection pool belongs to one event loop
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            from openai import AsyncOpenAI
+            # Retries are handled by AsyncEmbeddingClient
+            self._client = AsyncOpenAI(api_key=self.api_key or "unused", base_url=self.base_url, max_retries=0)
+            self._loop = loop
+        return self._client
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        response = await self._get_client().embeddings.create(model=self.model, input=texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Retry rate limits, server errors and network failures, but not other client errors."""
+    status_code = getattr(error, "status_code", None)
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+class AsyncEmbeddingClient:
+    """
+    Coalesces embedding requests on the running event loop.
+
+    Each call to embed() queues its texts; the queue is flushed into batches of
+    up to batch_size once it is full or batch_wait seconds after the first
+    queued text, so concurrent requests share API calls. At most
+    max_concurrency batches are in flight at once.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[EmbeddingBackend],
+        batch_size: int,
+        max_concurrency: int,
+        max_retries: int,
+        batch_wait: float
+    ):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.batch_wait = batch_wait
+        self._loop = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def _bind(self, loop: asyncio.AbstractEventLoop):
+        """(Re)create per-loop state; asyncio primitives cannot be shared across loops."""
+        if self._loop is not loop:
+            self._loop = loop
+            self._pending: List[Tuple[str, asyncio.Future]] = []
+            self._flush_handle: Optional[asyncio.TimerHandle] = None
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def embed(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Embed texts without blocking the event loop.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Unit-normalized float32 vectors in the same order as texts
+
+        Raises:
+            RuntimeError: If no backend is configured
+            Exception: The backend's error once retries are exhausted
+        """
+        if not self.enabled:
+            raise RuntimeError("Embeddings are not configured")
+        if not texts:
+            return []
+
+        loop = asyncio.get_running_loop()
+        self._bind(loop)
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._pending.append((text, future))
+            futures.append(future)
+
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_wait, self._flush)
+
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self):
+        """Send everything queued so far as batches of at most batch_size texts."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.batch_size):
+            self._loop.create_task(self._send(pending[start:start + self.batch_size]))
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]):
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    vectors = await self.backend.embed([text for text, _ in batch])
+                    if len(vectors) != len(batch):
+                        raise ValueError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries or not _is_retryable(e):
+                        print(f"[EMBEDDINGS] Batch of {len(batch)} failed after {attempt + 1} attempt(s): {e}")
+                        for _, future in batch:
+                            if not future.done():
+                                future.set_exception(e)
+                        return
+                    # Exponential backoff with jitter: ~0.5s, 1s, 2s, ...
+                    await asyncio.sleep(0.5 * (2 ** attempt) * (0.5 + random.random()))
+
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(normalize(np.asarray(vector, dtype=np.float32)))
+
+
+def normalize(vector: np.ndarray) -> np.ndarray:
+    """Scale a vector to unit length (zero vectors are returned unchanged)."""
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _default_backend() -> Optional[EmbeddingBackend]:
+    if not (settings.OPENAI_API_KEY or settings.EMBEDDING_API_BASE_URL):
+        return None
+    try:
+        import openai  # noqa: F401
+    except ImportError:
+        return None
+    return OpenAIEmbeddingBackend(settings.OPENAI_API_KEY, base_url=settings.EMBEDDING_API_BASE_URL)
+
+
+# Process-wide client; disabled (backend None) when no embedding service is configured
+embedding_client = AsyncEmbeddingClient(
+    _default_backend(),
+    batch_size=settings.EMBEDDING_BATCH_SIZE,
+    max_concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+    max_retries=settings.EMBEDDING_MAX_RETRIES,
+    batch_wait=settings.EMBEDDING_BATCH_WAIT_MS / 1000
+)
+
+
+def set_embedding_backend(backend: Optional[EmbeddingBackend]):
+    """Swap the embedding backend, e.g. for a fake in tests. None disables AI matching."""
+    embedding_client.backend = backend
@@ -0,0 +1,264 @@
+"""
+Persistent embedding store for AI matching.
+Each profile is embedded once and stored in the user_embeddings table, keyed by
+a hash of the profile text, so ranking never has to call OpenAI per pair.
+Embedding calls go through the async batched client in embedding_client.
+Verified profiles without an embedding are filled in by a background backfill.
+
+Usage:
+    python embeddings.py backfill   # Embed every verified profile that has no stored embedding
+"""
+import asyncio
+import hashlib
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import User, UserEmbedding
+from ann_index import index_user, index_users
+from embedding_client import EMBEDDING_MODEL, embedding_client
+from config import settings
+
+# Users whose embedding request failed, by monotonic failure time; skipped until EMBEDDING_RETRY_SECONDS pass
+_failed_at: Dict[int, float] = {}
+
+# Per-worker background backfill, started by schedule_backfill()
+_backfill_task: Optional[asyncio.Task] = None
+_backfill_started: Optional[float] = None
+
+
+def build_profile_text(name: str, school: str, year: str, interests: Optional[Sequence[str]]) -> str:
+    """Build the text that represents a user profile for embedding."""
+    return f"{name}, {school}, {year}, Interests: {', '.join(interests or [])}"
+
+
+def profile_text_hash(text: str) -> str:
+    """Hash profile text together with the model name so a model change re-embeds everything."""
+    return hashlib.sha256(f"{EMBEDDING_MODEL}:{text}".encode("utf-8")).hexdigest()
+
+
+async def embed_texts(texts: List[str]) -> List[np.ndarray]:
+    """
+    Embed texts without blocking the event loop. Texts from concurrent callers
+    are batched together, up to EMBEDDING_BATCH_SIZE inputs per request.
+
+    Args:
+        texts: Profile texts to embed
+
+    Returns:
+        Unit-normalized float32 vectors in the same order as texts
+    """
+    return await embedding_client.embed(texts)
+
+
+def _store(db: Session, user_id: int, text_hash: str, vector: np.ndarray, existing: Optional[UserEmbedding]):
+    """Insert or update a user's embedding row (caller commits)."""
+    if existing:
+        existing.text_hash = text_hash
+        existing.model = EMBEDDING_MODEL
+        existing.embedding = vector.astype(np.float32).tobytes()
+    else:
+        db.add(UserEmbedding(
+            user_id=user_id,
+            text_hash=text_hash,
+            model=EMBEDDING_MODEL,
+            embedding=vector.astype(np.float32).tobytes()
+        ))
+
+
+async def refresh_user_embedding(db: Session, user: User) -> bool:
+    """
+    Re-embed a user's profile if its text changed since the stored embedding,
+    and keep the user's entry in the ANN index current.
+
+    Args:
+        db: Database session
+        user: User whose profile may have changed
+
+    Returns:
+        True if a new embedding was computed and stored
+    """
+    if not embedding_client.enabled:
+        return False
+
+    text = build_profile_text(user.name, user.school, user.year, user.interests)
+    text_hash = profile_text_hash(text)
+
+    existing = db.query(UserEmbedding).filter(UserEmbedding.user_id == user.id).first()
+    if existing and existing.text_hash == text_hash:
+        # Still make sure the user is indexed, e.g. right after verification
+        index_user(db, user.id)
+        return False
+
+    try:
+        vector = (await embed_texts([text]))[0]
+    except Exception as e:
+        print(f"[EMBEDDINGS] Error embedding user {user.id}: {e}")
+        return False
+
+    _store(db, user.id, text_hash, vector, existing)
+    db.commit()
+    index_user(db, user.id, vector)
+    return True
+
+
+async def refresh_user_embedding_later(user_id: int):
+    """
+    Background-task wrapper around refresh_user_embedding with its own session.
+    Routes schedule it with BackgroundTasks so the embedding call runs after the response is sent.
+
+    Args:
+        user_id: ID of the user whose profile may have changed
+    """
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if user:
+            await refresh_user_embedding(db, user)
+    except Exception as e:
+        db.rollback()
+        print(f"[EMBEDDINGS] Error refreshing embedding for user {user_id}: {e}")
+    finally:
+        db.close()
+
+
+def _read_embeddings(db: Session, user_ids: Sequence[int]) -> Tuple[Dict[int, UserEmbedding], list]:
+    """Blocking part of load_embeddings: stored rows, plus profiles that need (re-)embedding."""
+    profiles = db.query(User.id, User.name, User.school, User.year, User.interests).filter(
+        User.id.in_(user_ids)
+    ).all()
+    stored: Dict[int, UserEmbedding] = {
+        row.user_id: row
+        for row in db.query(UserEmbedding).filter(UserEmbedding.user_id.in_(user_ids)).all()
+    }
+
+    now = time.monotonic()
+    pending = []
+    for user_id, name, school, year, interests in profiles:
+        text = build_profile_text(name, school, year, interests)
+        text_hash = profile_text_hash(text)
+        existing = stored.get(user_id)
+        failed_at = _failed_at.get(user_id)
+        if failed_at is not None and now - failed_at < settings.EMBEDDING_RETRY_SECONDS:
+            continue
+        if not existing or existing.text_hash != text_hash:
+            pending.append((user_id, text, text_hash, existing))
+    return stored, pending
+
+
+def _write_embeddings(db: Session, user_ids: Sequence[int], pending: list, vectors: List[np.ndarray]) -> Dict[int, UserEmbedding]:
+    """Blocking part of load_embeddings: store new vectors, index them and re-read the rows."""
+    for (user_id, _, text_hash, existing), vector in zip(pending, vectors):
+        _store(db, user_id, text_hash, vector, existing)
+    db.commit()
+    for user_id, _, _, _ in pending:
+        _failed_at.pop(user_id, None)
+    index_users(db, [user_id for user_id, _, _, _ in pending])
+    return {
+        row.user_id: row
+        for row in db.query(UserEmbedding).filter(UserEmbedding.user_id.in_(user_ids)).all()
+    }
+
+
+async def load_embeddings(db: Session, user_ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Load embeddings for the given users, embedding any that are missing or stale.
+    Missing profiles are embedded in batches, so a cold start costs a handful of
+    requests rather than one per user. Database work runs in a worker thread.
+
+    Args:
+        db: Database session
+        user_ids: Users to load
+
+    Returns:
+        (ids, matrix) where matrix rows are unit vectors aligned with ids.
+        Users that could not be embedded are left out.
+    """
+    if not user_ids:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.float32)
+
+    stored, pending = await run_in_threadpool(_read_embeddings, db, user_ids)
+
+    if pending and embedding_client.enabled:
+        try:
+            vectors = await embed_texts([text for _, text, _, _ in pending])
+            stored = await run_in_threadpool(_write_embeddings, db, user_ids, pending, vectors)
+        except Exception as e:
+            db.rollback()
+            failed_at = time.monotonic()
+            for user_id, _, _, _ in pending:
+                _failed_at[user_id] = failed_at
+            print(f"[EMBEDDINGS] Error embedding {len(pending)} profiles: {e}")
+
+    ids = [user_id for user_id in user_ids if user_id in stored]
+    if not ids:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.float32)
+
+    matrix = np.vstack([np.frombuffer(stored[user_id].embedding, dtype=np.float32) for user_id in ids])
+    return np.array(ids, dtype=np.int64), matrix
+
+
+async def backfill_embeddings(db: Session) -> int:
+    """
+    Embed verified users that have no stored embedding, one batch at a time.
+    Users that failed recently are skipped (see EMBEDDING_RETRY_SECONDS).
+
+    Args:
+        db: Database session
+
+    Returns:
+        Number of users embedded
+    """
+    missing_ids = [row[0] for row in db.query(User.id).outerjoin(
+        UserEmbedding, UserEmbedding.user_id == User.id
+    ).filter(User.is_verified == True, UserEmbedding.user_id.is_(None)).order_by(User.id).all()]
+
+    embedded = 0
+    for start in range(0, len(missing_ids), settings.EMBEDDING_BATCH_SIZE):
+        ids, _ = await load_embeddings(db, missing_ids[start:start + settings.EMBEDDING_BATCH_SIZE])
+        embedded += len(ids)
+    return embedded
+
+
+async def _run_backfill():
+    db = SessionLocal()
+    try:
+        embedded = await backfill_embeddings(db)
+        if embedded:
+            print(f"[EMBEDDINGS] Backfilled {embedded} embeddings")
+    except Exception as e:
+        print(f"[EMBEDDINGS] Backfill failed: {e}")
+    finally:
+        db.close()
+
+
+def schedule_backfill():
+    """
+    Start a backfill on the running event loop, unless one is in progress or
+    started less than EMBEDDING_BACKFILL_INTERVAL_SECONDS ago. Returns immediately.
+    """
+    global _backfill_task, _backfill_started
+    if not embedding_client.enabled:
+        return
+    if _backfill_task is not None and not _backfill_task.done():
+        return
+    now = time.monotonic()
+    if _backfill_started is not None and now - _backfill_started < settings.EMBEDDING_BACKFILL_INTERVAL_SECONDS:
+        return
+    _backfill_started = now
+    _backfill_task = asyncio.get_running_loop().create_task(_run_backfill())
+
+
+def similarity_to_score(similarity: np.ndarray) -> np.ndarray:
+    """Map cosine similarity (-1 to 1) onto a 0-1 match score."""
+    return np.clip((similarity + 1) / 2, 0.0, 1.0)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        asyncio.run(_run_backfill())
+    else:
+        print(__doc__)
@@ -0,0 +1,226 @@
+"""
+Upcoming-events feed with time windows, tag search and keyset pagination.
+Events that started more than EVENT_ARCHIVE_AFTER_HOURS ago are flagged archived,
+so the default upcoming feed only scans the small partial index of live events.
+Tag facets are read from per-(tag, day) event counts kept in event_tag_counts.
+
+Usage:
+    python event_feed.py archive              # Flag past events as archived
+    python event_feed.py rebuild-tag-counts   # Recount event_tag_counts from events
+"""
+import sys
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import array, insert
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Event, EventTagCount
+from interests import vocabulary
+from loaders import event_query, event_payloads
+from pagination import paginate
+from config import settings
+
+
+def archive_cutoff() -> datetime:
+    """Events starting before this are (or are about to be) archived."""
+    return datetime.utcnow() - timedelta(hours=settings.EVENT_ARCHIVE_AFTER_HOURS)
+
+
+def as_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Event times are stored as naive UTC; convert timezone-aware query bounds to match."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def get_event_feed(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    tags: Optional[List[str]] = None,
+    tag_match: str = "any",
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> dict:
+    """
+    Get one page of events in a time window, ordered by (event_time, id).
+
+    Args:
+        db: Database session
+        start: Earliest event time (defaults to now, i.e. upcoming events)
+        end: Latest event time (exclusive), or None for no upper bound
+        tags: Only events with these tags
+        tag_match: "any" (at least one of the tags) or "all" (every tag)
+        limit: Page size
+        cursor: next_cursor from the previous page, or None for the first page
+
+    Returns:
+        Dict in EventPage shape: {"items": [...], "next_cursor": str or None}
+
+    Raises:
+        ValueError: If the cursor or tag_match is invalid
+    """
+    if tag_match not in ("any", "all"):
+        raise ValueError('tag_match must be "any" or "all"')
+
+    start = as_utc_naive(start) or datetime.utcnow()
+    end = as_utc_naive(end)
+    query = event_query(db).filter(Event.event_time >= start)
+    if end is not None:
+        query = query.filter(Event.event_time < end)
+    if start >= archive_cutoff():
+        # Archived events all start before the cutoff; saying so lets Postgres use the live-events index
+        query = query.filter(Event.archived == False)
+
+    if tags:
+        # Both operators are served by idx_events_tag_ids_gin
+        tag_ids = vocabulary.lookup(db, tags)
+        if tag_match == "all":
+            if len(tag_ids) < len({vocabulary.canonical_slug(tag) for tag in tags}):
+                return {"items": [], "next_cursor": None}  # A tag no event has ever used
+            query = query.filter(Event.tag_ids.op("@>")(array(tag_ids)))
+        else:
+            if not tag_ids:
+                return {"items": [], "next_cursor": None}
+            query = query.filter(Event.tag_ids.op("&&")(array(tag_ids)))
+
+    events, next_cursor = paginate(query, [Event.event_time, Event.id], limit, cursor)
+    return {"items": event_payloads(events), "next_cursor": next_cursor}
+
+
+def update_tag_counts(
+    db: Session,
+    old_tag_ids: Optional[Iterable[int]],
+    old_time: Optional[datetime],
+    new_tag_ids: Optional[Iterable[int]],
+    new_time: Optional[datetime]
+):
+    """
+    Apply an event's create/update to the per-(tag, day) counts (caller commits).
+    Changes are relative upserts, so concurrent event writes do not conflict.
+
+    Args:
+        db: Database session
+        old_tag_ids: Tags before the change, or None for a new event
+        old_time: Event time before the change, or None for a new event
+        new_tag_ids: Tags after the change, or None if the event was removed
+        new_time: Event time after the change, or None if the event was removed
+    """
+    deltas = Counter()
+    if old_time is not None:
+        for tag_id in set(old_tag_ids or []):
+            deltas[(tag_id, as_utc_naive(old_time).date())] -= 1
+    if new_time is not None:
+        for tag_id in set(new_tag_ids or []):
+            deltas[(tag_id, as_utc_naive(new_time).date())] += 1
+
+    rows = [{"tag_id": tag_id, "day": day, "event_count": delta} for (tag_id, day), delta in deltas.items() if delta]
+    if not rows:
+        return
+    statement = insert(EventTagCount).values(rows)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[EventTagCount.tag_id, EventTagCount.day],
+        set_={"event_count": EventTagCount.event_count + statement.excluded.event_count}
+    ))
+
+
+def get_tag_facets(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> List[dict]:
+    """
+    Count upcoming events per tag from the maintained per-day counts.
+    Counts are per calendar day (UTC), so events earlier today are still included.
+
+    Args:
+        db: Database session
+        start: First day counted (defaults to today)
+        end: Last day counted (inclusive), or None for no upper bound
+
+    Returns:
+        List of {"tag", "count"} dicts, most common tags first
+    """
+    start = start or datetime.utcnow().date()
+    query = db.query(EventTagCount.tag_id, func.sum(EventTagCount.event_count).label("count")).filter(
+        EventTagCount.day >= start
+    )
+    if end is not None:
+        query = query.filter(EventTagCount.day <= end)
+    rows = query.group_by(EventTagCount.tag_id).having(func.sum(EventTagCount.event_count) > 0).all()
+
+    labels = dict(zip([row.tag_id for row in rows], vocabulary.labels(db, [row.tag_id for row in rows])))
+    facets = [{"tag": labels[row.tag_id], "count": int(row.count)} for row in rows if row.tag_id in labels]
+    facets.sort(key=lambda facet: (-facet["count"], facet["tag"]))
+    return facets
+
+
+def rebuild_tag_counts() -> int:
+    """
+    Recount event_tag_counts from the events table, fixing any drift
+    (e.g. events removed when their creator's account was deleted).
+
+    Returns:
+        Number of (tag, day) rows written
+    """
+    db = SessionLocal()
+    try:
+        tag_id = func.unnest(Event.tag_ids).label("tag_id")
+        day = func.date(Event.event_time).label("day")
+        # Same range archive_past_events keeps: whole days from the archive cutoff on
+        first_day = datetime.combine(archive_cutoff().date(), datetime.min.time())
+        counts = db.query(tag_id, day, func.count().label("event_count")).filter(
+            Event.event_time >= first_day
+        ).group_by(tag_id, day).subquery()
+
+        db.query(EventTagCount).delete(synchronize_session=False)
+        result = db.execute(insert(EventTagCount).from_select(
+            ["tag_id", "day", "event_count"],
+            db.query(counts.c.tag_id, counts.c.day, counts.c.event_count)
+        ))
+        db.commit()
+        print(f"[EVENT FEED] Rebuilt {result.rowcount} tag counts")
+        return result.rowcount
+    finally:
+        db.close()
+
+
+def archive_past_events(batch_size: int = 1000) -> int:
+    """
+    Flag events older than EVENT_ARCHIVE_AFTER_HOURS as archived.
+
+    Args:
+        batch_size: Events updated per transaction
+
+    Returns:
+        Number of events archived
+    """
+    db = SessionLocal()
+    archived = 0
+    try:
+        cutoff = archive_cutoff()
+        while True:
+            ids = [row.id for row in db.query(Event.id).filter(
+                Event.archived == False,
+                Event.event_time < cutoff
+            ).limit(batch_size).all()]
+            if not ids:
+                break
+            db.query(Event).filter(Event.id.in_(ids)).update({Event.archived: True}, synchronize_session=False)
+            db.commit()
+            archived += len(ids)
+
+        # Facets only cover upcoming days
+        db.query(EventTagCount).filter(EventTagCount.day < cutoff.date()).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    print(f"[EVENT FEED] Archived {archived} past events")
+    return archived
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "archive":
+        archive_past_events()
+    elif len(sys.argv) > 1 and sys.argv[1] == "rebuild-tag-counts":
+        rebuild_tag_counts()
+    else:
+        print(__doc__)
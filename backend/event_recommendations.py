@@ -0,0 +1,194 @@
+"""
+Interest-based event recommendations.
+Upcoming events are held as a sparse event x interest matrix (CSR arrays) and
+ranked for a user with one sparse matrix-vector product against a weight vector
+built from the user's interests and RSVP history.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from models import User, Event, EventAttendee
+from config import settings
+
+# Weight of one of the user's own interests in the profile vector
+INTEREST_WEIGHT = 1.0
+
+# Tags of events the user responded to, by RSVP status; averaged over the history, then scaled
+RSVP_WEIGHTS = {"going": 1.0, "waitlisted": 1.0, "interested": 0.5, "declined": -0.5}
+HISTORY_WEIGHT = 0.5
+
+
+class EventMatrix:
+    """
+    Upcoming events in compressed sparse row form.
+
+    Attributes:
+        event_ids: int64 array of event IDs, one per row
+        event_times: int64 array of event times (microseconds), for tie-breaking
+        indptr: Row i's tags are indices[indptr[i]:indptr[i + 1]]
+        indices: Interest IDs (column numbers) of every stored tag
+        rows: Row number of every stored tag (expanded indptr, used by the product)
+        norms: sqrt(tag count) per row, so tag-stuffed events don't dominate
+        version: Increases with every rebuild
+    """
+
+    def __init__(self, event_ids: np.ndarray, event_times: np.ndarray, indptr: np.ndarray,
+                 indices: np.ndarray, version: int):
+        self.event_ids = event_ids
+        self.event_times = event_times
+        self.indptr = indptr
+        self.indices = indices
+        counts = np.diff(indptr)
+        self.rows = np.repeat(np.arange(len(event_ids)), counts)
+        self.norms = np.sqrt(np.maximum(counts, 1)).astype(np.float64)
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.event_ids)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, datetime, Optional[Sequence[int]]]], version: int = 0) -> "EventMatrix":
+        """Build the matrix from (id, event_time, tag_ids) tuples."""
+        event_ids: List[int] = []
+        event_times: List[int] = []
+        indptr: List[int] = [0]
+        indices: List[int] = []
+        for event_id, event_time, tag_ids in rows:
+            event_ids.append(event_id)
+            event_times.append(int(event_time.timestamp() * 1_000_000))
+            indices.extend(sorted(set(tag_ids or [])))
+            indptr.append(len(indices))
+        return cls(
+            np.array(event_ids, dtype=np.int64),
+            np.array(event_times, dtype=np.int64),
+            np.array(indptr, dtype=np.int64),
+            np.array(indices, dtype=np.int64),
+            version
+        )
+
+    def scores(self, weights: np.ndarray) -> np.ndarray:
+        """
+        Score every event against an interest weight vector in one pass.
+
+        Args:
+            weights: float64 array indexed by interest ID
+
+        Returns:
+            float64 array of sum(weights[tag] for tag in event) / norm, one per event
+        """
+        if len(self.indices) == 0:
+            return np.zeros(len(self), dtype=np.float64)
+        padded = weights
+        if len(weights) <= self.indices.max():
+            padded = np.zeros(self.indices.max() + 1, dtype=np.float64)
+            padded[:len(weights)] = weights
+        products = np.bincount(self.rows, weights=padded[self.indices], minlength=len(self))
+        return products / self.norms
+
+    def rank(self, scores: np.ndarray, exclude: Optional[Iterable[int]] = None, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Order events by score, then by time (soonest first), skipping excluded event IDs."""
+        order = np.lexsort((self.event_times, -scores))
+        if exclude:
+            order = order[~np.isin(self.event_ids[order], np.fromiter(exclude, dtype=np.int64))]
+        order = order[:limit]
+        return [(int(self.event_ids[row]), float(scores[row])) for row in order]
+
+
+def user_weights(db: Session, user: User) -> np.ndarray:
+    """
+    Build a user's interest weight vector from their interests and RSVP history.
+
+    Args:
+        db: Database session
+        user: The user
+
+    Returns:
+        float64 array indexed by interest ID
+    """
+    history = db.query(EventAttendee.rsvp_status, Event.tag_ids).join(
+        Event, Event.id == EventAttendee.event_id
+    ).filter(EventAttendee.user_id == user.id).all()
+
+    interest_ids = list(user.interest_ids or [])
+    size = max([0] + interest_ids + [tag_id for _, tag_ids in history for tag_id in tag_ids or []]) + 1
+    weights = np.zeros(size, dtype=np.float64)
+    weights[interest_ids] += INTEREST_WEIGHT
+
+    if history:
+        scale = HISTORY_WEIGHT / len(history)
+        for status, tag_ids in history:
+            if tag_ids:
+                weights[list(set(tag_ids))] += RSVP_WEIGHTS.get(status, 0.0) * scale
+    return weights
+
+
+# Per-process state: the shared upcoming-events matrix and each user's ranking
+_matrix: Optional[EventMatrix] = None
+_matrix_stale = False
+_matrix_lock = threading.Lock()
+_rankings: "OrderedDict[int, Tuple[int, float, List[Tuple[int, float]]]]" = OrderedDict()
+_rankings_lock = threading.Lock()
+
+
+def get_event_matrix(db: Session) -> EventMatrix:
+    """Get the upcoming-events matrix, rebuilding it if events changed or it is too old."""
+    global _matrix, _matrix_stale
+    with _matrix_lock:
+        if (_matrix is None or _matrix_stale
+                or time.monotonic() - _matrix.built_at > settings.EVENT_RECOMMENDATION_MATRIX_TTL_SECONDS):
+            _matrix_stale = False
+            rows = db.query(Event.id, Event.event_time, Event.tag_ids).filter(
+                Event.event_time >= datetime.utcnow(),
+                Event.archived == False
+            ).order_by(Event.id).all()
+            _matrix = EventMatrix.from_rows(rows, version=(_matrix.version + 1) if _matrix else 0)
+        return _matrix
+
+
+def invalidate_event_matrix():
+    """Rebuild the matrix on next use (call when events are created or changed)."""
+    global _matrix_stale
+    _matrix_stale = True
+
+
+def invalidate_user(user_id: int):
+    """Drop a user's cached ranking (call when their interests or RSVPs change)."""
+    with _rankings_lock:
+        _rankings.pop(user_id, None)
+
+
+def get_recommended_event_ids(db: Session, user: User, limit: int = 20) -> List[Tuple[int, float]]:
+    """
+    Rank upcoming events for a user, using their cached ranking when still valid.
+    Events the user already responded to are left out.
+
+    Args:
+        db: Database session
+        user: The viewing user
+        limit: Number of events wanted
+
+    Returns:
+        List of (event_id, score) tuples, best first
+    """
+    matrix = get_event_matrix(db)
+    with _rankings_lock:
+        cached = _rankings.get(user.id)
+    if (cached is not None and cached[0] == matrix.version
+            and time.monotonic() - cached[1] < settings.EVENT_RECOMMENDATION_TTL_SECONDS):
+        return cached[2][:limit]
+
+    responded = [row.event_id for row in db.query(EventAttendee.event_id).filter(EventAttendee.user_id == user.id)]
+    ranking = matrix.rank(matrix.scores(user_weights(db, user)), exclude=responded,
+                          limit=settings.EVENT_RECOMMENDATION_CACHE_SIZE)
+
+    with _rankings_lock:
+        _rankings[user.id] = (matrix.version, time.monotonic(), ranking)
+        _rankings.move_to_end(user.id)
+        while len(_rankings) > settings.EVENT_RECOMMENDATION_MAX_USERS:
+            _rankings.popitem(last=False)
+    return ranking[:limit]
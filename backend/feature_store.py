@@ -0,0 +1,270 @@
+"""
+Memory-mapped columnar feature store for matching.
+Verified users' match columns (IDs, school/year codes, interest bitsets and
+optionally embeddings) are written as .npy files that every worker maps
+read-only, so the candidate pool is shared through the page cache.
+
+Usage:
+    python feature_store.py build   # Build a new version and swap it in
+"""
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import Optional
+import numpy as np
+from database import SessionLocal
+from models import User, UserEmbedding
+from match_engine import CandidateMatrix
+from config import settings
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; builds are then not coordinated across workers
+    fcntl = None
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".build.lock"
+_ARRAYS = ("user_ids", "school_codes", "year_codes", "interest_bits", "interest_counts")
+
+
+class FeatureStore:
+    """
+    One read-only version of the store.
+
+    Attributes:
+        version: Directory name of this version
+        built_at: Unix time the build started (profiles changed after it are not reflected)
+        matrix: CandidateMatrix whose arrays are memory-mapped
+        embeddings: Memory-mapped float32 matrix aligned with matrix.user_ids, if stored
+        embedding_present: Bool array marking rows that have an embedding, if stored
+    """
+
+    def __init__(self, version: str, built_at: float, matrix: CandidateMatrix,
+                 embeddings: Optional[np.ndarray] = None, embedding_present: Optional[np.ndarray] = None):
+        self.version = version
+        self.built_at = built_at
+        self.matrix = matrix
+        self.embeddings = embeddings
+        self.embedding_present = embedding_present
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    @classmethod
+    def open(cls, path: str) -> "FeatureStore":
+        """Map a version directory without reading the arrays into memory."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+        matrix = CandidateMatrix(
+            user_ids=arrays["user_ids"],
+            school_codes=arrays["school_codes"],
+            year_codes=arrays["year_codes"],
+            interest_bits=arrays["interest_bits"],
+            school_vocab={school: code for code, school in enumerate(meta["schools"])},
+            year_vocab={year: code for code, year in enumerate(meta["years"])},
+            interest_vocab={interest_id: position for position, interest_id in enumerate(meta["interest_ids"])},
+            interest_counts=arrays["interest_counts"]
+        )
+
+        embeddings = embedding_present = None
+        if meta.get("embeddings"):
+            embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+            embedding_present = np.load(os.path.join(path, "embedding_present.npy"), mmap_mode="r")
+
+        return cls(os.path.basename(path), meta["built_at"], matrix, embeddings, embedding_present)
+
+
+def _save_array(path: str, array: np.ndarray):
+    with open(path, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def build(directory: Optional[str] = None, include_embeddings: Optional[bool] = None) -> str:
+    """
+    Build a new store version and atomically make it current.
+    The version is written to its own directory first; only then is the
+    CURRENT pointer replaced, so readers see either the old or the new store.
+
+    Args:
+        directory: Store directory (defaults to FEATURE_STORE_DIR)
+        include_embeddings: Also store profile embeddings (defaults to FEATURE_STORE_EMBEDDINGS)
+
+    Returns:
+        The new version name
+    """
+    directory = directory or settings.FEATURE_STORE_DIR
+    include_embeddings = settings.FEATURE_STORE_EMBEDDINGS if include_embeddings is None else include_embeddings
+    os.makedirs(directory, exist_ok=True)
+
+    built_at = time.time()
+    db = SessionLocal()
+    try:
+        rows = db.query(User.id, User.school, User.year, User.interest_ids).filter(
+            User.is_verified == True
+        ).order_by(User.id).yield_per(10000)
+        matrix = CandidateMatrix.from_rows(rows)
+
+        embeddings = embedding_present = None
+        if include_embeddings:
+            positions = {int(user_id): row for row, user_id in enumerate(matrix.user_ids)}
+            stored = db.query(UserEmbedding.user_id, UserEmbedding.embedding).filter(
+                UserEmbedding.user_id.in_(list(positions))
+            ).yield_per(1000) if positions else []
+            embedding_present = np.zeros(len(matrix), dtype=bool)
+            for user_id, data in stored:
+                vector = np.frombuffer(data, dtype=np.float32)
+                if embeddings is None:
+                    embeddings = np.zeros((len(matrix), len(vector)), dtype=np.float32)
+                if len(vector) == embeddings.shape[1]:
+                    embeddings[positions[user_id]] = vector
+                    embedding_present[positions[user_id]] = True
+    finally:
+        db.close()
+
+    version = f"v{int(built_at * 1000)}-{os.getpid()}"
+    tmp_path = os.path.join(directory, f".{version}.tmp")
+    os.makedirs(tmp_path)
+    for name in _ARRAYS:
+        _save_array(os.path.join(tmp_path, f"{name}.npy"), getattr(matrix, name))
+    if embeddings is not None:
+        _save_array(os.path.join(tmp_path, "embeddings.npy"), embeddings)
+        _save_array(os.path.join(tmp_path, "embedding_present.npy"), embedding_present)
+
+    meta = {
+        "built_at": built_at,
+        "users": len(matrix),
+        "schools": sorted(matrix.school_vocab, key=matrix.school_vocab.get),
+        "years": sorted(matrix.year_vocab, key=matrix.year_vocab.get),
+        "interest_ids": sorted(matrix.interest_vocab, key=matrix.interest_vocab.get),
+        "embeddings": embeddings is not None
+    }
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(directory, version))
+
+    # Swap the pointer: readers pick up the new version on their next request
+    pointer_tmp = os.path.join(directory, f".{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(directory, CURRENT_FILE))
+
+    _remove_old_versions(directory, keep={version})
+    print(f"[FEATURE STORE] Built {version} with {len(matrix)} users in {time.time() - built_at:.1f}s")
+    return version
+
+
+def _remove_old_versions(directory: str, keep: set):
+    """
+    Delete versions other than the newest two. Workers still mapping a
+    deleted version keep reading it until they remap (POSIX unlink semantics).
+    """
+    versions = sorted(
+        (name for name in os.listdir(directory) if name.startswith("v") and name not in keep),
+        key=lambda name: os.path.getmtime(os.path.join(directory, name)),
+        reverse=True
+    )
+    for name in versions[1:]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+# Per-process view of the current version
+_store: Optional[FeatureStore] = None
+_store_pointer: Optional[tuple] = None
+_store_lock = threading.Lock()
+_rebuild_thread: Optional[threading.Thread] = None
+
+
+def get_feature_store() -> Optional[FeatureStore]:
+    """
+    Get the current store version, remapping if another process swapped in a
+    new one. Starts a background rebuild when the store is missing or older
+    than FEATURE_STORE_MAX_AGE_SECONDS (the stale version is served meanwhile).
+
+    Returns:
+        The store, or None if none has been built yet
+    """
+    global _store, _store_pointer
+    directory = settings.FEATURE_STORE_DIR
+    pointer_path = os.path.join(directory, CURRENT_FILE)
+
+    with _store_lock:
+        try:
+            stat = os.stat(pointer_path)
+            pointer = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            pointer = None
+
+        if pointer is not None and pointer != _store_pointer:
+            try:
+                with open(pointer_path) as f:
+                    version = f.read().strip()
+                _store = FeatureStore.open(os.path.join(directory, version))
+                _store_pointer = pointer
+            except Exception as e:
+                print(f"[FEATURE STORE] Could not open current version: {e}")
+
+        store = _store
+
+    if store is None or store.age > settings.FEATURE_STORE_MAX_AGE_SECONDS:
+        _start_rebuild()
+    return store
+
+
+def _start_rebuild():
+    """Rebuild in a background thread; a file lock keeps other workers from building at the same time."""
+    global _rebuild_thread
+    with _store_lock:
+        if _rebuild_thread is not None and _rebuild_thread.is_alive():
+            return
+        _rebuild_thread = threading.Thread(target=_rebuild_locked, daemon=True)
+        _rebuild_thread.start()
+
+
+def _rebuild_locked():
+    directory = settings.FEATURE_STORE_DIR
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, LOCK_FILE), "w") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return  # Another worker is building
+
+            # Another worker may have finished a build while we waited
+            current = _read_current_built_at(directory)
+            if current is not None and time.time() - current <= settings.FEATURE_STORE_MAX_AGE_SECONDS:
+                return
+            build(directory)
+    except Exception as e:
+        print(f"[FEATURE STORE] Rebuild failed: {e}")
+
+
+def _read_current_built_at(directory: str) -> Optional[float]:
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            version = f.read().strip()
+        with open(os.path.join(directory, version, "meta.json")) as f:
+            return json.load(f)["built_at"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        build()
+    else:
+        print(__doc__)
@@ -0,0 +1,274 @@
+"""
+Server-side cache of serialized events-feed pages.
+Pages are cached per filter key and served stale while one request refreshes
+them; event writes invalidate exactly the pages they can change, in this worker
+directly and in other workers through the event_changes NOTIFY channel.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Event
+from interests import vocabulary
+from event_feed import get_event_feed, as_utc_naive
+from pagination import decode_cursor
+from schemas import EventPage
+from config import settings
+
+EVENT_CHANNEL = "event_changes"
+
+
+class EventChange(NamedTuple):
+    """
+    An event write, described by the feed position and tags it had before and after,
+    and for an RSVP the responding user (whose event recommendations change).
+    """
+    event_id: int
+    old_time: Optional[datetime] = None
+    old_tag_ids: Optional[List[int]] = None
+    new_time: Optional[datetime] = None
+    new_tag_ids: Optional[List[int]] = None
+    user_id: Optional[int] = None
+
+    def to_payload(self) -> str:
+        return json.dumps({
+            "id": self.event_id,
+            "old_time": self.old_time.isoformat() if self.old_time else None,
+            "old_tag_ids": self.old_tag_ids,
+            "new_time": self.new_time.isoformat() if self.new_time else None,
+            "new_tag_ids": self.new_tag_ids,
+            "user_id": self.user_id
+        })
+
+    @classmethod
+    def from_payload(cls, payload: str) -> "EventChange":
+        data = json.loads(payload)
+        return cls(
+            event_id=int(data["id"]),
+            old_time=datetime.fromisoformat(data["old_time"]) if data.get("old_time") else None,
+            old_tag_ids=data.get("old_tag_ids"),
+            new_time=datetime.fromisoformat(data["new_time"]) if data.get("new_time") else None,
+            new_tag_ids=data.get("new_tag_ids"),
+            user_id=int(data["user_id"]) if data.get("user_id") is not None else None
+        )
+
+
+class _Entry:
+    """A cached page plus the slice of the feed it covers, used for precise invalidation."""
+
+    def __init__(self, body: bytes, start: datetime, end: Optional[datetime], tag_ids: Optional[List[int]],
+                 tag_match: str, after: Optional[Tuple], through: Optional[Tuple], event_ids: set):
+        self.body = body
+        self.created_at = time.monotonic()
+        self.start = start
+        self.end = end
+        self.tag_ids = tag_ids  # None matches any tags: no tag filter, or a tag that has no ID yet
+        self.tag_match = tag_match
+        self.after = after  # Keyset position of the cursor (exclusive), None on the first page
+        self.through = through  # Position of the last row (inclusive), None on the last page
+        self.event_ids = event_ids
+
+    def covers(self, event_time: datetime, event_id: int, tag_ids: Optional[List[int]]) -> bool:
+        """Whether an event at this position with these tags belongs on this page."""
+        if event_time < self.start or (self.end is not None and event_time >= self.end):
+            return False
+        position = (event_time, event_id)
+        if (self.after is not None and position <= self.after) or (self.through is not None and position > self.through):
+            return False
+        if self.tag_ids is None:
+            return True
+        if self.tag_match == "all":
+            return set(self.tag_ids) <= set(tag_ids or [])
+        return bool(set(self.tag_ids) & set(tag_ids or []))
+
+    def affected_by(self, change: EventChange) -> bool:
+        if change.event_id in self.event_ids:
+            return True
+        return any(
+            event_time is not None and self.covers(event_time, change.event_id, tag_ids)
+            for event_time, tag_ids in ((change.old_time, change.old_tag_ids), (change.new_time, change.new_tag_ids))
+        )
+
+
+class _Flight:
+    """One in-progress computation that concurrent misses for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry: Optional[_Entry] = None
+        self.error: Optional[Exception] = None
+        self.changes: List[EventChange] = []  # Invalidations that arrived while computing
+        self.cleared = False
+
+
+class FeedCache:
+    """
+    Stale-while-revalidate cache with single-flight misses.
+
+    Entries younger than fresh_seconds are served as is. Older ones, up to
+    stale_seconds, are still served while a background thread recomputes them.
+    On a miss only one caller computes; concurrent callers wait for its result,
+    blocking their thread, so call get() from a threadpool rather than an event loop.
+    """
+
+    def __init__(self, fresh_seconds: float, stale_seconds: float, max_entries: int):
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._flights: Dict[tuple, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, compute: Callable[[Session], _Entry], db: Session) -> bytes:
+        """
+        Get a page, computing it with compute(db) if needed.
+
+        Raises:
+            Exception: Whatever compute raised (nothing is cached then)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.created_at
+            if age < self.fresh_seconds:
+                return entry.body
+            if age < self.stale_seconds:
+                self._start_flight(key, compute, background=True)
+                return entry.body
+
+        flight, leader = self._start_flight(key, compute, background=False)
+        if leader:
+            self._run_flight(key, flight, compute, db)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.entry.body
+
+    def _start_flight(self, key: tuple, compute: Callable[[Session], _Entry], background: bool):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = _Flight()
+            self._flights[key] = flight
+
+        if background:
+            threading.Thread(target=self._refresh, args=(key, flight, compute), daemon=True).start()
+        return flight, True
+
+    def _refresh(self, key: tuple, flight: _Flight, compute: Callable[[Session], _Entry]):
+        db = SessionLocal()
+        try:
+            self._run_flight(key, flight, compute, db)
+        finally:
+            db.close()
+        if flight.error is not None:
+            print(f"[FEED CACHE] Background refresh failed: {flight.error}")
+
+    def _run_flight(self, key: tuple, flight: _Flight, compute: Callable[[Session], _Entry], db: Session):
+        try:
+            flight.entry = compute(db)
+        except Exception as e:
+            flight.error = e
+        with self._lock:
+            # A write to this page that landed while we computed may not be reflected; serve it once but don't keep it
+            entry = flight.entry
+            if entry is not None and not flight.cleared and not any(entry.affected_by(change) for change in flight.changes):
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            self._flights.pop(key, None)
+        flight.done.set()
+
+    def invalidate(self, change: EventChange) -> int:
+        """Drop the pages an event write can change. Returns how many were dropped."""
+        with self._lock:
+            for flight in self._flights.values():
+                flight.changes.append(change)
+            stale = [key for key, entry in self._entries.items() if entry.affected_by(change)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            for flight in self._flights.values():
+                flight.cleared = True
+            self._entries.clear()
+
+
+# Process-wide cache of /api/events/feed pages
+feed_cache = FeedCache(
+    fresh_seconds=settings.EVENT_FEED_CACHE_FRESH_SECONDS,
+    stale_seconds=settings.EVENT_FEED_CACHE_STALE_SECONDS,
+    max_entries=settings.EVENT_FEED_CACHE_MAX_ENTRIES
+)
+
+
+def get_cached_event_feed(
+    db: Session,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    tags: Optional[List[str]] = None,
+    tag_match: str = "any",
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> bytes:
+    """
+    Get one events-feed page (see event_feed.get_event_feed) as serialized EventPage JSON.
+
+    Raises:
+        ValueError: If the cursor or tag_match is invalid
+    """
+    tag_key = tuple(sorted({vocabulary.canonical_slug(tag) for tag in tags})) if tags else None
+    key = (start, end, tag_key, tag_match, limit, cursor)
+
+    def compute(session: Session) -> _Entry:
+        window_start = as_utc_naive(start) or datetime.utcnow()
+        tag_ids = vocabulary.lookup(session, tags) if tags else None
+        if tag_ids is not None and len(tag_ids) < len(tag_key):
+            # A tag no event has used yet gets its ID only when the first such event is
+            # created, so the page is invalidated by any write in its range, whatever the tags
+            tag_ids = None
+        page = get_event_feed(session, window_start, end, tags, tag_match, limit, cursor)
+        items = page["items"]
+        body = EventPage.model_validate(page).model_dump_json().encode()
+        return _Entry(
+            body,
+            start=window_start,
+            end=as_utc_naive(end),
+            tag_ids=tag_ids,
+            tag_match=tag_match,
+            after=decode_cursor(cursor, (datetime, int)) if cursor else None,
+            through=(items[-1]["event_time"], items[-1]["id"]) if page["next_cursor"] else None,
+            event_ids={item["id"] for item in items}
+        )
+
+    return feed_cache.get(key, compute, db)
+
+
+def notify_event_change(db: Session, change: EventChange):
+    """
+    Tell other workers about an event write; delivered when the transaction commits.
+    The writing worker should also call feed_cache.invalidate(change) after committing.
+    """
+    if settings.CHANGE_FEED_ENABLED:
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": EVENT_CHANNEL, "payload": change.to_payload()})
+
+
+def event_change(event: Event, old_time: Optional[datetime] = None, old_tag_ids: Optional[List[int]] = None) -> EventChange:
+    """Describe a write to an event from its previous and current time and tags."""
+    return EventChange(
+        event.id,
+        as_utc_naive(old_time),
+        list(old_tag_ids or []) if old_time is not None else None,
+        as_utc_naive(event.event_time),
+        list(event.tag_ids or [])
+    )
@@ -0,0 +1,258 @@
+"""
+Interest vocabulary: canonical interests with normalization and synonym folding.
+User interests and event tags are interned to small integer IDs so matching and
+event filtering compare integer sets instead of raw strings.
+
+Usage:
+    python interests.py backfill   # Fill users.interest_ids, users.interest_minhash and events.tag_ids
+"""
+import re
+import sys
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Interest, InterestAlias, User, Event
+from minhash import hasher
+
+# Matches the interests.slug / label column length
+MAX_LABEL_LENGTH = 100
+
+# Common variants folded onto one canonical slug; extend at runtime via interest_aliases
+SYNONYMS = {
+    "hike": "hiking",
+    "hikes": "hiking",
+    "hiker": "hiking",
+    "run": "running",
+    "jogging": "running",
+    "movie": "movies",
+    "film": "movies",
+    "films": "movies",
+    "cinema": "movies",
+    "gym": "fitness",
+    "workout": "fitness",
+    "working out": "fitness",
+    "bball": "basketball",
+    "video games": "gaming",
+    "videogames": "gaming",
+    "games": "gaming",
+    "photo": "photography",
+    "photos": "photography",
+    "travelling": "travel",
+    "traveling": "travel",
+    "reading books": "reading",
+    "books": "reading",
+    "cooking food": "cooking",
+    "baking": "cooking",
+    "songs": "music",
+}
+
+
+def normalize_interest(label: str) -> str:
+    """
+    Reduce a free-text interest to its lookup form:
+    Unicode-normalized, case-folded, punctuation stripped, whitespace collapsed.
+    """
+    slug = unicodedata.normalize("NFKC", label).casefold()
+    slug = re.sub(r"[^\w\s+#&-]", "", slug)  # Keep c++, c#, r&b
+    slug = re.sub(r"[\s_-]+", " ", slug).strip()
+    return slug
+
+
+class InterestVocabulary:
+    """In-memory ID <-> label map backed by the interests table."""
+
+    def __init__(self):
+        self.ids_by_slug: Dict[str, int] = {}
+        self.labels_by_id: Dict[int, str] = {}
+        self.aliases: Dict[str, str] = dict(SYNONYMS)
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self, db: Session):
+        """(Re)load the vocabulary and aliases from the database."""
+        with self._lock:
+            rows = db.query(Interest.id, Interest.slug, Interest.label).all()
+            self.ids_by_slug = {row.slug: row.id for row in rows}
+            self.labels_by_id = {row.id: row.label for row in rows}
+
+            slugs_by_id = {row.id: row.slug for row in rows}
+            aliases = dict(SYNONYMS)
+            for alias, interest_id in db.query(InterestAlias.alias, InterestAlias.interest_id).all():
+                if interest_id in slugs_by_id:
+                    aliases[alias] = slugs_by_id[interest_id]
+            self.aliases = aliases
+            self._loaded = True
+
+    def _ensure_loaded(self, db: Session):
+        if not self._loaded:
+            self.load(db)
+
+    def canonical_slug(self, label: str) -> str:
+        """Normalize a label and fold synonyms onto their canonical slug."""
+        slug = normalize_interest(label)
+        return self.aliases.get(slug, slug)
+
+    def lookup(self, db: Session, labels: Optional[Iterable[str]]) -> List[int]:
+        """
+        Map labels to existing interest IDs without creating new ones.
+        Unknown labels are dropped (useful for search filters).
+        """
+        self._ensure_loaded(db)
+        ids = []
+        for label in labels or []:
+            interest_id = self.ids_by_slug.get(self.canonical_slug(label))
+            if interest_id is not None and interest_id not in ids:
+                ids.append(interest_id)
+        return ids
+
+    def intern(self, db: Session, labels: Optional[Iterable[str]]) -> List[int]:
+        """
+        Map labels to interest IDs, creating canonical interests as needed.
+        New interests are inserted in the caller's transaction and only enter
+        the in-memory vocabulary once it commits.
+
+        Args:
+            db: Database session (caller commits)
+            labels: Free-text interests or tags
+
+        Returns:
+            Unique interest IDs in first-seen order
+        """
+        self._ensure_loaded(db)
+        pending: Dict[str, Tuple[int, str]] = db.info.setdefault("pending_interests", {})
+
+        slugs = []
+        missing: Dict[str, str] = {}
+        for label in labels or []:
+            display = " ".join(label.split())[:MAX_LABEL_LENGTH]
+            if not display:
+                continue
+            slug = self.canonical_slug(display)[:MAX_LABEL_LENGTH]  # NFKC can lengthen a label
+            if not slug:
+                continue
+            if slug not in slugs:
+                slugs.append(slug)
+            if slug not in self.ids_by_slug and slug not in pending:
+                missing.setdefault(slug, display)
+
+        if missing:
+            db.execute(
+                insert(Interest).values(
+                    [{"slug": slug, "label": label} for slug, label in missing.items()]
+                ).on_conflict_do_nothing(index_elements=["slug"])
+            )
+            rows = db.query(Interest.id, Interest.slug, Interest.label).filter(
+                Interest.slug.in_(list(missing))
+            ).all()
+            for row in rows:
+                pending[row.slug] = (row.id, row.label)
+
+        ids = []
+        for slug in slugs:
+            interest_id = self.ids_by_slug.get(slug)
+            if interest_id is None and slug in pending:
+                interest_id = pending[slug][0]
+            if interest_id is not None:
+                ids.append(interest_id)
+        return ids
+
+    def labels(self, db: Session, interest_ids: Optional[Iterable[int]]) -> List[str]:
+        """Map interest IDs back to their canonical display labels."""
+        self._ensure_loaded(db)
+        interest_ids = list(interest_ids or [])
+        pending = {interest_id: label for interest_id, label in db.info.get("pending_interests", {}).values()}
+        if any(interest_id not in self.labels_by_id and interest_id not in pending for interest_id in interest_ids):
+            # Created by another worker since we loaded
+            self.load(db)
+        labels_by_id = {**self.labels_by_id, **pending}
+        return [labels_by_id[interest_id] for interest_id in interest_ids if interest_id in labels_by_id]
+
+    def remember(self, pending: Dict[str, Tuple[int, str]]):
+        """Add interests created by a committed transaction."""
+        with self._lock:
+            for slug, (interest_id, label) in pending.items():
+                self.ids_by_slug[slug] = interest_id
+                self.labels_by_id[interest_id] = label
+
+    def forget(self, pending: Dict[str, Tuple[int, str]]):
+        """Drop interests from a rolled-back transaction that a reload may have picked up."""
+        with self._lock:
+            for slug, (interest_id, _) in pending.items():
+                if self.ids_by_slug.get(slug) == interest_id:
+                    del self.ids_by_slug[slug]
+                self.labels_by_id.pop(interest_id, None)
+
+
+# Process-wide vocabulary
+vocabulary = InterestVocabulary()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _remember_pending(session: Session):
+    vocabulary.remember(session.info.pop("pending_interests", {}))
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_pending(session: Session):
+    vocabulary.forget(session.info.pop("pending_interests", {}))
+
+
+def set_user_interests(db: Session, user: User, labels: Optional[Iterable[str]]):
+    """Intern a user's interests and store canonical labels, IDs and MinHash signature (caller commits)."""
+    interest_ids = vocabulary.intern(db, labels)
+    user.interest_ids = interest_ids
+    user.interests = vocabulary.labels(db, interest_ids)
+    user.interest_minhash = hasher.signature_bytes(interest_ids)
+
+
+def set_event_tags(db: Session, event: Event, labels: Optional[Iterable[str]]):
+    """Intern an event's tags and store both canonical labels and IDs (caller commits)."""
+    tag_ids = vocabulary.intern(db, labels)
+    event.tag_ids = tag_ids
+    event.tags = vocabulary.labels(db, tag_ids)
+
+
+def backfill(batch_size: int = 1000):
+    """Populate interest_ids / tag_ids for rows written before the vocabulary existed."""
+    db = SessionLocal()
+    try:
+        for model, labels_column, ids_column in ((User, "interests", "interest_ids"), (Event, "tags", "tag_ids")):
+            updated = 0
+            while True:
+                rows = db.query(model).filter(getattr(model, ids_column).is_(None)).limit(batch_size).all()
+                if not rows:
+                    break
+                for row in rows:
+                    setter = set_user_interests if model is User else set_event_tags
+                    setter(db, row, getattr(row, labels_column))
+                db.commit()
+                updated += len(rows)
+            print(f"[INTERESTS] Backfilled {updated} {model.__tablename__}")
+
+        # Users interned before MinHash signatures were stored
+        updated = 0
+        while True:
+            users = db.query(User).filter(
+                User.interest_minhash.is_(None),
+                User.interest_ids.isnot(None)
+            ).limit(batch_size).all()
+            if not users:
+                break
+            for user in users:
+                user.interest_minhash = hasher.signature_bytes(user.interest_ids)
+            db.commit()
+            updated += len(users)
+        print(f"[INTERESTS] Backfilled MinHash signatures for {updated} users")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        backfill()
+    else:
+        print(__doc__)
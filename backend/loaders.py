@@ -0,0 +1,59 @@
+"""
+Shared loading helpers for list endpoints.
+Related users are fetched with eager loading and attendee counts are stored on
+events, so a listing runs a fixed number of queries whatever its row count.
+"""
+from typing import Dict, List, Tuple
+from sqlalchemy.orm import Session, Query, joinedload
+from models import DateRequest, Event, Message
+
+
+def date_request_query(db: Session) -> Query:
+    """Query date requests with sender and receiver joined in."""
+    return db.query(DateRequest).options(
+        joinedload(DateRequest.sender),
+        joinedload(DateRequest.receiver)
+    )
+
+
+def message_query(db: Session) -> Query:
+    """Query messages with sender and receiver joined in."""
+    return db.query(Message).options(
+        joinedload(Message.sender),
+        joinedload(Message.receiver)
+    )
+
+
+def event_query(db: Session) -> Query:
+    """Query events with their creator joined in."""
+    return db.query(Event).options(joinedload(Event.creator))
+
+
+def event_payloads(events: List[Event]) -> List[dict]:
+    """
+    Build EventResponse dicts for events loaded through event_query.
+
+    Args:
+        events: Events with their creator already loaded
+
+    Returns:
+        One dict per event; attendee_count is read from the stored going counter
+    """
+    return [{**event.__dict__, "attendee_count": event.going_count} for event in events]
+
+
+def message_payloads(messages: List[Message], cursors: Dict[Tuple[int, int], int]) -> List[dict]:
+    """
+    Build MessageResponse dicts for messages loaded through message_query.
+
+    Args:
+        messages: Messages with sender and receiver already loaded
+        cursors: Read cursors from conversations.read_cursors
+
+    Returns:
+        One dict per message; is_read compares the ID to the receiver's cursor
+    """
+    return [
+        {**message.__dict__, "is_read": message.id <= cursors.get((message.receiver_id, message.sender_id), 0)}
+        for message in messages
+    ]
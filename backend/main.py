@@ -2,26 +2,43 @@
 Main FastAPI application.
 Defines all API routes and endpoints.
 """
-from fastapi import FastAPI, Depends, HTTPException, status, Header
+import asyncio
+from fastapi import FastAPI, Depends, HTTPException, status, Header, Query, Response, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime, timedelta
+from typing import List, Optional
+from datetime import date, datetime, timedelta
 
 from database import get_db, engine, Base
-from models import User, DateRequest, Event, EventAttendee, Message
+from models import User, DateRequest, Event, Message
 from schemas import (
     UserCreate, UserResponse, UserUpdate, UserLogin, Token,
     UserRegisterStep1, UserRegisterStep2, EmailOnly, GoogleAuthRequest,
-    DateRequestCreate, DateRequestResponse, DateRequestUpdate,
-    EventCreate, EventResponse, EventUpdate, EventRSVP,
-    MessageCreate, MessageResponse, MatchResponse, VerificationRequest
+    DateRequestCreate, DateRequestResponse, DateRequestUpdate, DateRequestPage,
+    EventCreate, EventResponse, EventUpdate, EventRSVP, EventPage, TagFacet,
+    MessageCreate, MessageResponse, MessagePage, ConversationPage, ConversationReadUpdate, MatchResponse, MatchPage, VerificationRequest
 )
 from auth import get_password_hash, verify_password, create_access_token
 from dependencies import get_current_user, get_current_verified_user
 from email_service import generate_verification_token, send_verification_email, get_verification_token_expiry
 from matching import get_recommended_matches
+from match_snapshots import get_match_page
+from embeddings import refresh_user_embedding_later
+from ann_index import save_index
+from recommendations import schedule_refresh
+from interests import set_user_interests, set_event_tags
+from loaders import date_request_query, message_query, event_query, event_payloads, message_payloads
+from conversations import get_conversations, mark_conversation_read, read_cursors, record_message
+from rsvps import set_rsvp, promote_waitlist
+from event_feed import get_tag_facets, update_tag_counts
+from pagination import paginate
+from feed_cache import get_cached_event_feed, feed_cache, notify_event_change, event_change, EventChange
+from event_recommendations import get_recommended_event_ids, invalidate_event_matrix, invalidate_user as invalidate_event_recommendations
+from minhash import lsh_index_user
+from change_feed import start_change_feed, stop_change_feed
+from realtime import socket_app, start_session_sweep, publish_message, publish_read_receipt, publish_date_request, publish_rsvp
+from pubsub import broker, metrics as realtime_metrics
 from google_auth import verify_google_token, validate_usc_email
 from config import settings
 
@@ -36,19 +53,8 @@ app = FastAPI(
 )
 
 # Configure CORS
-# Allow common Vite dev server ports
-allowed_origins = [
-    settings.FRONTEND_URL,
-    "http://localhost:5173",
-    "http://localhost:5174",
-    "http://localhost:5175",
-    "http://localhost:5176",
-    "http://localhost:3000",
-    "http://127.0.0.1:5173",
-    "http://127.0.0.1:5174",
-    "http://127.0.0.1:5175",
-    "http://127.0.0.1:5176",
-]
+# Allow the frontend and common Vite dev server ports (shared with Socket.IO)
+allowed_origins = settings.allowed_origins
 
 app.add_middleware(
     CORSMiddleware,
@@ -58,11 +64,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Socket.IO endpoint for real-time messages (clients connect with path "/ws/socket.io")
+app.mount("/ws", socket_app)
+
+
+@app.on_event("startup")
+def start_matching_change_feed():
+    """Keep this worker's in-memory matching indexes in sync with changes made by other workers."""
+    if settings.CHANGE_FEED_ENABLED:
+        start_change_feed()
+
+
+@app.on_event("startup")
+async def attach_realtime_broker():
+    """Deliver real-time events published by any worker to this worker's sockets."""
+    broker.attach(asyncio.get_running_loop())
+    start_session_sweep()
+
+
+@app.on_event("shutdown")
+def persist_matching_indexes():
+    """Save in-memory matching indexes so the next worker boot can skip rebuilding them."""
+    stop_change_feed()
+    save_index()
+
 
 # ==================== AUTHENTICATION ROUTES ====================
 
 @app.post("/api/auth/google", response_model=dict)
-async def google_auth(auth_data: GoogleAuthRequest, db: Session = Depends(get_db)):
+async def google_auth(auth_data: GoogleAuthRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Authenticate with Google OAuth.
     Verifies the Google token and checks if email is @usc.edu.
@@ -120,7 +150,8 @@ async def google_auth(auth_data: GoogleAuthRequest, db: Session = Depends(get_db
     if user:
         # Existing user - login
         # Mark as verified if not already
-        if not user.is_verified:
+        newly_verified = not user.is_verified
+        if newly_verified:
             user.is_verified = True
         
         # Update avatar if available
@@ -129,6 +160,10 @@ async def google_auth(auth_data: GoogleAuthRequest, db: Session = Depends(get_db
         
         db.commit()
         db.refresh(user)
+        background_tasks.add_task(refresh_user_embedding_later, user.id)
+        if newly_verified:
+            schedule_refresh(db, user.id)
+            lsh_index_user(user)
         
         # Create access token
         access_token = create_access_token(data={"sub": user.id})
@@ -161,6 +196,7 @@ async def google_auth(auth_data: GoogleAuthRequest, db: Session = Depends(get_db
             school=school_name,
             year="",  # Will be filled in step 2
             interests=[],
+            interest_ids=[],
             avatar_url=google_user.get('picture'),
             is_verified=True,  # Google OAuth already verifies email
             profile_completed=False,
@@ -283,6 +319,7 @@ async def register_with_email(email_data: EmailOnly, db: Session = Depends(get_d
         school=school_name,
         year="",  # Will be filled in step 2
         interests=[],
+        interest_ids=[],
         is_verified=False,  # Will be verified after SSO
         profile_completed=False,
         verification_token=verification_token,
@@ -341,6 +378,7 @@ async def register_step1(user_data: UserRegisterStep1, db: Session = Depends(get
         school=school_name,
         year="",  # Will be filled in step 2
         interests=[],
+        interest_ids=[],
         is_verified=False,
         profile_completed=False,
         verification_token=verification_token,
@@ -367,6 +405,7 @@ async def register_step1(user_data: UserRegisterStep1, db: Session = Depends(get
 @app.post("/api/auth/register-step2", response_model=dict, status_code=status.HTTP_200_OK)
 async def register_step2(
     user_data: UserRegisterStep2,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     authorization: str = Header(None, alias="Authorization")
 ):
@@ -419,7 +458,7 @@ async def register_step2(
     user.name = user_data.name
     user.school = user_data.school
     user.year = user_data.year
-    user.interests = user_data.interests or []
+    set_user_interests(db, user, user_data.interests)
     user.height_cm = user_data.height_cm
     user.weight_kg = user_data.weight_kg
     user.nationality = user_data.nationality
@@ -429,6 +468,9 @@ async def register_step2(
     
     db.commit()
     db.refresh(user)
+    background_tasks.add_task(refresh_user_embedding_later, user.id)
+    schedule_refresh(db, user.id)
+    lsh_index_user(user)
     
     # Send verification email
     send_verification_email(user.email, user.verification_token, user.name)
@@ -477,7 +519,6 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         name=user_data.name,
         school=user_data.school,
         year=user_data.year,
-        interests=user_data.interests or [],
         height_cm=user_data.height_cm,
         weight_kg=user_data.weight_kg,
         nationality=user_data.nationality,
@@ -488,6 +529,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         verification_token=verification_token,
         verification_token_expires=get_verification_token_expiry()
     )
+    set_user_interests(db, new_user, user_data.interests)
     
     db.add(new_user)
     db.commit()
@@ -521,7 +563,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
 
 
 @app.post("/api/auth/verify-email", response_model=dict)
-async def verify_email(verification: VerificationRequest, db: Session = Depends(get_db)):
+async def verify_email(verification: VerificationRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Verify user email using verification token.
     """
@@ -551,6 +593,9 @@ async def verify_email(verification: VerificationRequest, db: Session = Depends(
     user.verification_token_expires = None
     
     db.commit()
+    background_tasks.add_task(refresh_user_embedding_later, user.id)
+    schedule_refresh(db, user.id)
+    lsh_index_user(user)
     
     return {"message": "Email verified successfully"}
 
@@ -566,6 +611,7 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 @app.put("/api/users/me", response_model=UserResponse)
 async def update_current_user(
     user_update: UserUpdate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_verified_user),
     db: Session = Depends(get_db)
 ):
@@ -577,7 +623,7 @@ async def update_current_user(
     if user_update.year is not None:
         current_user.year = user_update.year
     if user_update.interests is not None:
-        current_user.interests = user_update.interests
+        set_user_interests(db, current_user, user_update.interests)
     if user_update.avatar_url is not None:
         current_user.avatar_url = user_update.avatar_url
     if user_update.height_cm is not None:
@@ -596,6 +642,18 @@ async def update_current_user(
     db.commit()
     db.refresh(current_user)
     
+    if user_update.interests is not None:
+        invalidate_event_recommendations(current_user.id)
+    
+    # Re-embed the profile only if a field that feeds the embedding changed
+    if any(value is not None for value in (user_update.name, user_update.school, user_update.year, user_update.interests)):
+        background_tasks.add_task(refresh_user_embedding_later, current_user.id)
+    
+    # Rescore cached recommendations only if a scoring field changed
+    if any(value is not None for value in (user_update.school, user_update.year, user_update.interests)):
+        schedule_refresh(db, current_user.id)
+        lsh_index_user(current_user)
+    
     return current_user
 
 
@@ -628,10 +686,32 @@ async def get_matches(
     Get recommended matches for current user.
     Supports basic matching and optional AI-powered matching.
     """
-    matches = get_recommended_matches(db, current_user.id, limit=limit, use_ai=use_ai)
+    matches = await get_recommended_matches(db, current_user.id, limit=limit, use_ai=use_ai)
     return matches
 
 
+@app.get("/api/matches/browse", response_model=MatchPage)
+async def browse_matches(
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    use_ai: bool = False,
+    current_user: User = Depends(get_current_verified_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Page through recommended matches.
+    The first call ranks candidates and returns next_cursor; passing it back
+    returns the next page of the same ranking.
+    """
+    try:
+        return await get_match_page(db, current_user.id, limit=limit, cursor=cursor, use_ai=use_ai)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 # ==================== DATE REQUEST ROUTES ====================
 
 @app.post("/api/date-requests", response_model=DateRequestResponse, status_code=status.HTTP_201_CREATED)
@@ -678,25 +758,24 @@ async def create_date_request(
     
     db.add(new_request)
     db.commit()
-    db.refresh(new_request)
-    
-    # Load relationships
-    db.refresh(new_request, ["sender", "receiver"])
     
-    return new_request
+    return date_request_query(db).filter(DateRequest.id == new_request.id).one()
 
 
-@app.get("/api/date-requests", response_model=List[DateRequestResponse])
+@app.get("/api/date-requests", response_model=DateRequestPage)
 async def get_date_requests(
     status_filter: str = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_verified_user),
     db: Session = Depends(get_db)
 ):
     """
-    Get date requests for current user.
+    Get date requests for current user, newest first.
     Can filter by status: 'pending', 'accepted', 'rejected'.
+    Pass next_cursor from the previous page as cursor to get the next page.
     """
-    query = db.query(DateRequest).filter(
+    query = date_request_query(db).filter(
         (DateRequest.sender_id == current_user.id) |
         (DateRequest.receiver_id == current_user.id)
     )
@@ -704,13 +783,15 @@ async def get_date_requests(
     if status_filter:
         query = query.filter(DateRequest.status == status_filter)
     
-    requests = query.order_by(DateRequest.created_at.desc()).all()
-    
-    # Load relationships
-    for req in requests:
-        db.refresh(req, ["sender", "receiver"])
+    try:
+        date_requests, next_cursor = paginate(query, [DateRequest.created_at, DateRequest.id], limit, cursor, descending=True)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    return requests
+    return {"items": date_requests, "next_cursor": next_cursor}
 
 
 @app.put("/api/date-requests/{request_id}", response_model=DateRequestResponse)
@@ -721,7 +802,7 @@ async def update_date_request(
     db: Session = Depends(get_db)
 ):
     """Update date request status (accept or reject)."""
-    date_request = db.query(DateRequest).filter(DateRequest.id == request_id).first()
+    date_request = date_request_query(db).filter(DateRequest.id == request_id).first()
     
     if not date_request:
         raise HTTPException(
@@ -743,11 +824,10 @@ async def update_date_request(
         )
     
     date_request.status = update.status
+    response = publish_date_request(db, date_request)
     db.commit()
-    db.refresh(date_request)
-    db.refresh(date_request, ["sender", "receiver"])
     
-    return date_request
+    return response
 
 
 # ==================== EVENT ROUTES ====================
@@ -765,54 +845,116 @@ async def create_event(
         description=event.description,
         location=event.location,
         event_time=event.event_time,
-        tags=event.tags or [],
         max_attendees=event.max_attendees,
         image_url=event.image_url
     )
+    set_event_tags(db, new_event, event.tags)
     
     db.add(new_event)
+    update_tag_counts(db, None, None, new_event.tag_ids, new_event.event_time)
+    db.flush()
+    change = event_change(new_event)
+    notify_event_change(db, change)
     db.commit()
-    db.refresh(new_event)
-    db.refresh(new_event, ["creator"])
-    
-    # Get attendee count
-    attendee_count = db.query(EventAttendee).filter(
-        EventAttendee.event_id == new_event.id,
-        EventAttendee.rsvp_status == "going"
-    ).count()
-    
-    event_dict = {
-        **new_event.__dict__,
-        "attendee_count": attendee_count
-    }
+    feed_cache.invalidate(change)
+    invalidate_event_matrix()
     
-    return event_dict
+    new_event = event_query(db).filter(Event.id == new_event.id).one()
+    return event_payloads([new_event])[0]
 
 
-@app.get("/api/events", response_model=List[EventResponse])
+@app.get("/api/events", response_model=EventPage)
 async def get_events(
     limit: int = 20,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_verified_user),
     db: Session = Depends(get_db)
 ):
-    """Get all events, ordered by event time."""
-    events = db.query(Event).order_by(Event.event_time.asc()).limit(limit).all()
-    
-    result = []
-    for event in events:
-        db.refresh(event, ["creator"])
-        attendee_count = db.query(EventAttendee).filter(
-            EventAttendee.event_id == event.id,
-            EventAttendee.rsvp_status == "going"
-        ).count()
-        
-        event_dict = {
-            **event.__dict__,
-            "attendee_count": attendee_count
-        }
-        result.append(event_dict)
+    """
+    Get events that are not archived yet, ordered by event time.
+    Past events are flagged archived by the event_feed archive job; use
+    /api/events/feed for time windows and tag filters.
+    Pass next_cursor from the previous page as cursor to get the next page.
+    """
+    try:
+        # Served by idx_events_live_time_id
+        query = event_query(db).filter(Event.archived == False)
+        events, next_cursor = paginate(query, [Event.event_time, Event.id], limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return {"items": event_payloads(events), "next_cursor": next_cursor}
+
+
+@app.get("/api/events/feed", response_model=EventPage)
+def get_events_feed(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    tags: Optional[List[str]] = Query(None),
+    tag_match: str = "any",
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_verified_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Browse events in a time window (default: upcoming), ordered by event time.
+    Filter by tags with tag_match "any" (default) or "all".
+    Pass next_cursor from the previous page as cursor to get the next page.
+    Pages are served from a cache that event writes invalidate. A plain def, so
+    requests waiting on another request's cache miss block a threadpool thread,
+    not the event loop.
+    """
+    if limit < 1 or limit > 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="limit must be between 1 and 100"
+        )
+    
+    try:
+        body = get_cached_event_feed(db, start=start, end=end, tags=tags, tag_match=tag_match, limit=limit, cursor=cursor)
+        return Response(content=body, media_type="application/json")
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@app.get("/api/events/facets", response_model=List[TagFacet])
+async def get_event_facets(
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    current_user: User = Depends(get_current_verified_user),
+    db: Session = Depends(get_db)
+):
+    """Get event tags with their number of upcoming events, most common first."""
+    return get_tag_facets(db, start=start, end=end)
+
+
+@app.get("/api/events/recommended", response_model=List[EventResponse])
+async def get_recommended_events(
+    limit: int = 20,
+    current_user: User = Depends(get_current_verified_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get upcoming events ranked by how well their tags fit the current user's
+    interests and RSVP history. Events the user already responded to are left out.
+    """
+    if limit < 1 or limit > 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="limit must be between 1 and 100"
+        )
     
-    return result
+    ranking = get_recommended_event_ids(db, current_user, limit)
+    events = {event.id: event for event in event_query(db).filter(Event.id.in_([event_id for event_id, _ in ranking]))}
+    # Events deleted since the ranking was cached are skipped
+    return event_payloads([events[event_id] for event_id, _ in ranking if event_id in events])
 
 
 @app.get("/api/events/{event_id}", response_model=EventResponse)
@@ -822,7 +964,7 @@ async def get_event(
     db: Session = Depends(get_db)
 ):
     """Get event details by ID."""
-    event = db.query(Event).filter(Event.id == event_id).first()
+    event = event_query(db).filter(Event.id == event_id).first()
     
     if not event:
         raise HTTPException(
@@ -830,18 +972,7 @@ async def get_event(
             detail="Event not found"
         )
     
-    db.refresh(event, ["creator"])
-    attendee_count = db.query(EventAttendee).filter(
-        EventAttendee.event_id == event.id,
-        EventAttendee.rsvp_status == "going"
-    ).count()
-    
-    event_dict = {
-        **event.__dict__,
-        "attendee_count": attendee_count
-    }
-    
-    return event_dict
+    return event_payloads([event])[0]
 
 
 @app.put("/api/events/{event_id}", response_model=EventResponse)
@@ -866,6 +997,7 @@ async def update_event(
             detail="Only the creator can update the event"
         )
     
+    old_tag_ids, old_time = event.tag_ids, event.event_time
     if event_update.title is not None:
         event.title = event_update.title
     if event_update.description is not None:
@@ -874,28 +1006,27 @@ async def update_event(
         event.location = event_update.location
     if event_update.event_time is not None:
         event.event_time = event_update.event_time
+        event.archived = False  # Re-archived by the archive job if it is still in the past
     if event_update.tags is not None:
-        event.tags = event_update.tags
+        set_event_tags(db, event, event_update.tags)
     if event_update.max_attendees is not None:
         event.max_attendees = event_update.max_attendees
     if event_update.image_url is not None:
         event.image_url = event_update.image_url
     
-    db.commit()
-    db.refresh(event)
-    db.refresh(event, ["creator"])
-    
-    attendee_count = db.query(EventAttendee).filter(
-        EventAttendee.event_id == event.id,
-        EventAttendee.rsvp_status == "going"
-    ).count()
+    update_tag_counts(db, old_tag_ids, old_time, event.tag_ids, event.event_time)
     
-    event_dict = {
-        **event.__dict__,
-        "attendee_count": attendee_count
-    }
+    # Raising the capacity lets waitlisted users in
+    db.flush()
+    promote_waitlist(db, event_id)
+    change = event_change(event, old_time, old_tag_ids)
+    notify_event_change(db, change)
+    db.commit()
+    feed_cache.invalidate(change)
+    invalidate_event_matrix()
     
-    return event_dict
+    event = event_query(db).filter(Event.id == event_id).one()
+    return event_payloads([event])[0]
 
 
 @app.post("/api/events/{event_id}/rsvp", response_model=dict)
@@ -905,36 +1036,31 @@ async def rsvp_to_event(
     current_user: User = Depends(get_current_verified_user),
     db: Session = Depends(get_db)
 ):
-    """RSVP to an event (going, interested, or declined)."""
-    event = db.query(Event).filter(Event.id == event_id).first()
+    """
+    RSVP to an event (going, interested, or declined).
+    Going to a full event joins its waitlist instead.
+    """
+    rsvp_status = set_rsvp(db, event_id, current_user.id, rsvp.rsvp_status)
     
-    if not event:
+    if rsvp_status is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Event not found"
         )
     
-    # Check if RSVP already exists
-    existing_rsvp = db.query(EventAttendee).filter(
-        EventAttendee.event_id == event_id,
-        EventAttendee.user_id == current_user.id
-    ).first()
+    event = db.query(Event).filter(Event.id == event_id).one()
+    publish_rsvp(db, event, current_user.id, rsvp_status)
+    # Counters changed, so cached pages showing this event are stale; the user's event
+    # recommendations change too, in every worker
+    change = EventChange(event.id, user_id=current_user.id)
+    notify_event_change(db, change)
+    db.commit()
+    feed_cache.invalidate(change)
+    invalidate_event_recommendations(current_user.id)
     
-    if existing_rsvp:
-        # Update existing RSVP
-        existing_rsvp.rsvp_status = rsvp.rsvp_status
-        db.commit()
-        return {"message": "RSVP updated successfully"}
-    else:
-        # Create new RSVP
-        new_rsvp = EventAttendee(
-            event_id=event_id,
-            user_id=current_user.id,
-            rsvp_status=rsvp.rsvp_status
-        )
-        db.add(new_rsvp)
-        db.commit()
-        return {"message": "RSVP created successfully"}
+    if rsvp_status == "waitlisted":
+        return {"message": "Event is full, you have been added to the waitlist", "rsvp_status": rsvp_status}
+    return {"message": "RSVP saved successfully", "rsvp_status": rsvp_status}
 
 
 # ==================== MESSAGE ROUTES ====================
@@ -963,47 +1089,55 @@ async def create_message(
     new_message = Message(
         sender_id=current_user.id,
         receiver_id=message.receiver_id,
-        content=message.content,
-        is_read=False
+        content=message.content
     )
     
     db.add(new_message)
+    db.flush()
+    record_message(db, new_message.id)
+    
+    response = publish_message(db, message_query(db).filter(Message.id == new_message.id).one())
     db.commit()
-    db.refresh(new_message)
-    db.refresh(new_message, ["sender", "receiver"])
     
-    return new_message
+    return response
 
 
-@app.get("/api/messages", response_model=List[MessageResponse])
+@app.get("/api/messages", response_model=MessagePage)
 async def get_messages(
     other_user_id: int = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_verified_user),
     db: Session = Depends(get_db)
 ):
     """
-    Get messages for current user.
+    Get messages for current user, newest first.
     If other_user_id is provided, returns conversation with that user.
     Otherwise, returns all messages.
+    Pass next_cursor from the previous page as cursor to get older messages.
     """
     if other_user_id:
         # Get conversation with specific user
-        messages = db.query(Message).filter(
+        query = message_query(db).filter(
             ((Message.sender_id == current_user.id) & (Message.receiver_id == other_user_id)) |
             ((Message.sender_id == other_user_id) & (Message.receiver_id == current_user.id))
-        ).order_by(Message.created_at.asc()).all()
+        )
     else:
         # Get all messages involving current user
-        messages = db.query(Message).filter(
+        query = message_query(db).filter(
             (Message.sender_id == current_user.id) |
             (Message.receiver_id == current_user.id)
-        ).order_by(Message.created_at.desc()).all()
+        )
     
-    # Load relationships
-    for msg in messages:
-        db.refresh(msg, ["sender", "receiver"])
+    try:
+        messages, next_cursor = paginate(query, [Message.created_at, Message.id], limit, cursor, descending=True)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    return messages
+    return {"items": message_payloads(messages, read_cursors(db, current_user.id, other_user_id)), "next_cursor": next_cursor}
 
 
 @app.put("/api/messages/{message_id}/read", response_model=MessageResponse)
@@ -1012,8 +1146,8 @@ async def mark_message_read(
     current_user: User = Depends(get_current_verified_user),
     db: Session = Depends(get_db)
 ):
-    """Mark a message as read."""
-    message = db.query(Message).filter(Message.id == message_id).first()
+    """Mark a message, and everything before it in the conversation, as read."""
+    message = message_query(db).filter(Message.id == message_id).first()
     
     if not message:
         raise HTTPException(
@@ -1027,12 +1161,56 @@ async def mark_message_read(
             detail="Only the receiver can mark messages as read"
         )
     
-    message.is_read = True
+    cursor = mark_conversation_read(db, current_user.id, message.sender_id, message.id)
+    publish_read_receipt(db, current_user.id, message.sender_id, cursor)
+    response = MessageResponse.model_validate(message_payloads([message], {(current_user.id, message.sender_id): cursor})[0])
+    db.commit()
+    
+    return response
+
+
+@app.get("/api/conversations", response_model=ConversationPage)
+async def list_conversations(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_verified_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the current user's conversations (partner, last message, unread count), most recent first.
+    Pass next_cursor from the previous page as cursor to get the next page.
+    """
+    try:
+        return get_conversations(db, current_user.id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@app.put("/api/conversations/{other_user_id}/read", response_model=dict)
+async def mark_conversation_as_read(
+    other_user_id: int,
+    update: ConversationReadUpdate,
+    current_user: User = Depends(get_current_verified_user),
+    db: Session = Depends(get_db)
+):
+    """Mark messages from another user read up to a message (or all of them) in one write."""
+    cursor = mark_conversation_read(db, current_user.id, other_user_id, update.up_to_message_id)
+    if cursor is not None:
+        publish_read_receipt(db, current_user.id, other_user_id, cursor)
     db.commit()
-    db.refresh(message)
-    db.refresh(message, ["sender", "receiver"])
     
-    return message
+    return {"last_read_message_id": cursor}
+
+
+# ==================== REAL-TIME ====================
+
+@app.get("/api/realtime/metrics")
+async def get_realtime_metrics(current_user: User = Depends(get_current_verified_user)):
+    """This worker's real-time fan-out metrics: publishes, deliveries, sockets reached and latency."""
+    return realtime_metrics.snapshot()
 
 
 # ==================== HEALTH CHECK ====================
@@ -0,0 +1,229 @@
+"""
+Offline all-pairs match batch job.
+Recomputes every verified user's top-K recommendations and bulk-writes them
+into the matches table (the recommendation cache used by /api/matches).
+
+Usage:
+    python match_batch.py [--workers 8] [--chunk-size 512] [--restart]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+import numpy as np
+from database import SessionLocal, engine
+from models import User
+from match_engine import CandidateMatrix
+from config import settings
+
+# Rows scored per matrix product inside a worker; bounds the (rows x users) score matrix
+BLOCK_SIZE = 64
+
+# CandidateMatrix attributes copied into shared memory for worker processes (one segment each)
+_SHARED_ARRAYS = ("user_ids", "school_codes", "year_codes", "interest_bits", "interest_counts")
+
+# Set in each worker by _attach_shared_matrix
+_worker_matrix = None
+_worker_segments = []
+
+
+def _share_matrix(matrix: CandidateMatrix) -> Tuple[List[shared_memory.SharedMemory], Dict[str, tuple]]:
+    """Copy the matrix arrays into shared memory once, returning descriptors workers can map."""
+    segments = []
+    descriptors = {}
+    for name in _SHARED_ARRAYS:
+        array = np.ascontiguousarray(getattr(matrix, name))
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        segments.append(segment)
+        descriptors[name] = (segment.name, array.shape, array.dtype.str)
+    return segments, descriptors
+
+
+def _attach_shared_matrix(descriptors: Dict[str, tuple]):
+    """Worker initializer: map the shared arrays without copying them."""
+    global _worker_matrix
+    arrays = {}
+    for name, (segment_name, shape, dtype) in descriptors.items():
+        segment = shared_memory.SharedMemory(name=segment_name)
+        _worker_segments.append(segment)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+
+    _worker_matrix = CandidateMatrix(
+        user_ids=arrays["user_ids"],
+        school_codes=arrays["school_codes"],
+        year_codes=arrays["year_codes"],
+        interest_bits=arrays["interest_bits"],
+        school_vocab={},
+        year_vocab={},
+        interest_vocab={},
+        interest_counts=arrays["interest_counts"]
+    )
+
+
+def _score_chunk(rows: np.ndarray, top_k: int) -> List[Tuple[int, List[Tuple[int, float]]]]:
+    """Worker task: top-K recommendations for each row in a chunk."""
+    results = []
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block = rows[start:start + BLOCK_SIZE]
+        for row, ranked in zip(block, _worker_matrix.top_k_members(block, top_k)):
+            results.append((int(_worker_matrix.user_ids[row]), ranked))
+    return results
+
+
+def build_chunks(matrix: CandidateMatrix, chunk_size: int) -> List[Tuple[str, np.ndarray]]:
+    """
+    Split users into school-based chunks of at most chunk_size rows.
+    Chunk keys use the school and the user ID range, so they stay stable
+    across restarts as long as the user set does not change.
+    """
+    schools = {code: school for school, code in matrix.school_vocab.items()}
+    order = np.lexsort((matrix.user_ids, matrix.school_codes))
+
+    chunks = []
+    boundaries = np.flatnonzero(np.diff(matrix.school_codes[order])) + 1
+    for group in np.split(order, boundaries):
+        if not len(group):
+            continue
+        school = schools.get(int(matrix.school_codes[group[0]]), "")
+        for start in range(0, len(group), chunk_size):
+            rows = group[start:start + chunk_size]
+            key = f"{school}|{matrix.user_ids[rows[0]]}-{matrix.user_ids[rows[-1]]}"
+            chunks.append((key, rows))
+    return chunks
+
+
+def write_results(results: List[Tuple[int, List[Tuple[int, float]]]]):
+    """
+    Replace the cached recommendations of the given users in one transaction,
+    streaming rows into a staging table with COPY.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for user_id, top_matches in results:
+        for other_id, score in top_matches:
+            writer.writerow((user_id, other_id, repr(score)))
+    buffer.seek(0)
+
+    owners = [user_id for user_id, _ in results]
+    states = [
+        (user_id, len(top_matches), top_matches[-1][1] if top_matches else None)
+        for user_id, top_matches in results
+    ]
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE match_batch_stage (
+                user1_id INTEGER, user2_id INTEGER, match_score FLOAT
+            ) ON COMMIT DROP
+        """)
+        cursor.copy_expert("COPY match_batch_stage (user1_id, user2_id, match_score) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute("DELETE FROM matches WHERE user1_id = ANY(%s)", (owners,))
+        cursor.execute("""
+            INSERT INTO matches (user1_id, user2_id, match_score)
+            SELECT user1_id, user2_id, match_score FROM match_batch_stage
+        """)
+        cursor.executemany("""
+            INSERT INTO recommendation_state (user_id, size, min_score, dirty, computed_at)
+            VALUES (%s, %s, %s, FALSE, NOW())
+            ON CONFLICT (user_id) DO UPDATE
+            SET size = EXCLUDED.size, min_score = EXCLUDED.min_score, dirty = FALSE, computed_at = EXCLUDED.computed_at
+        """, states)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+def load_checkpoint(path: str) -> set:
+    """Keys of chunks already written by a previous, interrupted run."""
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return set(json.load(f).get("completed", []))
+
+
+def save_checkpoint(path: str, completed: set):
+    """Atomically record completed chunk keys."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"completed": sorted(completed)}, f)
+    os.replace(tmp_path, path)
+
+
+def load_matrix() -> CandidateMatrix:
+    """Encode all verified users, streaming rows instead of hydrating ORM objects."""
+    db = SessionLocal()
+    try:
+        rows = db.query(User.id, User.school, User.year, User.interest_ids).filter(
+            User.is_verified == True
+        ).order_by(User.id).yield_per(10000)
+        return CandidateMatrix.from_rows(rows)
+    finally:
+        db.close()
+
+
+def run(workers: int, chunk_size: int, checkpoint_path: str, restart: bool):
+    """Run the batch job end to end."""
+    top_k = settings.RECOMMENDATION_CACHE_SIZE
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    started = time.time()
+    matrix = load_matrix()
+    print(f"[MATCH BATCH] Encoded {len(matrix)} verified users in {time.time() - started:.1f}s")
+
+    completed = load_checkpoint(checkpoint_path)
+    chunks = build_chunks(matrix, chunk_size)
+    pending = [(key, rows) for key, rows in chunks if key not in completed]
+    if completed:
+        print(f"[MATCH BATCH] Resuming: {len(chunks) - len(pending)}/{len(chunks)} chunks already done")
+
+    total_users = sum(len(rows) for _, rows in pending)
+    users_done = 0
+    segments, descriptors = _share_matrix(matrix)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared_matrix, initargs=(descriptors,)) as pool:
+            futures = {pool.submit(_score_chunk, rows, top_k): (key, len(rows)) for key, rows in pending}
+            for future in as_completed(futures):
+                key, n_rows = futures[future]
+                write_results(future.result())
+                completed.add(key)
+                save_checkpoint(checkpoint_path, completed)
+
+                users_done += n_rows
+                elapsed = time.time() - started
+                rate = users_done / elapsed if elapsed else 0.0
+                eta = (total_users - users_done) / rate if rate else 0.0
+                print(
+                    f"[MATCH BATCH] {len(completed)}/{len(chunks)} chunks, "
+                    f"{users_done}/{total_users} users, {rate:.0f} users/s, ETA {eta:.0f}s"
+                )
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    print(f"[MATCH BATCH] Done in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute cached match recommendations for all verified users.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--chunk-size", type=int, default=512, help="Maximum users per chunk")
+    parser.add_argument("--checkpoint", default="match_batch.checkpoint.json", help="Checkpoint file for resuming")
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    run(args.workers, args.chunk_size, args.checkpoint, args.restart)
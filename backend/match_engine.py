@@ -0,0 +1,326 @@
+"""
+Vectorized match scoring engine.
+Keeps candidate users in array form (integer codes and packed interest bitsets)
+so a whole candidate pool can be scored in a single NumPy pass.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Default feature weights (MATCH_FEATURE_WEIGHTS); the cache, batch job and SQL scoring use these
+SCHOOL_WEIGHT = 0.4
+YEAR_WEIGHT = 0.2
+INTEREST_WEIGHT = 0.4
+
+# float32 scores within this of the k-th best are rescored exactly in top_k_members()
+_FLOAT32_MARGIN = 1e-5
+
+# Number of set bits for every possible byte value
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def _popcount_rows(bits: np.ndarray) -> np.ndarray:
+    """Count set bits per row of a packed uint8 bit matrix."""
+    if bits.shape[1] == 0:
+        return np.zeros(bits.shape[0], dtype=np.int64)
+    return _POPCOUNT_TABLE[bits].sum(axis=1, dtype=np.int64)
+
+
+class CandidateMatrix:
+    """
+    Columnar representation of a candidate pool.
+
+    Attributes:
+        user_ids: int64 array of user IDs
+        school_codes: int32 array, one code per distinct school string
+        year_codes: int32 array, one code per distinct year string
+        interest_bits: uint8 matrix (n_users x n_bytes), one bit per distinct interest ID
+        interest_counts: number of distinct interests per user
+    """
+
+    def __init__(
+        self,
+        user_ids: np.ndarray,
+        school_codes: np.ndarray,
+        year_codes: np.ndarray,
+        interest_bits: np.ndarray,
+        school_vocab: Dict[str, int],
+        year_vocab: Dict[str, int],
+        interest_vocab: Dict[int, int],
+        interest_counts: Optional[np.ndarray] = None
+    ):
+        self.user_ids = user_ids
+        self.school_codes = school_codes
+        self.year_codes = year_codes
+        self.interest_bits = interest_bits
+        self.interest_counts = interest_counts if interest_counts is not None else _popcount_rows(interest_bits)
+        self.school_vocab = school_vocab
+        self.year_vocab = year_vocab
+        self.interest_vocab = interest_vocab
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, str, str, Optional[Sequence[int]]]]) -> "CandidateMatrix":
+        """
+        Build a matrix from (id, school, year, interest_ids) tuples.
+
+        Args:
+            rows: Iterable of plain tuples, e.g. from a column-only query
+
+        Returns:
+            CandidateMatrix for the given rows
+        """
+        school_vocab: Dict[str, int] = {}
+        year_vocab: Dict[str, int] = {}
+        interest_vocab: Dict[int, int] = {}
+
+        user_ids: List[int] = []
+        school_codes: List[int] = []
+        year_codes: List[int] = []
+        interest_positions: List[List[int]] = []
+
+        for user_id, school, year, interests in rows:
+            user_ids.append(user_id)
+            school_codes.append(school_vocab.setdefault(school, len(school_vocab)))
+            year_codes.append(year_vocab.setdefault(year, len(year_vocab)))
+            interest_positions.append(
+                [interest_vocab.setdefault(interest, len(interest_vocab)) for interest in interests or []]
+            )
+
+        n_users = len(user_ids)
+        dense = np.zeros((n_users, max(len(interest_vocab), 1)), dtype=bool)
+        for row, positions in enumerate(interest_positions):
+            if positions:
+                dense[row, positions] = True
+        interest_bits = np.packbits(dense, axis=1) if len(interest_vocab) else np.zeros((n_users, 0), dtype=np.uint8)
+
+        return cls(
+            user_ids=np.array(user_ids, dtype=np.int64),
+            school_codes=np.array(school_codes, dtype=np.int32),
+            year_codes=np.array(year_codes, dtype=np.int32),
+            interest_bits=interest_bits,
+            school_vocab=school_vocab,
+            year_vocab=year_vocab,
+            interest_vocab=interest_vocab
+        )
+
+    def encode_interests(self, interests: Optional[Sequence[int]]) -> np.ndarray:
+        """
+        Pack a user's interests into a bit row compatible with this matrix.
+        Interests that no candidate has are dropped here; they can never
+        intersect and only count towards the union size in score().
+        """
+        dense = np.zeros(self.interest_bits.shape[1] * 8, dtype=bool)
+        for interest in interests or []:
+            position = self.interest_vocab.get(interest)
+            if position is not None:
+                dense[position] = True
+        return np.packbits(dense)
+
+    def school_matches(self, school: str) -> np.ndarray:
+        """1.0 for candidates at the given school, else 0.0."""
+        return (self.school_codes == self.school_vocab.get(school, -1)).astype(np.float64)
+
+    def year_matches(self, year: str) -> np.ndarray:
+        """1.0 for candidates in the given year, else 0.0."""
+        return (self.year_codes == self.year_vocab.get(year, -1)).astype(np.float64)
+
+    def interest_jaccard(self, interests: Optional[Sequence[int]]) -> np.ndarray:
+        """Jaccard similarity between each candidate's interests and the given ones (0.0 if either is empty)."""
+        n_users = len(self)
+        jaccard = np.zeros(n_users, dtype=np.float64)
+
+        user_interests = set(interests or [])
+        if user_interests and n_users:
+            query_bits = self.encode_interests(user_interests)
+            common = _popcount_rows(self.interest_bits & query_bits)
+            total = self.interest_counts + len(user_interests) - common
+            np.divide(common, total, out=jaccard, where=(self.interest_counts > 0) & (total > 0))
+
+        return jaccard
+
+    def score(self, school: str, year: str, interests: Optional[Sequence[int]]) -> np.ndarray:
+        """
+        Score every candidate against one user profile with the default
+        weights (SCHOOL_WEIGHT, YEAR_WEIGHT, INTEREST_WEIGHT). The configurable
+        pipeline weighs the individual features with MATCH_FEATURE_WEIGHTS instead.
+
+        Args:
+            school: The user's school
+            year: The user's year
+            interests: The user's interest IDs
+
+        Returns:
+            float64 array of scores aligned with user_ids
+        """
+        scores = SCHOOL_WEIGHT * self.school_matches(school)
+        scores = scores + YEAR_WEIGHT * self.year_matches(year)
+        scores = scores + INTEREST_WEIGHT * self.interest_jaccard(interests)
+        return np.minimum(scores, 1.0)
+
+    def subset(self, rows: np.ndarray) -> "CandidateMatrix":
+        """Matrix restricted to the given rows (or boolean mask), sharing this matrix's vocabularies."""
+        return CandidateMatrix(
+            user_ids=self.user_ids[rows],
+            school_codes=self.school_codes[rows],
+            year_codes=self.year_codes[rows],
+            interest_bits=self.interest_bits[rows],
+            school_vocab=self.school_vocab,
+            year_vocab=self.year_vocab,
+            interest_vocab=self.interest_vocab,
+            interest_counts=self.interest_counts[rows]
+        )
+
+    def interest_columns(self, positions: np.ndarray) -> np.ndarray:
+        """Unpack selected interest bit columns into a dense float32 matrix (n_users x len(positions))."""
+        positions = np.asarray(positions, dtype=np.int64)
+        packed = self.interest_bits[:, positions >> 3]
+        return ((packed >> (7 - (positions & 7)).astype(np.uint8)) & 1).astype(np.float32)
+
+    def score_members(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Score several users of this matrix against every candidate at once.
+        Interest intersections come from one matrix product over only the
+        interest columns the given users actually have.
+
+        Args:
+            rows: Row indices of the users to score
+
+        Returns:
+            float32 matrix (len(rows) x n_users), half the memory of float64 per
+            block; a user's score against itself is -inf. Use top_k_members()
+            when the scores are stored, since they are rounded to float32.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        n_users = len(self)
+
+        scores = np.where(
+            self.school_codes[rows][:, None] == self.school_codes[None, :], np.float32(SCHOOL_WEIGHT), np.float32(0.0)
+        )
+        scores += np.where(
+            self.year_codes[rows][:, None] == self.year_codes[None, :], np.float32(YEAR_WEIGHT), np.float32(0.0)
+        )
+
+        member_bits = np.unpackbits(self.interest_bits[rows], axis=1)
+        positions = np.flatnonzero(member_bits.any(axis=0))
+        if len(positions) and n_users:
+            columns = self.interest_columns(positions)
+            common = member_bits[:, positions].astype(np.float32) @ columns.T
+            member_counts = self.interest_counts[rows][:, None].astype(np.float32)
+            total = member_counts + self.interest_counts[None, :].astype(np.float32) - common
+
+            has_interests = (member_counts > 0) & (self.interest_counts[None, :] > 0)
+            jaccard = np.divide(
+                common, total,
+                out=np.zeros((len(rows), n_users), dtype=np.float32),
+                where=has_interests & (total > 0)
+            )
+            jaccard *= np.float32(INTEREST_WEIGHT)
+            scores += jaccard
+
+        np.minimum(scores, np.float32(1.0), out=scores)
+        scores[np.arange(len(rows)), rows] = -np.inf
+        return scores
+
+    def score_pairs(self, row: int, candidate_rows: np.ndarray) -> np.ndarray:
+        """
+        Score one member against a few candidate rows in float64, with exactly
+        the arithmetic of score(), so results agree with the recommendation cache.
+        """
+        candidate_rows = np.asarray(candidate_rows, dtype=np.int64)
+        common = _popcount_rows(self.interest_bits[candidate_rows] & self.interest_bits[row])
+        counts = self.interest_counts[candidate_rows]
+        total = counts + self.interest_counts[row] - common
+        jaccard = np.zeros(len(candidate_rows), dtype=np.float64)
+        if self.interest_counts[row] > 0:
+            np.divide(common, total, out=jaccard, where=(counts > 0) & (total > 0))
+
+        scores = SCHOOL_WEIGHT * (self.school_codes[candidate_rows] == self.school_codes[row]).astype(np.float64)
+        scores = scores + YEAR_WEIGHT * (self.year_codes[candidate_rows] == self.year_codes[row]).astype(np.float64)
+        scores = scores + INTEREST_WEIGHT * jaccard
+        return np.minimum(scores, 1.0)
+
+    def top_k_members(self, rows: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k recommendations for several members of this matrix.
+        score_members() shortlists in float32; the shortlist (everything
+        within rounding of the k-th score) is then rescored with score_pairs().
+
+        Args:
+            rows: Row indices of the users to rank for
+            k: Number of candidates per user
+
+        Returns:
+            One list of (user_id, score) tuples per row, as top_k() would return
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        k = min(k, len(self) - 1)
+        if k <= 0:
+            return [[] for _ in rows]
+
+        results = []
+        for row, row_scores in zip(rows, self.score_members(rows)):
+            threshold = -np.partition(-row_scores, k - 1)[k - 1]
+            shortlist = np.flatnonzero(row_scores >= threshold - _FLOAT32_MARGIN)
+            shortlist = shortlist[shortlist != row]
+            results.append(select_top_k(self.user_ids[shortlist], self.score_pairs(row, shortlist), k))
+        return results
+
+    def top_k(self, scores: np.ndarray, k: int, exclude_user_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Select the k best candidates without sorting the whole pool.
+
+        Args:
+            scores: Output of score()
+            k: Number of candidates to return
+            exclude_user_id: Optional user ID to leave out (usually the requester)
+
+        Returns:
+            List of (user_id, score) tuples, highest score first, ties broken by user ID
+        """
+        return select_top_k(self.user_ids, scores, k, exclude_user_id)
+
+
+def select_top_k(
+    user_ids: np.ndarray,
+    scores: np.ndarray,
+    k: int,
+    exclude_user_id: Optional[int] = None
+) -> List[Tuple[int, float]]:
+    """
+    Select the k best scores without sorting the whole array.
+
+    Args:
+        user_ids: int64 array of user IDs
+        scores: float array of scores aligned with user_ids
+        k: Number of candidates to return
+        exclude_user_id: Optional user ID to leave out (usually the requester)
+
+    Returns:
+        List of (user_id, score) tuples, highest score first, ties broken by user ID
+    """
+    if exclude_user_id is not None:
+        scores = np.where(user_ids == exclude_user_id, -np.inf, scores)
+        k = min(k, int(np.count_nonzero(user_ids != exclude_user_id)))
+
+    n_users = len(scores)
+    k = min(k, n_users)
+    if k <= 0:
+        return []
+
+    if k < n_users:
+        # argpartition finds the k-th best score; candidates tied with it
+        # are then taken in user ID order so results stay deterministic
+        partitioned = np.argpartition(-scores, k - 1)
+        threshold = scores[partitioned[k - 1]]
+        above = np.flatnonzero(scores > threshold)
+        tied = np.flatnonzero(scores == threshold)
+        tied = tied[np.argsort(user_ids[tied], kind="stable")][:k - len(above)]
+        candidates = np.concatenate([above, tied])
+    else:
+        candidates = np.arange(n_users)
+
+    order = np.lexsort((user_ids[candidates], -scores[candidates]))
+    best = candidates[order]
+    return [(int(user_ids[i]), float(scores[i])) for i in best]
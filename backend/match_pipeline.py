@@ -0,0 +1,752 @@
+"""
+Configurable matching pipeline.
+A request runs candidate sources (a fallback chain), filters, feature extractors
+and a ranker; every stage is timed and reported to profiling hooks.
+"""
+import time
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, or_, text
+from sqlalchemy.orm import Session
+from models import User, DateRequest
+from match_engine import CandidateMatrix, select_top_k, SCHOOL_WEIGHT, YEAR_WEIGHT, INTEREST_WEIGHT
+from ann_index import get_index
+from recommendations import get_cached_recommendations
+from minhash import hasher, get_lsh_index
+from embeddings import load_embeddings, schedule_backfill, similarity_to_score
+from feature_store import get_feature_store
+from config import settings
+
+# Weights the recommendation cache and batch job are computed with
+DEFAULT_WEIGHTS = {"school": SCHOOL_WEIGHT, "year": YEAR_WEIGHT, "interests": INTEREST_WEIGHT}
+
+
+class StageTiming(NamedTuple):
+    """Wall time and candidate counts of one pipeline stage."""
+    stage: str  # "source", "filter", "load", "feature" or "rank"
+    name: str
+    seconds: float
+    candidates_in: int
+    candidates_out: int
+
+
+class MatchContext:
+    """State of one pipeline run, passed to every stage and to profiling hooks."""
+
+    def __init__(self, db: Session, user: User, limit: int, pipeline: str):
+        self.db = db
+        self.user = user
+        self.limit = limit
+        self.fetch_limit = limit  # What truncating sources return; raised when filters leave a page short
+        self.pipeline = pipeline
+        self.timings: List[StageTiming] = []
+        self.total_seconds = 0.0
+
+
+class Candidates:
+    """
+    Candidate user IDs plus optional data loaded along the way.
+
+    Attributes:
+        user_ids: int64 array of candidate IDs
+        matrix: Profile columns aligned with user_ids, if loaded
+        source_scores: Scores the source ranked by (e.g. ANN similarity), if any
+        embeddings: Embedding rows aligned with user_ids (feature store), if loaded
+        embedding_present: Bool array marking rows of embeddings that are real
+    """
+
+    def __init__(
+        self,
+        user_ids: np.ndarray,
+        matrix: Optional[CandidateMatrix] = None,
+        source_scores: Optional[np.ndarray] = None,
+        embeddings: Optional[np.ndarray] = None,
+        embedding_present: Optional[np.ndarray] = None
+    ):
+        self.user_ids = user_ids
+        self.matrix = matrix
+        self.source_scores = source_scores
+        self.embeddings = embeddings
+        self.embedding_present = embedding_present
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    @classmethod
+    def from_matrix(cls, matrix: CandidateMatrix) -> "Candidates":
+        return cls(matrix.user_ids, matrix=matrix)
+
+    @classmethod
+    def from_ranked(cls, ranked: List[Tuple[int, float]]) -> "Candidates":
+        return cls(
+            np.array([user_id for user_id, _ in ranked], dtype=np.int64),
+            source_scores=np.array([score for _, score in ranked], dtype=np.float64)
+        )
+
+    def merge(self, other: "Candidates") -> "Candidates":
+        """
+        Top these candidates up with a later source's. If other already holds
+        every candidate it is used as is (keeping its loaded data); otherwise
+        the union keeps IDs only and later stages reload what they need.
+        """
+        if np.isin(self.user_ids, other.user_ids).all():
+            return other
+        missing = ~np.isin(other.user_ids, self.user_ids)
+        return Candidates(np.concatenate([self.user_ids, other.user_ids[missing]]))
+
+    def subset(self, mask: np.ndarray) -> "Candidates":
+        if mask.all():
+            # Keep memory-mapped arrays shared instead of copying them
+            return self
+        return Candidates(
+            self.user_ids[mask],
+            matrix=self.matrix.subset(mask) if self.matrix is not None else None,
+            source_scores=self.source_scores[mask] if self.source_scores is not None else None,
+            embeddings=self.embeddings[mask] if self.embeddings is not None else None,
+            embedding_present=self.embedding_present[mask] if self.embedding_present is not None else None
+        )
+
+    def load_profiles(self, db: Session) -> "Candidates":
+        """Load profile columns for candidates that came without them, keeping the current order."""
+        if self.matrix is not None:
+            return self
+        rows = db.query(User.id, User.school, User.year, User.interest_ids).filter(
+            User.id.in_(self.user_ids.tolist())
+        ).all()
+        rows_by_id = {row[0]: row for row in rows}
+        present = np.array([int(user_id) in rows_by_id for user_id in self.user_ids], dtype=bool)
+        kept = self.subset(present)
+        kept.matrix = CandidateMatrix.from_rows(rows_by_id[int(user_id)] for user_id in kept.user_ids)
+        return kept
+
+
+# ==================== STAGE INTERFACES ====================
+
+class CandidateSource:
+    """
+    Produces the candidate pool. Returning None passes to the next source in the
+    chain; returning fewer than ctx.limit candidates lets the next sources top it up.
+    Sources that only query the database implement generate_sync(), which runs
+    in a worker thread so the event loop is not blocked.
+    """
+    name = "source"
+    truncates = False  # True if at most ctx.fetch_limit candidates are returned
+    applied_filters: FrozenSet[str] = frozenset()  # Filters the source already applies itself
+
+    async def generate(self, ctx: MatchContext) -> Optional[Candidates]:
+        return await run_in_threadpool(self.generate_sync, ctx)
+
+    def generate_sync(self, ctx: MatchContext) -> Optional[Candidates]:
+        raise NotImplementedError
+
+
+class CandidateFilter:
+    """
+    Drops candidates; returns a boolean keep-mask aligned with candidates.user_ids.
+    Like sources, database-backed filters implement apply_sync() to run in a worker thread.
+    """
+    name = "filter"
+
+    async def apply(self, ctx: MatchContext, candidates: Candidates) -> np.ndarray:
+        return await run_in_threadpool(self.apply_sync, ctx, candidates)
+
+    def apply_sync(self, ctx: MatchContext, candidates: Candidates) -> np.ndarray:
+        raise NotImplementedError
+
+
+class FeatureExtractor:
+    """Computes one 0-1 signal per candidate."""
+    name = "feature"
+    needs_profiles = False  # True if extract() reads candidates.matrix
+
+    async def extract(self, ctx: MatchContext, candidates: Candidates) -> np.ndarray:
+        raise NotImplementedError
+
+
+class Ranker:
+    """Orders candidates from their features and returns the top ctx.limit."""
+    name = "ranker"
+
+    def rank(self, ctx: MatchContext, candidates: Candidates, features: Dict[str, np.ndarray]) -> List[Tuple[int, float]]:
+        raise NotImplementedError
+
+
+# ==================== SOURCES ====================
+
+class AllVerifiedSource(CandidateSource):
+    """Every other verified user."""
+    name = "all"
+
+    def generate_sync(self, ctx: MatchContext) -> Optional[Candidates]:
+        # Load only the columns needed for scoring, not full ORM objects
+        rows = ctx.db.query(User.id, User.school, User.year, User.interest_ids).filter(
+            User.id != ctx.user.id,
+            User.is_verified == True
+        ).all()
+        return Candidates.from_matrix(CandidateMatrix.from_rows(rows))
+
+
+class FeatureStoreSource(CandidateSource):
+    """
+    Every verified user from the memory-mapped feature store (zero-copy; the
+    requester is excluded by the ranker). Profile edits made after the store
+    was built are picked up by the next rebuild (FEATURE_STORE_MAX_AGE_SECONDS).
+    Passes until a store has been built.
+    """
+    name = "store"
+
+    def generate_sync(self, ctx: MatchContext) -> Optional[Candidates]:
+        store = get_feature_store()
+        if store is None:
+            return None
+        return Candidates(
+            store.matrix.user_ids,
+            matrix=store.matrix,
+            embeddings=store.embeddings,
+            embedding_present=store.embedding_present
+        )
+
+
+class CachedSource(CandidateSource):
+    """
+    The precomputed top-K from the recommendation cache. A stale list is served
+    while it is recomputed in the background; a missing one passes (and is queued).
+    Only answers when limit fits in the cache.
+    """
+    name = "cache"
+    truncates = True
+
+    def generate_sync(self, ctx: MatchContext) -> Optional[Candidates]:
+        if ctx.limit > settings.RECOMMENDATION_CACHE_SIZE:
+            return None
+        ranked = get_cached_recommendations(
+            ctx.db, ctx.user.id, min(ctx.fetch_limit, settings.RECOMMENDATION_CACHE_SIZE)
+        )
+        if ranked is None:
+            return None
+        return Candidates.from_ranked(ranked)
+
+
+class LSHSource(CandidateSource):
+    """
+    Users LSH finds to have similar interests.
+    Approximate: users sharing school/year but few interests can be missed,
+    so when it finds fewer than limit candidates the next sources top them up.
+    """
+    name = "lsh"
+
+    def generate_sync(self, ctx: MatchContext) -> Optional[Candidates]:
+        signature = hasher.decode(ctx.user.interest_minhash, ctx.user.interest_ids)
+        candidate_ids = get_lsh_index(ctx.db).query(signature, exclude_user_id=ctx.user.id)
+        if not candidate_ids:
+            return None
+
+        rows = ctx.db.query(User.id, User.school, User.year, User.interest_ids).filter(
+            User.id.in_(candidate_ids),
+            User.is_verified == True
+        ).all()
+        return Candidates.from_matrix(CandidateMatrix.from_rows(rows))
+
+
+# Candidate filter shared by the scored and zero-score queries
+_SQL_CANDIDATE_FILTER = """
+    u.id != :user_id
+    AND u.is_verified = TRUE
+    AND u.profile_completed = TRUE
+    AND NOT EXISTS (
+        SELECT 1 FROM date_requests d
+        WHERE (d.sender_id = :user_id AND d.receiver_id = u.id)
+           OR (d.sender_id = u.id AND d.receiver_id = :user_id)
+    )
+"""
+
+# Rows that can score above zero: any of these predicates is index-backed
+# (GIN on interest_ids, btree on school and year), so Postgres can BitmapOr them
+_SQL_SCORABLE = """
+    (u.interest_ids && CAST(:interest_ids AS INTEGER[]) OR u.school = :school OR u.year = :year)
+"""
+
+_SQL_SCORED_MATCHES = text(f"""
+    SELECT u.id,
+        LEAST(1.0::float8,
+            CASE WHEN u.school = :school THEN CAST(:school_weight AS float8) ELSE 0.0::float8 END
+            + CASE WHEN u.year = :year THEN CAST(:year_weight AS float8) ELSE 0.0::float8 END
+            + CASE WHEN cardinality(CAST(:interest_ids AS INTEGER[])) > 0 AND cardinality(u.interest_ids) > 0 THEN
+                (SELECT count(DISTINCT i) FROM unnest(u.interest_ids) AS i WHERE i = ANY(CAST(:interest_ids AS INTEGER[])))::float8
+                / (SELECT count(DISTINCT i) FROM unnest(u.interest_ids || CAST(:interest_ids AS INTEGER[])) AS i)::float8
+                * CAST(:interest_weight AS float8)
+              ELSE 0.0::float8 END
+        ) AS match_score
+    FROM users u
+    WHERE {_SQL_CANDIDATE_FILTER} AND {_SQL_SCORABLE}
+    ORDER BY match_score DESC, u.id ASC
+    LIMIT :limit
+""")
+
+_SQL_ZERO_SCORE_MATCHES = text(f"""
+    SELECT u.id, 0.0::float8 AS match_score
+    FROM users u
+    WHERE {_SQL_CANDIDATE_FILTER} AND NOT COALESCE({_SQL_SCORABLE}, FALSE)
+    ORDER BY u.id ASC
+    LIMIT :limit
+""")
+
+
+class SQLScoredSource(CandidateSource):
+    """
+    The top rows by school/year/interest score, computed inside PostgreSQL
+    with the pipeline's weights. Also skips unfinished profiles and users
+    with an existing date request, so the LIMIT is applied after them.
+    """
+    name = "sql"
+    truncates = True
+    applied_filters = frozenset({"completed_profile", "no_date_request"})
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+
+    def generate_sync(self, ctx: MatchContext) -> Optional[Candidates]:
+        params = {
+            "user_id": ctx.user.id,
+            "school": ctx.user.school,
+            "year": ctx.user.year,
+            "interest_ids": sorted(set(ctx.user.interest_ids or [])),
+            "school_weight": self.weights.get("school", 0.0),
+            "year_weight": self.weights.get("year", 0.0),
+            "interest_weight": self.weights.get("interests", 0.0),
+            "limit": ctx.fetch_limit
+        }
+        rows = ctx.db.execute(_SQL_SCORED_MATCHES, params).all()
+        if len(rows) < ctx.fetch_limit:
+            # Pad with candidates that share nothing, as the Python scorer would
+            rows += ctx.db.execute(_SQL_ZERO_SCORE_MATCHES, {**params, "limit": ctx.fetch_limit - len(rows)}).all()
+        return Candidates.from_ranked([(row.id, row.match_score) for row in rows])
+
+
+class ANNSource(CandidateSource):
+    """
+    Nearest neighbours by profile embedding from the ANN index.
+    Ranks whatever the index holds; verified profiles without a stored embedding
+    (e.g. on a cold start) are embedded by a background backfill, not the request.
+    That is detected by comparing the index size with the verified-user count,
+    which is re-counted at most every ANN_VERIFIED_COUNT_TTL_SECONDS.
+    Passes if the requester has no embedding or no one else is indexed yet.
+    """
+    name = "ann"
+    truncates = True
+
+    def __init__(self):
+        self._verified_count = 0
+        self._counted_at: Optional[float] = None
+
+    def _load_index(self, db: Session):
+        """Blocking part: the index (loaded on first use) and the cached verified-user count."""
+        now = time.monotonic()
+        if self._counted_at is None or now - self._counted_at >= settings.ANN_VERIFIED_COUNT_TTL_SECONDS:
+            self._verified_count = db.query(func.count(User.id)).filter(User.is_verified == True).scalar()
+            self._counted_at = now
+        return get_index(db), self._verified_count
+
+    async def generate(self, ctx: MatchContext) -> Optional[Candidates]:
+        ids, matrix = await load_embeddings(ctx.db, [ctx.user.id])
+        if len(ids) == 0:
+            return None
+
+        index, verified_count = await run_in_threadpool(self._load_index, ctx.db)
+        if index is None or len(index) < verified_count:
+            schedule_backfill()
+        if index is None:
+            return None
+
+        neighbours = await run_in_threadpool(index.search, matrix[0], ctx.fetch_limit, ctx.user.id)
+        if not neighbours:
+            return None
+        return Candidates.from_ranked([
+            (neighbour_id, float(similarity_to_score(similarity))) for neighbour_id, similarity in neighbours
+        ])
+
+
+# ==================== FILTERS ====================
+
+class CompletedProfileFilter(CandidateFilter):
+    """Keeps only users who finished registration."""
+    name = "completed_profile"
+
+    def apply_sync(self, ctx: MatchContext, candidates: Candidates) -> np.ndarray:
+        # Unfinished verified profiles are few, so fetch those rather than checking every candidate
+        unfinished = [row[0] for row in ctx.db.query(User.id).filter(
+            User.is_verified == True,
+            or_(User.profile_completed == False, User.profile_completed.is_(None))
+        ).all()]
+        return ~np.isin(candidates.user_ids, np.array(unfinished, dtype=np.int64))
+
+
+class NoDateRequestFilter(CandidateFilter):
+    """Drops users the requester already has a date request with, in either direction."""
+    name = "no_date_request"
+
+    def apply_sync(self, ctx: MatchContext, candidates: Candidates) -> np.ndarray:
+        rows = ctx.db.query(DateRequest.sender_id, DateRequest.receiver_id).filter(
+            or_(DateRequest.sender_id == ctx.user.id, DateRequest.receiver_id == ctx.user.id)
+        ).all()
+        others = [receiver if sender == ctx.user.id else sender for sender, receiver in rows]
+        return ~np.isin(candidates.user_ids, np.array(others, dtype=np.int64))
+
+
+# ==================== FEATURES ====================
+
+class SchoolFeature(FeatureExtractor):
+    """1.0 when the candidate attends the requester's school."""
+    name = "school"
+    needs_profiles = True
+
+    async def extract(self, ctx: MatchContext, candidates: Candidates) -> np.ndarray:
+        return candidates.matrix.school_matches(ctx.user.school)
+
+
+class YearFeature(FeatureExtractor):
+    """1.0 when the candidate is in the requester's year."""
+    name = "year"
+    needs_profiles = True
+
+    async def extract(self, ctx: MatchContext, candidates: Candidates) -> np.ndarray:
+        return candidates.matrix.year_matches(ctx.user.year)
+
+
+class InterestFeature(FeatureExtractor):
+    """Jaccard similarity of interest sets."""
+    name = "interests"
+    needs_profiles = True
+
+    async def extract(self, ctx: MatchContext, candidates: Candidates) -> np.ndarray:
+        return candidates.matrix.interest_jaccard(ctx.user.interest_ids)
+
+
+class EmbeddingFeature(FeatureExtractor):
+    """Profile embedding similarity mapped onto 0-1 (0.0 for candidates without an embedding)."""
+    name = "embedding"
+
+    async def extract(self, ctx: MatchContext, candidates: Candidates) -> np.ndarray:
+        values = np.zeros(len(candidates), dtype=np.float64)
+        user_ids, user_vectors = await load_embeddings(ctx.db, [ctx.user.id])
+        if len(user_ids) == 0 or not len(candidates):
+            return values
+
+        if candidates.embeddings is not None and candidates.embeddings.shape[1] == user_vectors.shape[1]:
+            similarities = similarity_to_score(candidates.embeddings @ user_vectors[0])
+            return np.where(candidates.embedding_present, similarities, 0.0)
+
+        ids, vectors = await load_embeddings(ctx.db, candidates.user_ids.tolist())
+        if len(ids):
+            positions = {int(user_id): row for row, user_id in enumerate(ids)}
+            similarities = similarity_to_score(vectors @ user_vectors[0])
+            for row, user_id in enumerate(candidates.user_ids):
+                position = positions.get(int(user_id))
+                if position is not None:
+                    values[row] = similarities[position]
+        return values
+
+
+# ==================== RANKERS ====================
+
+class WeightedSumRanker(Ranker):
+    """Score = min(sum of weight * feature, 1.0); ties broken by user ID."""
+    name = "weighted"
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+
+    def rank(self, ctx: MatchContext, candidates: Candidates, features: Dict[str, np.ndarray]) -> List[Tuple[int, float]]:
+        scores = np.zeros(len(candidates), dtype=np.float64)
+        for name, weight in self.weights.items():
+            scores = scores + weight * features[name]
+        return select_top_k(candidates.user_ids, np.minimum(scores, 1.0), ctx.limit, exclude_user_id=ctx.user.id)
+
+
+# ==================== PIPELINE ====================
+
+ProfilingHook = Callable[[MatchContext], None]
+_profiling_hooks: List[ProfilingHook] = []
+
+
+def add_profiling_hook(hook: ProfilingHook):
+    """Call hook(ctx) after every pipeline run; ctx.timings holds one StageTiming per stage."""
+    _profiling_hooks.append(hook)
+
+
+def remove_profiling_hook(hook: ProfilingHook):
+    if hook in _profiling_hooks:
+        _profiling_hooks.remove(hook)
+
+
+def log_stage_timings(ctx: MatchContext):
+    """Profiling hook that prints one line per request (enabled by MATCH_PROFILING)."""
+    stages = ", ".join(
+        f"{timing.stage}:{timing.name} {timing.seconds * 1000:.1f}ms ({timing.candidates_in}->{timing.candidates_out})"
+        for timing in ctx.timings
+    )
+    print(f"[MATCHING] {ctx.pipeline} user={ctx.user.id} limit={ctx.limit} total {ctx.total_seconds * 1000:.1f}ms: {stages}")
+
+
+class MatchPipeline:
+    """
+    Sources are tried in order, each result narrowed by the filters, until they
+    have returned at least limit candidates between them; features are then
+    extracted and the ranker picks the top limit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        sources: List[CandidateSource],
+        filters: List[CandidateFilter],
+        features: List[FeatureExtractor],
+        ranker: Ranker
+    ):
+        self.name = name
+        self.sources = sources
+        self.filters = filters
+        self.features = features
+        self.ranker = ranker
+
+    async def run(self, db: Session, user: User, limit: int) -> Optional[List[Tuple[int, float]]]:
+        """
+        Rank candidates for a user.
+
+        Args:
+            db: Database session
+            user: User to get matches for
+            limit: Maximum number of matches to return
+
+        Returns:
+            List of (user_id, score) tuples, best first, or None if no source could answer
+        """
+        ctx = MatchContext(db, user, limit, self.name)
+        started = time.perf_counter()
+        try:
+            return await self._run(ctx)
+        finally:
+            ctx.total_seconds = time.perf_counter() - started
+            for hook in list(_profiling_hooks):
+                try:
+                    hook(ctx)
+                except Exception as e:
+                    print(f"[MATCHING] Profiling hook failed: {e}")
+
+    async def _run(self, ctx: MatchContext) -> Optional[List[Tuple[int, float]]]:
+        def record(stage: str, name: str, started: float, candidates_in: int, candidates_out: int):
+            ctx.timings.append(StageTiming(stage, name, time.perf_counter() - started, candidates_in, candidates_out))
+
+        candidates = None
+        for source in self.sources:
+            found = await self._generate(ctx, source, record)
+            if found is not None:
+                candidates = found if candidates is None else candidates.merge(found)
+            if candidates is not None and len(candidates) >= ctx.limit:
+                break
+        if candidates is None:
+            return None
+
+        if any(feature.needs_profiles for feature in self.features) and candidates.matrix is None:
+            started = time.perf_counter()
+            before = len(candidates)
+            candidates = await run_in_threadpool(candidates.load_profiles, ctx.db)
+            record("load", "profiles", started, before, len(candidates))
+
+        features: Dict[str, np.ndarray] = {}
+        for feature in self.features:
+            started = time.perf_counter()
+            features[feature.name] = await feature.extract(ctx, candidates)
+            record("feature", feature.name, started, len(candidates), len(candidates))
+
+        started = time.perf_counter()
+        ranked = self.ranker.rank(ctx, candidates, features)
+        record("rank", self.ranker.name, started, len(candidates), len(ranked))
+        return ranked
+
+    async def _generate(self, ctx: MatchContext, source: CandidateSource, record) -> Optional[Candidates]:
+        """
+        Run one source and the filters it does not apply itself. When the filters
+        leave a truncating source short of limit, it is asked again for twice as
+        many candidates, up to MATCH_MAX_FETCH_LIMIT.
+        """
+        ctx.fetch_limit = ctx.limit
+        while True:
+            started = time.perf_counter()
+            found = await source.generate(ctx)
+            record("source", source.name, started, 0, len(found) if found is not None else 0)
+            if found is None:
+                return None
+
+            fetched = len(found)
+            for candidate_filter in self.filters:
+                if candidate_filter.name in source.applied_filters:
+                    continue
+                started = time.perf_counter()
+                before = len(found)
+                found = found.subset(await candidate_filter.apply(ctx, found))
+                record("filter", candidate_filter.name, started, before, len(found))
+
+            if (len(found) >= ctx.limit or not source.truncates or fetched < ctx.fetch_limit
+                    or ctx.fetch_limit >= settings.MATCH_MAX_FETCH_LIMIT):
+                return found
+            ctx.fetch_limit = min(ctx.fetch_limit * 2, settings.MATCH_MAX_FETCH_LIMIT)
+
+
+# ==================== CONFIGURATION ====================
+
+# Name -> factory; factories receive the pipeline's feature weights
+SOURCES: Dict[str, Callable[[Dict[str, float]], CandidateSource]] = {
+    "all": lambda weights: AllVerifiedSource(),
+    "cache": lambda weights: CachedSource(),
+    "store": lambda weights: FeatureStoreSource(),
+    "lsh": lambda weights: LSHSource(),
+    "sql": lambda weights: SQLScoredSource(weights),
+    "ann": lambda weights: ANNSource(),
+}
+FILTERS: Dict[str, Callable[[], CandidateFilter]] = {
+    "completed_profile": CompletedProfileFilter,
+    "no_date_request": NoDateRequestFilter,
+}
+FEATURES: Dict[str, Callable[[], FeatureExtractor]] = {
+    "school": SchoolFeature,
+    "year": YearFeature,
+    "interests": InterestFeature,
+    "embedding": EmbeddingFeature,
+}
+RANKERS: Dict[str, Callable[[Dict[str, float]], Ranker]] = {
+    "weighted": WeightedSumRanker,
+}
+
+# Sources whose ranking is only valid for specific features
+_PRECOMPUTED_SOURCES = {"cache"}  # DEFAULT_WEIGHTS only
+_SQL_FEATURES = {"school", "year", "interests"}
+
+
+def register_source(name: str, factory: Callable[[Dict[str, float]], CandidateSource]):
+    """Make a candidate source available to MATCH_PIPELINE_SOURCES / MATCH_AI_SOURCES."""
+    SOURCES[name] = factory
+    reset_pipelines()
+
+
+def register_filter(name: str, factory: Callable[[], CandidateFilter]):
+    """Make a filter available to MATCH_PIPELINE_FILTERS."""
+    FILTERS[name] = factory
+    reset_pipelines()
+
+
+def register_feature(name: str, factory: Callable[[], FeatureExtractor]):
+    """Make a feature usable in MATCH_FEATURE_WEIGHTS / MATCH_AI_FEATURE_WEIGHTS."""
+    FEATURES[name] = factory
+    reset_pipelines()
+
+
+def register_ranker(name: str, factory: Callable[[Dict[str, float]], Ranker]):
+    """Make a ranker available to MATCH_RANKER."""
+    RANKERS[name] = factory
+    reset_pipelines()
+
+
+def parse_names(value: Optional[str]) -> List[str]:
+    """Parse "a, b,c" into ["a", "b", "c"]."""
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """
+    Parse "school=0.4,year=0.2" into {"school": 0.4, "year": 0.2}.
+
+    Raises:
+        ValueError: If an entry is not name=number
+    """
+    weights = {}
+    for entry in parse_names(value):
+        name, separator, weight = entry.partition("=")
+        if not separator:
+            raise ValueError(f"Invalid feature weight {entry!r}, expected name=weight")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def _default_source_names() -> List[str]:
+    """Source chain implied by MATCH_SCORING_MODE and MATCH_CANDIDATE_SOURCE."""
+    if settings.MATCH_SCORING_MODE == "sql":
+        return ["sql"]
+    names = ["lsh"] if settings.MATCH_CANDIDATE_SOURCE == "lsh" else []
+    return names + ["cache", "store", "all"]
+
+
+def build_pipeline(name: str, source_names: List[str], filter_names: List[str], weights: Dict[str, float]) -> MatchPipeline:
+    """
+    Assemble a pipeline from registered stage names.
+
+    Raises:
+        ValueError: If a stage name is not registered
+    """
+    usable = []
+    for source_name in source_names:
+        if source_name in _PRECOMPUTED_SOURCES and weights != DEFAULT_WEIGHTS:
+            print(f"[MATCHING] Skipping source {source_name!r} in {name} pipeline: it is precomputed with the default weights")
+        elif source_name == "sql" and not set(weights) <= _SQL_FEATURES:
+            print(f"[MATCHING] Skipping source 'sql' in {name} pipeline: it can only score {sorted(_SQL_FEATURES)}")
+        else:
+            usable.append(source_name)
+    source_names = usable
+
+    unknown = (
+        [source for source in source_names if source not in SOURCES]
+        + [candidate_filter for candidate_filter in filter_names if candidate_filter not in FILTERS]
+        + [feature for feature in weights if feature not in FEATURES]
+    )
+    if unknown or settings.MATCH_RANKER not in RANKERS:
+        raise ValueError(f"Unknown matching pipeline stage(s): {unknown or [settings.MATCH_RANKER]}")
+
+    return MatchPipeline(
+        name,
+        sources=[SOURCES[source](weights) for source in source_names],
+        filters=[FILTERS[candidate_filter]() for candidate_filter in filter_names],
+        features=[FEATURES[feature]() for feature in weights],
+        ranker=RANKERS[settings.MATCH_RANKER](weights)
+    )
+
+
+_pipelines: Dict[str, MatchPipeline] = {}
+
+
+def get_pipeline(name: str) -> MatchPipeline:
+    """
+    Get the "basic" or "ai" pipeline, building it from settings on first use.
+
+    Args:
+        name: "basic" (profile fields) or "ai" (embeddings)
+
+    Returns:
+        The configured pipeline
+    """
+    if name not in _pipelines:
+        filter_names = parse_names(settings.MATCH_PIPELINE_FILTERS)
+        if name == "ai":
+            _pipelines[name] = build_pipeline(
+                name, parse_names(settings.MATCH_AI_SOURCES), filter_names, parse_weights(settings.MATCH_AI_FEATURE_WEIGHTS)
+            )
+        else:
+            source_names = parse_names(settings.MATCH_PIPELINE_SOURCES) or _default_source_names()
+            _pipelines[name] = build_pipeline(
+                name, source_names, filter_names, parse_weights(settings.MATCH_FEATURE_WEIGHTS)
+            )
+    return _pipelines[name]
+
+
+def set_pipeline(name: str, pipeline: MatchPipeline):
+    """Replace a pipeline at runtime."""
+    _pipelines[name] = pipeline
+
+
+def reset_pipelines():
+    """Forget built pipelines so the next request rebuilds them from settings."""
+    _pipelines.clear()
+
+
+if settings.MATCH_PROFILING:
+    add_profiling_hook(log_stage_timings)
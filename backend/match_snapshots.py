@@ -0,0 +1,147 @@
+"""
+Cursor pagination over ranked match snapshots.
+The first page ranks candidates once and stores the ordered IDs and scores;
+every page, the first included, loads profiles for its own slice only, so
+browsing stays cheap and stable while profiles change.
+
+Usage:
+    python match_snapshots.py purge   # Delete expired snapshots of every user (run periodically, e.g. from cron)
+"""
+import base64
+import secrets
+import sys
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import MatchSnapshot
+from matching import rank_matches, format_matches
+from pagination import check_limit
+from config import settings
+
+
+def encode_cursor(snapshot_id: str, offset: int) -> str:
+    """Opaque cursor pointing at an offset within a snapshot."""
+    return base64.urlsafe_b64encode(f"{snapshot_id}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Parse a cursor made by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        snapshot_id, offset = raw.split(":")
+        offset = int(offset)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if offset < 0:
+        raise ValueError("Invalid cursor")
+    return snapshot_id, offset
+
+
+async def _create_snapshot(db: Session, user_id: int, use_ai: bool) -> Tuple[str, List[Tuple[int, float]]]:
+    """Rank candidates for a user and store the ordering. Returns the snapshot ID and the ranking."""
+    ranked = await rank_matches(db, user_id, limit=settings.MATCH_SNAPSHOT_SIZE, use_ai=use_ai)
+
+    # Expired snapshots are only ever read through cursors, so drop this user's as new ones are made;
+    # users who stop browsing are cleaned up by purge_expired_snapshots()
+    expired_before = datetime.utcnow() - timedelta(seconds=settings.MATCH_SNAPSHOT_TTL_SECONDS)
+    db.query(MatchSnapshot).filter(
+        MatchSnapshot.user_id == user_id,
+        MatchSnapshot.created_at < expired_before
+    ).delete(synchronize_session=False)
+
+    snapshot_id = secrets.token_hex(16)
+    db.add(MatchSnapshot(
+        id=snapshot_id,
+        user_id=user_id,
+        use_ai=use_ai,
+        candidate_ids=[candidate_id for candidate_id, _ in ranked],
+        scores=[score for _, score in ranked],
+        created_at=datetime.utcnow()
+    ))
+    db.commit()
+    return snapshot_id, ranked
+
+
+async def get_match_page(db: Session, user_id: int, limit: int = 20, cursor: Optional[str] = None, use_ai: bool = False) -> dict:
+    """
+    Get one page of a user's ranked matches.
+
+    Args:
+        db: Database session
+        user_id: ID of the user browsing matches
+        limit: Page size
+        cursor: next_cursor from the previous page, or None for the first page
+        use_ai: Whether to rank with AI matching (first page only; later pages follow the snapshot)
+
+    Returns:
+        Dict in MatchPage shape: {"items": [...], "next_cursor": str or None}
+
+    Raises:
+        ValueError: If limit is out of range, or the cursor is malformed, expired or belongs to another user
+    """
+    check_limit(limit)
+    if cursor is None:
+        snapshot_id, ranked = await _create_snapshot(db, user_id, use_ai)
+        size = len(ranked)
+        # Only the first page's profiles are loaded; the rest of the snapshot is just IDs and scores
+        items = format_matches(db, ranked[:limit])
+        offset = 0
+    else:
+        snapshot_id, offset = decode_cursor(cursor)
+        # Slice the page inside Postgres (arrays are 1-based) rather than loading the whole snapshot
+        snapshot = db.query(
+            MatchSnapshot.created_at,
+            func.cardinality(MatchSnapshot.candidate_ids).label("size"),
+            MatchSnapshot.candidate_ids[offset + 1:offset + limit].label("candidate_ids"),
+            MatchSnapshot.scores[offset + 1:offset + limit].label("scores")
+        ).filter(
+            MatchSnapshot.id == snapshot_id,
+            MatchSnapshot.user_id == user_id
+        ).first()
+        expired_before = datetime.utcnow() - timedelta(seconds=settings.MATCH_SNAPSHOT_TTL_SECONDS)
+        if not snapshot or snapshot.created_at < expired_before:
+            raise ValueError("Cursor expired, start again from the first page")
+
+        # Users deleted since the snapshot was taken are skipped
+        items = format_matches(db, list(zip(snapshot.candidate_ids or [], snapshot.scores or [])))
+        size = snapshot.size
+
+    next_offset = offset + limit
+    next_cursor = encode_cursor(snapshot_id, next_offset) if next_offset < size else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def purge_expired_snapshots(db: Session) -> int:
+    """
+    Delete every user's expired snapshots.
+
+    Args:
+        db: Database session
+
+    Returns:
+        Number of snapshots deleted
+    """
+    expired_before = datetime.utcnow() - timedelta(seconds=settings.MATCH_SNAPSHOT_TTL_SECONDS)
+    deleted = db.query(MatchSnapshot).filter(
+        MatchSnapshot.created_at < expired_before
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "purge":
+        from database import SessionLocal
+        db = SessionLocal()
+        try:
+            print(f"[MATCHING] Deleted {purge_expired_snapshots(db)} expired match snapshots")
+        finally:
+            db.close()
+    else:
+        print(__doc__)
@@ -0,0 +1,267 @@
+"""
+MinHash signatures and LSH banding for interest-similarity candidate generation.
+Users whose interest sets have high Jaccard overlap collide in at least one LSH
+band with high probability, so candidates are found without scanning everyone.
+
+Usage:
+    python minhash.py recall [sample_size] [k]   # Report recall against brute-force Jaccard
+"""
+import random
+import sys
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from models import User
+from match_engine import CandidateMatrix, select_top_k
+from config import settings
+
+# Universal hashing modulo the Mersenne prime 2^31 - 1; a * x stays below 2^62
+_PRIME = (1 << 31) - 1
+_EMPTY = np.uint32(0xFFFFFFFF)
+
+
+class MinHasher:
+    """Computes fixed-length MinHash signatures of integer sets."""
+
+    def __init__(self, num_perm: int, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, interest_ids: Optional[Sequence[int]]) -> np.ndarray:
+        """MinHash signature (uint32, length num_perm). Empty sets get an all-max signature."""
+        if not interest_ids:
+            return np.full(self.num_perm, _EMPTY, dtype=np.uint32)
+        values = np.unique(np.asarray(interest_ids, dtype=np.uint64))
+        hashed = (self.a[:, None] * values[None, :] + self.b[:, None]) % _PRIME
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def signature_bytes(self, interest_ids: Optional[Sequence[int]]) -> bytes:
+        """Signature serialized for the users.interest_minhash column."""
+        return self.signature(interest_ids).tobytes()
+
+    def decode(self, data: Optional[bytes], interest_ids: Optional[Sequence[int]]) -> np.ndarray:
+        """Read a stored signature, recomputing it if missing or made with another num_perm."""
+        if data and len(data) == self.num_perm * 4:
+            return np.frombuffer(data, dtype=np.uint32)
+        return self.signature(interest_ids)
+
+
+class LSHIndex:
+    """
+    Banded LSH over MinHash signatures.
+    With b bands of r rows, two sets with Jaccard similarity s collide in at
+    least one band with probability 1 - (1 - s^r)^b.
+    """
+
+    def __init__(self, bands: int, rows: int):
+        self.bands = bands
+        self.rows = rows
+        self.buckets: Dict[Tuple[int, bytes], Set[int]] = defaultdict(set)
+        self.keys_by_user: Dict[int, List[Tuple[int, bytes]]] = {}
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.keys_by_user)
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def insert(self, user_id: int, signature: np.ndarray):
+        """Insert or replace a user's signature. Users without interests are not indexed."""
+        with self.lock:
+            self.remove(user_id)
+            if signature[0] == _EMPTY:
+                return
+            keys = self._band_keys(signature)
+            for key in keys:
+                self.buckets[key].add(user_id)
+            self.keys_by_user[user_id] = keys
+
+    def remove(self, user_id: int):
+        """Remove a user from every bucket they are in."""
+        with self.lock:
+            for key in self.keys_by_user.pop(user_id, []):
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(user_id)
+                    if not bucket:
+                        del self.buckets[key]
+
+    def query(self, signature: np.ndarray, exclude_user_id: Optional[int] = None) -> Set[int]:
+        """All users sharing at least one band bucket with the signature."""
+        if signature[0] == _EMPTY:
+            return set()
+        candidates: Set[int] = set()
+        with self.lock:
+            for key in self._band_keys(signature):
+                candidates.update(self.buckets.get(key, ()))
+        candidates.discard(exclude_user_id)
+        return candidates
+
+
+def optimal_bands_rows(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Pick the bands x rows split of num_perm whose collision curve best fits a
+    Jaccard threshold: it minimizes the probability mass of false positives
+    (similarity below threshold that collides) plus false negatives (above
+    threshold that does not), weighted equally.
+
+    Args:
+        num_perm: Signature length
+        threshold: Jaccard similarity that should separate candidates from non-candidates
+
+    Returns:
+        (bands, rows) with bands * rows == num_perm
+    """
+    below = np.linspace(0.0, threshold, 201)
+    above = np.linspace(threshold, 1.0, 201)
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        false_positive = np.mean(1 - (1 - below ** rows) ** bands) * threshold
+        false_negative = np.mean((1 - above ** rows) ** bands) * (1 - threshold)
+        error = false_positive + false_negative
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+def lsh_params() -> Tuple[int, int]:
+    """
+    (bands, rows) from LSH_BANDS / LSH_ROWS if both are set, else tuned to LSH_THRESHOLD.
+
+    Raises:
+        ValueError: If the configured split does not multiply to MINHASH_NUM_PERM
+    """
+    if settings.LSH_BANDS and settings.LSH_ROWS:
+        if settings.LSH_BANDS * settings.LSH_ROWS != settings.MINHASH_NUM_PERM:
+            raise ValueError("LSH_BANDS * LSH_ROWS must equal MINHASH_NUM_PERM")
+        return settings.LSH_BANDS, settings.LSH_ROWS
+    return optimal_bands_rows(settings.MINHASH_NUM_PERM, settings.LSH_THRESHOLD)
+
+
+_LSH_BANDS, _LSH_ROWS = lsh_params()
+hasher = MinHasher(settings.MINHASH_NUM_PERM)
+
+# Process-wide LSH index, built lazily by get_lsh_index()
+_lsh_index: Optional[LSHIndex] = None
+_lsh_lock = threading.Lock()
+
+
+def get_lsh_index(db: Session) -> LSHIndex:
+    """Get the process-wide LSH index over verified users, building it on first use."""
+    global _lsh_index
+    with _lsh_lock:
+        if _lsh_index is None:
+            index = LSHIndex(_LSH_BANDS, _LSH_ROWS)
+            rows = db.query(User.id, User.interest_ids, User.interest_minhash).filter(
+                User.is_verified == True
+            ).yield_per(10000)
+            for user_id, interest_ids, stored in rows:
+                index.insert(user_id, hasher.decode(stored, interest_ids))
+            _lsh_index = index
+            print(f"[LSH] Built index with {len(index)} users ({_LSH_BANDS} bands x {_LSH_ROWS} rows, "
+                  f"threshold about {(1 / _LSH_BANDS) ** (1 / _LSH_ROWS):.2f})")
+        return _lsh_index
+
+
+def lsh_index_user(user: User):
+    """Refresh a user's entry in the loaded LSH index after their interests or verification changed."""
+    if _lsh_index is None:
+        return
+    if user.is_verified:
+        _lsh_index.insert(user.id, hasher.decode(user.interest_minhash, user.interest_ids))
+    else:
+        _lsh_index.remove(user.id)
+
+
+def lsh_apply_changes(db: Session, user_ids: List[int]):
+    """Re-read changed users and update the loaded LSH index (used by the change feed)."""
+    if _lsh_index is None or not user_ids:
+        return
+    rows = db.query(User.id, User.is_verified, User.interest_ids, User.interest_minhash).filter(
+        User.id.in_(user_ids)
+    ).all()
+    for row in rows:
+        lsh_index_user(row)
+    for user_id in set(user_ids) - {row.id for row in rows}:
+        _lsh_index.remove(user_id)
+
+
+def reset_lsh_index():
+    """Drop the loaded LSH index so the next query rebuilds it from the database."""
+    global _lsh_index
+    with _lsh_lock:
+        _lsh_index = None
+
+
+def measure_recall(db: Session, sample_size: int = 200, k: int = 10, seed: int = 0) -> float:
+    """
+    Compare LSH candidates with brute-force Jaccard neighbours.
+
+    For sampled users with interests, recall is the fraction of their true top-k
+    Jaccard neighbours (with non-zero similarity) that LSH returns as candidates.
+    The candidate ratio (mean candidates per query over indexed users) is printed
+    alongside it: LSH_THRESHOLD (or LSH_BANDS / LSH_ROWS) trades one against the other.
+
+    Args:
+        db: Database session
+        sample_size: Number of users to sample
+        k: Neighbours per user
+
+    Returns:
+        Mean recall between 0.0 and 1.0
+    """
+    index = get_lsh_index(db)
+    rows = db.query(User.id, User.interest_ids, User.interest_minhash).filter(
+        User.is_verified == True
+    ).all()
+    # Interest-only matrix: querying with no school/year leaves scores proportional to Jaccard
+    matrix = CandidateMatrix.from_rows((user_id, "", "", interest_ids) for user_id, interest_ids, _ in rows)
+    sample = [row for row in rows if row.interest_ids]
+    sample = random.Random(seed).sample(sample, min(sample_size, len(sample)))
+
+    found = 0
+    expected = 0
+    candidate_count = 0
+    for user_id, interest_ids, stored in sample:
+        scores = matrix.score(None, None, interest_ids)
+        truth = {
+            other_id for other_id, score in select_top_k(matrix.user_ids, scores, k, exclude_user_id=user_id)
+            if score > 0
+        }
+        candidates = index.query(hasher.decode(stored, interest_ids), exclude_user_id=user_id)
+        found += len(truth & candidates)
+        expected += len(truth)
+        candidate_count += len(candidates)
+
+    recall = found / expected if expected else 1.0
+    candidate_ratio = candidate_count / len(sample) / max(len(index) - 1, 1) if sample else 0.0
+    print(f"[LSH] Recall@{k} over {len(sample)} users: {recall:.3f}, candidate ratio {candidate_ratio:.3f} "
+          f"({index.bands} bands x {index.rows} rows)")
+    return recall
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "recall":
+        from database import SessionLocal
+        db = SessionLocal()
+        try:
+            measure_recall(
+                db,
+                sample_size=int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+                k=int(sys.argv[3]) if len(sys.argv) > 3 else 10
+            )
+        finally:
+            db.close()
+    else:
+        print(__doc__)
@@ -2,7 +2,7 @@
 SQLAlchemy database models.
 Defines the structure of all database tables.
 """
-from sqlalchemy import Column, Integer, String, Boolean, Text, TIMESTAMP, ForeignKey, Float, ARRAY, UniqueConstraint, CheckConstraint
+from sqlalchemy import Column, Integer, String, Boolean, Text, TIMESTAMP, ForeignKey, Float, ARRAY, LargeBinary, UniqueConstraint, CheckConstraint, Index, text, Date
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -19,7 +19,9 @@ class User(Base):
     school = Column(String(255), nullable=False)
     year = Column(String(50), nullable=False)
     avatar_url = Column(Text)
-    interests = Column(ARRAY(Text))  # Array of interest tags
+    interests = Column(ARRAY(Text))  # Array of interest tags (canonical labels)
+    interest_ids = Column(ARRAY(Integer))  # Interned interest IDs used for matching
+    interest_minhash = Column(LargeBinary)  # MinHash signature of interest_ids (uint32 array)
     height_cm = Column(Integer)  # Height in centimeters
     weight_kg = Column(Integer)  # Weight in kilograms
     nationality = Column(String(100))  # Nationality
@@ -59,6 +61,9 @@ class DateRequest(Base):
     
     __table_args__ = (
         UniqueConstraint('sender_id', 'receiver_id', name='unique_date_request'),
+        # Keyset pages of a user's sent and received requests, newest first
+        Index('idx_date_requests_sender_time_id', 'sender_id', 'created_at', 'id'),
+        Index('idx_date_requests_receiver_time_id', 'receiver_id', 'created_at', 'id'),
     )
 
 
@@ -72,15 +77,37 @@ class Event(Base):
     description = Column(Text)
     location = Column(String(255), nullable=False)
     event_time = Column(TIMESTAMP, nullable=False)
-    tags = Column(ARRAY(Text))  # Array of event tags
+    tags = Column(ARRAY(Text))  # Array of event tags (canonical labels)
+    tag_ids = Column(ARRAY(Integer))  # Interned interest IDs used for filtering
     max_attendees = Column(Integer)
     image_url = Column(Text)
+    going_count = Column(Integer, nullable=False, default=0, server_default="0")  # RSVP counters, see rsvps.py
+    interested_count = Column(Integer, nullable=False, default=0, server_default="0")
+    declined_count = Column(Integer, nullable=False, default=0, server_default="0")
+    waitlisted_count = Column(Integer, nullable=False, default=0, server_default="0")
+    archived = Column(Boolean, nullable=False, default=False, server_default="false")  # Past events, see event_feed.py
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
     
     # Relationships
     creator = relationship("User", back_populates="created_events")
     attendees = relationship("EventAttendee", back_populates="event", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Keyset order of the events feed; the partial index covers the upcoming feed
+        Index('idx_events_time_id', 'event_time', 'id'),
+        Index('idx_events_live_time_id', 'event_time', 'id', postgresql_where=text("NOT archived")),
+        Index('idx_events_tag_ids_gin', 'tag_ids', postgresql_using='gin'),
+    )
+
+
+class EventTagCount(Base):
+    """EventTagCount model: Number of events per tag and day, backing the tag facets."""
+    __tablename__ = "event_tag_counts"
+    
+    tag_id = Column(Integer, ForeignKey("interests.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True, index=True)  # UTC date of event_time
+    event_count = Column(Integer, nullable=False, default=0)
 
 
 class EventAttendee(Base):
@@ -90,7 +117,8 @@ class EventAttendee(Base):
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    rsvp_status = Column(String(50), default="interested")  # going, interested, declined
+    rsvp_status = Column(String(50), default="interested")  # going, interested, declined, waitlisted
+    waitlisted_at = Column(TIMESTAMP)  # Queue position while waitlisted
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
     
@@ -99,6 +127,8 @@ class EventAttendee(Base):
     
     __table_args__ = (
         UniqueConstraint('event_id', 'user_id', name='unique_event_attendee'),
+        Index('idx_event_attendees_waitlist', 'event_id', 'waitlisted_at',
+              postgresql_where=text("rsvp_status = 'waitlisted'")),
     )
 
 
@@ -110,12 +140,44 @@ class Message(Base):
     sender_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     receiver_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     content = Column(Text, nullable=False)
-    is_read = Column(Boolean, default=False)
-    created_at = Column(TIMESTAMP, server_default=func.now())
+    created_at = Column(TIMESTAMP, server_default=func.now())  # Read state lives in conversation_reads
     
     # Relationships
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_messages")
+    
+    __table_args__ = (
+        # One conversation's messages in time order (GET /api/messages?other_user_id=)
+        Index('idx_messages_sender_receiver_time', 'sender_id', 'receiver_id', 'created_at', 'id'),
+        Index('idx_messages_receiver_sender_time', 'receiver_id', 'sender_id', 'created_at', 'id'),
+        # Unread counts: messages from a partner past the read cursor
+        Index('idx_messages_receiver_sender_id', 'receiver_id', 'sender_id', 'id'),
+    )
+
+
+class Conversation(Base):
+    """Conversation model: A user's latest message with one partner, so the inbox reads one row per partner."""
+    __tablename__ = "conversations"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)  # The inbox owner
+    other_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)  # The partner
+    last_message_id = Column(Integer, ForeignKey("messages.id", ondelete="CASCADE"), nullable=False)
+    last_message_at = Column(TIMESTAMP, nullable=False)  # created_at of last_message_id
+    
+    __table_args__ = (
+        # The inbox: a user's conversations by latest activity, scanned backwards for newest first
+        Index('idx_conversations_user_last_message', 'user_id', 'last_message_at', 'last_message_id'),
+    )
+
+
+class ConversationRead(Base):
+    """ConversationRead model: How far a user has read their messages from one partner."""
+    __tablename__ = "conversation_reads"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)  # The reader
+    other_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)  # The partner
+    last_read_message_id = Column(Integer, nullable=False)  # Messages from other_id up to this ID are read
+    updated_at = Column(TIMESTAMP, server_default=func.now())
 
 
 class Match(Base):
@@ -133,3 +195,60 @@ class Match(Base):
         CheckConstraint('user1_id != user2_id', name='check_different_users'),
     )
 
+
+
+class Interest(Base):
+    """Interest model: Canonical interest vocabulary shared by user interests and event tags."""
+    __tablename__ = "interests"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String(100), unique=True, nullable=False)  # Normalized lookup form
+    label = Column(String(100), nullable=False)  # Display form
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class InterestAlias(Base):
+    """InterestAlias model: Extra synonyms folded onto a canonical interest."""
+    __tablename__ = "interest_aliases"
+    
+    alias = Column(String(100), primary_key=True)  # Normalized synonym
+    interest_id = Column(Integer, ForeignKey("interests.id", ondelete="CASCADE"), nullable=False)
+
+
+class RecommendationState(Base):
+    """RecommendationState model: Tracks each user's cached top-K recommendations in the matches table."""
+    __tablename__ = "recommendation_state"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    size = Column(Integer, default=0)  # Number of cached rows
+    min_score = Column(Float)  # Score of the lowest cached row (K-th best)
+    dirty = Column(Boolean, default=False)  # True until the list is recomputed
+    computed_at = Column(TIMESTAMP)
+    
+    __table_args__ = (
+        # Lists a changed profile could enter (see recommendations.apply_profile_change)
+        Index('idx_recommendation_state_min_score', 'min_score', postgresql_where=text("NOT dirty")),
+    )
+
+
+class MatchSnapshot(Base):
+    """MatchSnapshot model: A ranked list of match candidates that cursor pages are sliced from."""
+    __tablename__ = "match_snapshots"
+    
+    id = Column(String(32), primary_key=True)  # Random token embedded in cursors
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    use_ai = Column(Boolean, default=False)
+    candidate_ids = Column(ARRAY(Integer), nullable=False)  # In rank order
+    scores = Column(ARRAY(Float), nullable=False)  # Parallel to candidate_ids
+    created_at = Column(TIMESTAMP, server_default=func.now(), index=True)
+
+
+class UserEmbedding(Base):
+    """UserEmbedding model: Stores the profile embedding used for AI matching."""
+    __tablename__ = "user_embeddings"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    text_hash = Column(String(64), nullable=False)  # SHA-256 of model name + profile text
+    model = Column(String(100), nullable=False)
+    embedding = Column(LargeBinary, nullable=False)  # Unit-normalized float32 vector
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,102 @@
+"""
+Keyset (seek) pagination helpers.
+Pages are ordered by a unique tuple of columns and the cursor carries the last
+row's values, so fetching page N costs the same as page 1 and rows inserted
+meanwhile never shift or repeat results.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+# Largest page any list endpoint serves
+MAX_PAGE_SIZE = 100
+
+
+def check_limit(limit: int):
+    """
+    Raises:
+        ValueError: If limit is not between 1 and MAX_PAGE_SIZE
+    """
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor holding the sort-key values of the last row on a page."""
+    payload = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Tuple[Any, ...]:
+    """
+    Parse a cursor made by encode_cursor, checking it against the sort key.
+
+    Args:
+        cursor: The cursor string
+        types: Expected type of each sort-key value, e.g. (datetime, int)
+
+    Raises:
+        ValueError: If the cursor is malformed or does not match the sort key
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values = tuple(
+            datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value
+            for value in payload
+        )
+    except Exception:
+        raise ValueError("Invalid cursor")
+    # Tampered values must not reach SQL, where a type mismatch is a server error
+    if len(values) != len(types) or any(
+        not isinstance(value, expected) or isinstance(value, bool)
+        for value, expected in zip(values, types)
+    ):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def paginate(
+    query: Query,
+    columns: Sequence,
+    limit: int,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+    key: Optional[Callable[[Any], Sequence[Any]]] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one keyset page of a query.
+
+    Args:
+        query: Filtered query without ORDER BY or LIMIT
+        columns: Sort columns; together they must be unique (end with the primary key)
+        limit: Page size
+        cursor: next_cursor from the previous page, or None for the first page
+        descending: Sort newest/largest first
+        key: Extracts the sort-key values from a row (defaults to attributes named like the columns)
+
+    Returns:
+        (rows, next_cursor), where next_cursor is None on the last page
+
+    Raises:
+        ValueError: If the cursor or limit is invalid
+    """
+    check_limit(limit)
+    if cursor is not None:
+        values = decode_cursor(cursor, [column.type.python_type for column in columns])
+        position = tuple_(*columns)
+        query = query.filter(position < tuple_(*values) if descending else position > tuple_(*values))
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    # One extra row tells us whether another page exists without a COUNT
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if key is None:
+            key = lambda row: [getattr(row, column.key) for column in columns]
+        next_cursor = encode_cursor(key(rows[-1]))
+    return rows, next_cursor
@@ -0,0 +1,184 @@
+"""
+Publish/subscribe fan-out for real-time events.
+Writes publish an envelope (event name, recipient user IDs, payload) inside
+their transaction; once it commits, every worker receives it and delivers it to
+the recipients' sockets connected to that worker. The Postgres backend rides on
+LISTEN/NOTIFY (received by the change_feed listener); the in-process backend
+serves single-worker deployments.
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Awaitable, Callable, Iterable, List, Optional
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from config import settings
+
+REALTIME_CHANNEL = "realtime_events"
+
+# NOTIFY payloads must stay under 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+
+# Delivery latency histogram bucket bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class RealtimeMetrics:
+    """Per-worker counters for published and delivered envelopes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.published = 0
+            self.oversized = 0  # Published without payload; recipients are told to refetch
+            self.delivered = 0
+            self.dropped = 0  # Received before the worker's event loop was attached
+            self.sockets = 0  # Total sockets reached (fan-out)
+            self.max_fanout = 0
+            self.latency_total = 0.0
+            self.latency_max = 0.0
+            self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record_publish(self, oversized: bool = False):
+        with self._lock:
+            self.published += 1
+            self.oversized += int(oversized)
+
+    def record_drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def record_delivery(self, latency: float, sockets: int):
+        """
+        Args:
+            latency: Seconds from publish to delivery (wall clock, so includes skew between hosts)
+            sockets: Number of local sockets the envelope was sent to
+        """
+        latency = max(latency, 0.0)
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+        with self._lock:
+            self.delivered += 1
+            self.sockets += sockets
+            self.max_fanout = max(self.max_fanout, sockets)
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            self.latency_counts[bucket] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+            return {
+                "published": self.published,
+                "oversized": self.oversized,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "fanout": {
+                    "sockets": self.sockets,
+                    "mean": self.sockets / self.delivered if self.delivered else 0.0,
+                    "max": self.max_fanout
+                },
+                "latency_seconds": {
+                    "mean": self.latency_total / self.delivered if self.delivered else 0.0,
+                    "max": self.latency_max,
+                    "buckets": dict(zip(bounds, self.latency_counts))
+                }
+            }
+
+
+metrics = RealtimeMetrics()
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class Broker:
+    """
+    Base broker: publish() sends an envelope to every worker, and each worker
+    runs its subscribed async handlers on its event loop.
+    """
+
+    def __init__(self):
+        self._handlers: List[Handler] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, handler: Handler):
+        self._handlers.append(handler)
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Set the event loop handlers run on (call from the worker's startup)."""
+        self._loop = loop
+
+    def publish(self, db: Session, event_name: str, user_ids: Iterable[int], data: dict):
+        """
+        Publish an event to users, delivered when db's transaction commits.
+
+        Args:
+            db: Session whose transaction the event belongs to
+            event_name: Socket event name
+            user_ids: Recipients
+            data: JSON-serializable payload
+        """
+        envelope = {"event": event_name, "user_ids": sorted(set(user_ids)), "data": data, "published_at": time.time()}
+        payload = json.dumps(envelope, separators=(",", ":"))
+        oversized = len(payload.encode()) > MAX_PAYLOAD_BYTES
+        if oversized:
+            payload = json.dumps({**envelope, "data": None}, separators=(",", ":"))
+        metrics.record_publish(oversized)
+        self._send(db, payload)
+
+    def _send(self, db: Session, payload: str):
+        raise NotImplementedError
+
+    def broadcast_local(self, event_name: str, data: dict):
+        """Send an event to every socket on this worker, without publishing it."""
+        self.dispatch(json.dumps({"event": event_name, "user_ids": None, "data": data, "published_at": time.time()}))
+
+    def dispatch(self, payload: str):
+        """Deliver a received envelope to this worker's handlers. Thread-safe."""
+        try:
+            envelope = json.loads(payload)
+        except ValueError:
+            print(f"[PUBSUB] Ignoring malformed payload: {payload[:200]!r}")
+            return
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            metrics.record_drop()
+            return
+        for handler in self._handlers:
+            asyncio.run_coroutine_threadsafe(handler(envelope), loop)
+
+
+class InProcessBroker(Broker):
+    """Delivers to this worker only, after the publishing transaction commits."""
+
+    def _send(self, db: Session, payload: str):
+        db.info.setdefault("pending_realtime", []).append(payload)
+
+
+class PostgresBroker(Broker):
+    """Fans out through NOTIFY on REALTIME_CHANNEL, which Postgres delivers on commit."""
+
+    def _send(self, db: Session, payload: str):
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": REALTIME_CHANNEL, "payload": payload})
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _deliver_pending(session: Session):
+    for payload in session.info.pop("pending_realtime", []):
+        broker.dispatch(payload)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending(session: Session):
+    session.info.pop("pending_realtime", None)
+
+
+# NOTIFY reaches other workers only through the change feed listener
+broker: Broker = (
+    PostgresBroker() if settings.REALTIME_BROKER == "postgres" and settings.CHANGE_FEED_ENABLED
+    else InProcessBroker()
+)
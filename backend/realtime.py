@@ -0,0 +1,205 @@
+"""
+Real-time push over Socket.IO.
+Clients connect to /ws/socket.io with their JWT and join a per-user room.
+Routes publish events through pubsub before committing; each worker delivers
+them to the recipients' rooms among its own sockets. A periodic sweep
+disconnects sockets whose token expired or whose account was removed.
+"""
+import asyncio
+import time
+from typing import Optional
+import socketio
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import User, Message, DateRequest, Event
+from schemas import MessageResponse, DateRequestResponse
+from auth import decode_access_token
+from loaders import message_payloads
+from pubsub import broker, metrics
+from config import settings
+
+# Same origins as the FastAPI app's CORSMiddleware; also checked on WebSocket upgrades
+sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins=settings.allowed_origins)
+
+
+class _LowercaseHeaders:
+    """
+    Lowercases response header names, as ASGI requires. engine.io sends them
+    capitalized, so CORSMiddleware would add its Access-Control-* headers next
+    to engine.io's instead of replacing them, and browsers reject duplicates.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        async def send_lowercase(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [(name.lower(), value) for name, value in message.get("headers", [])]
+            await send(message)
+        await self.app(scope, receive, send_lowercase)
+
+
+# Mounted at /ws by main.py, so clients use path "/ws/socket.io"
+socket_app = _LowercaseHeaders(socketio.ASGIApp(sio, socketio_path="socket.io"))
+
+
+def user_room(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def _authenticate(token: str) -> dict:
+    """
+    Resolve a JWT to a verified user, like get_current_verified_user does for HTTP.
+    Blocks on the database, so call it from a worker thread.
+
+    Returns:
+        Socket session: {"user_id": int, "exp": token expiry as a Unix timestamp, or None}
+    """
+    payload = decode_access_token(token) if token else None
+    if payload is None or payload.get("sub") is None:
+        raise socketio.exceptions.ConnectionRefusedError("Could not validate credentials")
+
+    db = SessionLocal()
+    try:
+        user = db.query(User.id, User.is_verified).filter(User.id == payload["sub"]).first()
+    finally:
+        db.close()
+    if user is None:
+        raise socketio.exceptions.ConnectionRefusedError("Could not validate credentials")
+    if not user.is_verified:
+        raise socketio.exceptions.ConnectionRefusedError("Email not verified")
+    return {"user_id": user.id, "exp": payload.get("exp")}
+
+
+@sio.event
+async def connect(sid, environ, auth):
+    """Accept a connection whose auth payload carries a valid token: {"token": "<JWT>"}."""
+    session = await run_in_threadpool(_authenticate, (auth or {}).get("token"))
+    await sio.save_session(sid, session)
+    await sio.enter_room(sid, user_room(session["user_id"]))
+
+
+async def sweep_sessions() -> int:
+    """
+    Disconnect this worker's sockets whose token has expired or whose user was
+    deleted or is no longer verified. Clients get "session_expired" first.
+
+    Returns:
+        Number of sockets disconnected
+    """
+    sessions = {}
+    for sid, _ in list(sio.manager.get_participants("/", None)):
+        try:
+            sessions[sid] = await sio.get_session(sid)
+        except KeyError:
+            pass  # Disconnected meanwhile
+    if not sessions:
+        return 0
+
+    db = SessionLocal()
+    try:
+        active = {row.id for row in db.query(User.id).filter(
+            User.id.in_({session["user_id"] for session in sessions.values()}),
+            User.is_verified == True
+        )}
+    finally:
+        db.close()
+
+    now = time.time()
+    expired = [
+        sid for sid, session in sessions.items()
+        if session["user_id"] not in active or (session.get("exp") is not None and session["exp"] <= now)
+    ]
+    for sid in expired:
+        await sio.emit("session_expired", {}, to=sid)
+        await sio.disconnect(sid)
+    return len(expired)
+
+
+_sweep_task: Optional[asyncio.Task] = None
+
+
+async def _sweep_periodically():
+    while True:
+        await asyncio.sleep(settings.REALTIME_SESSION_SWEEP_SECONDS)
+        try:
+            expired = await sweep_sessions()
+            if expired:
+                print(f"[REALTIME] Disconnected {expired} expired sockets")
+        except Exception as e:
+            print(f"[REALTIME] Session sweep failed: {e}")
+
+
+def start_session_sweep():
+    """Start the periodic session sweep on the running event loop (call from the worker's startup)."""
+    global _sweep_task
+    if _sweep_task is None or _sweep_task.done():
+        _sweep_task = asyncio.get_running_loop().create_task(_sweep_periodically())
+
+
+async def deliver(envelope: dict):
+    """Send a published envelope to the recipients' sockets on this worker."""
+    # Payloads too large for NOTIFY arrive without data; clients refetch instead
+    event_name = envelope["event"] if envelope.get("data") is not None else "resync"
+    user_ids = envelope["user_ids"]
+    # The None room holds every socket, for broadcasts
+    rooms = [user_room(user_id) for user_id in user_ids] if user_ids is not None else [None]
+    sockets = 0
+    for room in rooms:
+        count = sum(1 for _ in sio.manager.get_participants("/", room))
+        if count:
+            sockets += count
+            await sio.emit(event_name, envelope.get("data") or {}, room=room)
+    metrics.record_delivery(time.time() - envelope["published_at"], sockets)
+
+
+broker.subscribe(deliver)
+
+
+def publish_message(db: Session, message: Message) -> MessageResponse:
+    """
+    Publish a new message to both participants (the sender may have other tabs open).
+    The message must be loaded with message_query; publish before committing.
+
+    Returns:
+        The serialized message, reusable as the response
+    """
+    response = MessageResponse.model_validate(message_payloads([message], {})[0])
+    broker.publish(db, "message", [message.sender_id, message.receiver_id], response.model_dump(mode="json"))
+    return response
+
+
+def publish_read_receipt(db: Session, user_id: int, other_id: int, last_read_message_id: int):
+    """Tell both participants that user_id has read other_id's messages up to last_read_message_id."""
+    data = {"user_id": user_id, "other_id": other_id, "last_read_message_id": last_read_message_id}
+    broker.publish(db, "conversation_read", [user_id, other_id], data)
+
+
+def publish_date_request(db: Session, date_request: DateRequest) -> DateRequestResponse:
+    """
+    Publish a date request's new state to its sender and receiver.
+    The request must be loaded with date_request_query; publish before committing.
+
+    Returns:
+        The serialized date request, reusable as the response
+    """
+    response = DateRequestResponse.model_validate(date_request)
+    broker.publish(db, "date_request", [date_request.sender_id, date_request.receiver_id],
+                   response.model_dump(mode="json"))
+    return response
+
+
+def publish_rsvp(db: Session, event: Event, user_id: int, rsvp_status: str):
+    """Publish an RSVP and the event's current counters to the responder and the event's creator."""
+    data = {
+        "event_id": event.id,
+        "user_id": user_id,
+        "rsvp_status": rsvp_status,
+        "going_count": event.going_count,
+        "interested_count": event.interested_count,
+        "declined_count": event.declined_count,
+        "waitlisted_count": event.waitlisted_count
+    }
+    broker.publish(db, "rsvp", [user_id, event.creator_id], data)
@@ -0,0 +1,344 @@
+"""
+Precomputed recommendation cache.
+Each user's top-K basic-score recommendations are stored in the matches table
+(user1_id = viewer, user2_id = recommended user) and refreshed incrementally
+when a profile's school, year or interests change.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import bindparam, or_, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import User, Match, RecommendationState
+from match_engine import CandidateMatrix
+from config import settings
+
+# pg_advisory_xact_lock class key; the second key is the user whose refresh or recompute runs
+_REFRESH_LOCK_KEY = 0x7265636f  # "reco"
+
+
+def _lock_user(db: Session, user_id: int):
+    """Serialize refreshes and recomputes of one user's list across workers (released on commit)."""
+    db.execute(text("SELECT pg_advisory_xact_lock(:key, :user_id)"), {"key": _REFRESH_LOCK_KEY, "user_id": user_id})
+
+
+def get_cached_recommendations(db: Session, user_id: int, limit: int) -> Optional[List[Tuple[int, float]]]:
+    """
+    Read a user's recommendations from the cache.
+    A list marked dirty is still served, and a recompute is queued in the
+    background; a list that was never computed is queued and not served.
+
+    Args:
+        db: Database session
+        user_id: Viewer's user ID
+        limit: Number of recommendations wanted
+
+    Returns:
+        List of (user_id, score) tuples, or None if the cache cannot answer
+        (never computed, or limit larger than the cache size)
+    """
+    if limit > settings.RECOMMENDATION_CACHE_SIZE:
+        return None
+
+    state = db.query(RecommendationState).filter(RecommendationState.user_id == user_id).first()
+    if not state or state.dirty:
+        _recompute_queue.submit(user_id)
+    if not state:
+        return None
+
+    rows = db.query(Match.user2_id, Match.match_score).filter(
+        Match.user1_id == user_id
+    ).order_by(Match.match_score.desc(), Match.user2_id.asc()).limit(limit).all()
+    return [(row.user2_id, row.match_score) for row in rows]
+
+
+def _score_against_all(db: Session, user_id: int) -> Tuple[Optional[User], Optional[CandidateMatrix], Optional[np.ndarray]]:
+    """Score one user against every verified user in a single vectorized pass."""
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        return None, None, None
+
+    candidate_rows = db.query(User.id, User.school, User.year, User.interest_ids).filter(
+        User.id != user_id,
+        User.is_verified == True
+    ).all()
+    candidates = CandidateMatrix.from_rows(candidate_rows)
+    scores = candidates.score(user.school, user.year, user.interest_ids)
+    return user, candidates, scores
+
+
+def _write_user_cache(db: Session, user_id: int, top_matches: List[Tuple[int, float]]):
+    """Replace a user's cached rows and state (caller commits)."""
+    db.query(Match).filter(Match.user1_id == user_id).delete(synchronize_session=False)
+    if top_matches:
+        _upsert_matches(db, [
+            {"user1_id": user_id, "user2_id": other_id, "match_score": score}
+            for other_id, score in top_matches
+        ])
+
+    state = db.query(RecommendationState).filter(RecommendationState.user_id == user_id).first()
+    if not state:
+        state = RecommendationState(user_id=user_id)
+        db.add(state)
+    state.size = len(top_matches)
+    state.min_score = top_matches[-1][1] if top_matches else None
+    state.dirty = False
+    state.computed_at = datetime.utcnow()
+
+
+def _upsert_matches(db: Session, rows: List[dict]):
+    """Insert cache rows, overwriting the score of any that a concurrent refresh already added."""
+    statement = insert(Match).values(rows)
+    db.execute(statement.on_conflict_do_update(
+        constraint="unique_match",
+        set_={"match_score": statement.excluded.match_score}
+    ))
+
+
+def recompute_user(db: Session, user_id: int) -> List[Tuple[int, float]]:
+    """
+    Fully rescore one user's recommendations and store the top-K.
+
+    Args:
+        db: Database session
+        user_id: Viewer's user ID
+
+    Returns:
+        The new cached list of (user_id, score) tuples
+    """
+    _lock_user(db, user_id)
+    user, candidates, scores = _score_against_all(db, user_id)
+    if user is None:
+        db.commit()
+        return []
+
+    top_matches = candidates.top_k(scores, settings.RECOMMENDATION_CACHE_SIZE)
+    _write_user_cache(db, user_id, top_matches)
+    db.commit()
+    return top_matches
+
+
+def _refresh_states(db: Session, user_ids: List[int]):
+    """Recompute size and min_score for the given users from their cached rows."""
+    if not user_ids:
+        return
+    db.execute(text("""
+        UPDATE recommendation_state AS s
+        SET size = agg.size, min_score = agg.min_score
+        FROM (
+            SELECT user1_id, COUNT(*) AS size, MIN(match_score) AS min_score
+            FROM matches
+            WHERE user1_id = ANY(:user_ids)
+            GROUP BY user1_id
+        ) AS agg
+        WHERE s.user_id = agg.user1_id
+    """), {"user_ids": user_ids})
+
+
+def apply_profile_change(db: Session, user_id: int):
+    """
+    Incrementally refresh the cache after a user's scoring fields changed.
+
+    The changed user's own list is recomputed in full. Because the score is
+    symmetric, the same score vector tells us their new score in every other
+    user's list, so only rows involving them are touched:
+      - rows where they already appear are rescored; if the new score falls
+        below the rest of that list, the list is marked dirty and rebuilt lazily
+      - lists they now beat the current K-th entry of get them inserted and
+        lose their lowest row
+
+    Lists are ordered by (score DESC, user ID ASC), so a score equal to a
+    list's min_score is inserted and the eviction keeps whichever of the tied
+    rows has the lower user ID. Refreshes of the same user are serialized
+    across workers with a per-user advisory lock. Refreshes of different users
+    may insert into the same list at once: inserts upsert, each eviction only
+    drops rows ranked past K in its own view, and size/min_score are recounted
+    from the rows, so at worst a list briefly keeps an extra row.
+
+    Args:
+        db: Database session
+        user_id: ID of the user whose profile changed
+    """
+    _lock_user(db, user_id)
+    user, candidates, scores = _score_against_all(db, user_id)
+    if user is None:
+        db.commit()
+        return
+
+    cache_size = settings.RECOMMENDATION_CACHE_SIZE
+    _write_user_cache(db, user_id, candidates.top_k(scores, cache_size))
+
+    score_by_user: Dict[int, float] = dict(zip(candidates.user_ids.tolist(), scores.tolist()))
+    if not user.is_verified:
+        # Unverified users must not appear in anyone's recommendations
+        score_by_user = {}
+
+    # Rescore rows where this user already appears
+    existing = db.query(Match.id, Match.user1_id, Match.match_score).filter(Match.user2_id == user_id).all()
+    listed_in = set()
+    lowered = set()
+    rescored = []
+    removed = []
+    for match_id, owner_id, old_score in existing:
+        listed_in.add(owner_id)
+        if owner_id not in score_by_user:
+            removed.append(match_id)
+        elif score_by_user[owner_id] != old_score:
+            rescored.append({"match_id": match_id, "new_score": score_by_user[owner_id]})
+            if score_by_user[owner_id] < old_score:
+                lowered.add(owner_id)
+    if rescored:
+        # Core executemany: a row a concurrent refresh just evicted is simply skipped
+        db.execute(
+            update(Match.__table__).where(Match.__table__.c.id == bindparam("match_id")).values(match_score=bindparam("new_score")),
+            rescored
+        )
+    if removed:
+        db.query(Match).filter(Match.id.in_(removed)).delete(synchronize_session=False)
+
+    # Only lists this user is already in, or whose K-th score the best possible score can reach
+    upper_bound = max(score_by_user.values()) if score_by_user else None
+    candidates_filter = [RecommendationState.user_id.in_(listed_in)] if listed_in else []
+    if upper_bound is not None:
+        candidates_filter += [
+            RecommendationState.size < cache_size,
+            RecommendationState.min_score == None,
+            RecommendationState.min_score <= upper_bound
+        ]
+    states = db.query(RecommendationState.user_id, RecommendationState.size, RecommendationState.min_score).filter(
+        RecommendationState.dirty == False,
+        RecommendationState.user_id != user_id,
+        or_(*candidates_filter)
+    ).all() if candidates_filter else []
+
+    dirty = []
+    inserted = []
+    for owner_id, size, min_score in states:
+        score = score_by_user.get(owner_id)
+        if owner_id in listed_in:
+            # A lowered row at or below the K-th score may now rank below an unlisted candidate
+            if score is None or (owner_id in lowered and size >= cache_size
+                                 and min_score is not None and score <= min_score):
+                dirty.append(owner_id)
+        elif score is not None and (size < cache_size or min_score is None or score >= min_score):
+            inserted.append(owner_id)
+
+    if inserted:
+        _upsert_matches(db, [
+            {"user1_id": owner_id, "user2_id": user_id, "match_score": score_by_user[owner_id]}
+            for owner_id in inserted
+        ])
+        # Evict the lowest row from lists that are now over capacity
+        db.execute(text("""
+            DELETE FROM matches WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY user1_id ORDER BY match_score DESC, user2_id ASC
+                    ) AS rank
+                    FROM matches
+                    WHERE user1_id = ANY(:user_ids)
+                ) AS ranked
+                WHERE ranked.rank > :cache_size
+            )
+        """), {"user_ids": inserted, "cache_size": cache_size})
+
+    _refresh_states(db, list(listed_in.union(inserted)))
+    if dirty:
+        db.query(RecommendationState).filter(
+            RecommendationState.user_id.in_(dirty)
+        ).update({RecommendationState.dirty: True}, synchronize_session=False)
+
+    db.commit()
+
+
+def mark_dirty(db: Session, user_id: int):
+    """Stop serving a user's cached list until it is recomputed (caller commits)."""
+    db.query(RecommendationState).filter(
+        RecommendationState.user_id == user_id
+    ).update({RecommendationState.dirty: True}, synchronize_session=False)
+
+
+class _RefreshDebouncer:
+    """Coalesces bursts of profile edits into one refresh per user."""
+
+    def __init__(self):
+        self._timers: Dict[int, threading.Timer] = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, user_id: int):
+        with self._lock:
+            timer = self._timers.pop(user_id, None)
+            if timer:
+                timer.cancel()
+            timer = threading.Timer(settings.RECOMMENDATION_REFRESH_DEBOUNCE_SECONDS, self._run, args=(user_id,))
+            timer.daemon = True
+            self._timers[user_id] = timer
+            timer.start()
+
+    def _run(self, user_id: int):
+        with self._lock:
+            self._timers.pop(user_id, None)
+
+        db = SessionLocal()
+        try:
+            apply_profile_change(db, user_id)
+        except Exception as e:
+            db.rollback()
+            print(f"[RECOMMENDATIONS] Error refreshing cache for user {user_id}: {e}")
+        finally:
+            db.close()
+
+
+_debouncer = _RefreshDebouncer()
+
+
+class _RecomputeQueue:
+    """Rebuilds dirty or missing lists off the request path, at most one job per user at a time."""
+
+    def __init__(self):
+        self._pending: Set[int] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.RECOMMENDATION_RECOMPUTE_WORKERS,
+            thread_name_prefix="reco-recompute"
+        )
+
+    def submit(self, user_id: int):
+        with self._lock:
+            if user_id in self._pending:
+                return
+            self._pending.add(user_id)
+        self._executor.submit(self._run, user_id)
+
+    def _run(self, user_id: int):
+        db = SessionLocal()
+        try:
+            recompute_user(db, user_id)
+        except Exception as e:
+            db.rollback()
+            print(f"[RECOMMENDATIONS] Error recomputing cache for user {user_id}: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._pending.discard(user_id)
+
+
+_recompute_queue = _RecomputeQueue()
+
+
+def schedule_refresh(db: Session, user_id: int):
+    """
+    Mark a user's cache dirty now and refresh it once edits settle.
+    Call after committing a change to school, year, interests or verification.
+
+    Args:
+        db: Database session
+        user_id: ID of the user whose profile changed
+    """
+    mark_dirty(db, user_id)
+    db.commit()
+    _debouncer.schedule(user_id)
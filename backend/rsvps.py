@@ -0,0 +1,235 @@
+"""
+Event RSVPs, capacity with a FIFO waitlist, and the per-status attendee
+counters kept on each event. Counters are adjusted in the same statement as
+the RSVP row (a seat is claimed with a conditional counter update, not an
+event lock), so listing events needs no aggregation; reconcile() repairs drift.
+
+Usage:
+    python rsvps.py reconcile   # Recount every event's RSVP counters
+"""
+import sys
+from typing import List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Event
+
+# Statuses users can request; "waitlisted" is assigned when an event is full
+RSVP_STATUSES = ("going", "interested", "declined")
+
+# Serializes one user's RSVPs to one event (e.g. a double click), and nothing else: the
+# 64-bit key (event_id << 32 | user_id) is taken before _RSVP_SQL so its snapshot
+# sees the other request's committed row. Two-int advisory keys are a separate space.
+_RSVP_LOCK_SQL = text("SELECT pg_advisory_xact_lock((CAST(:event_id AS BIGINT) << 32) | :user_id)")
+
+# One statement per RSVP, without locking the event up front. Only the user's own
+# RSVP row is locked (so different users never wait on each other for it). A seat is
+# claimed with a conditional counter update that succeeds only while going_count is
+# below capacity; Postgres rechecks that condition against the latest row if a
+# concurrent RSVP got there first. Otherwise one update moves the other counters.
+# Lock order is always: own RSVP row, event row, then a new RSVP row's insert.
+# Waitlisted RSVPs keep their queue position.
+_RSVP_SQL = text("""
+    WITH previous AS (
+        SELECT rsvp_status FROM event_attendees
+        WHERE event_id = :event_id AND user_id = :user_id
+        FOR UPDATE
+    ),
+    request AS (
+        SELECT CAST(:status AS VARCHAR) AS status, (SELECT rsvp_status FROM previous) AS previous
+        FROM events
+        WHERE id = :event_id
+    ),
+    seat AS (
+        UPDATE events SET
+            going_count = going_count + 1,
+            interested_count = interested_count - (r.previous IS NOT DISTINCT FROM 'interested')::int,
+            declined_count = declined_count - (r.previous IS NOT DISTINCT FROM 'declined')::int,
+            waitlisted_count = waitlisted_count - (r.previous IS NOT DISTINCT FROM 'waitlisted')::int
+        FROM request r
+        WHERE events.id = :event_id
+          AND r.status = 'going' AND r.previous IS DISTINCT FROM 'going'
+          AND (events.max_attendees IS NULL OR events.going_count < events.max_attendees)
+        RETURNING events.id
+    ),
+    decision AS (
+        SELECT
+            CASE
+                WHEN r.status = 'going' AND r.previous IS DISTINCT FROM 'going'
+                     AND NOT EXISTS (SELECT 1 FROM seat) THEN 'waitlisted'
+                ELSE r.status
+            END AS status,
+            r.previous,
+            EXISTS (SELECT 1 FROM seat) AS seated
+        FROM request r
+    ),
+    counters AS (
+        UPDATE events SET
+            going_count = going_count
+                + (d.status = 'going')::int - (d.previous IS NOT DISTINCT FROM 'going')::int,
+            interested_count = interested_count
+                + (d.status = 'interested')::int - (d.previous IS NOT DISTINCT FROM 'interested')::int,
+            declined_count = declined_count
+                + (d.status = 'declined')::int - (d.previous IS NOT DISTINCT FROM 'declined')::int,
+            waitlisted_count = waitlisted_count
+                + (d.status = 'waitlisted')::int - (d.previous IS NOT DISTINCT FROM 'waitlisted')::int
+        FROM decision d
+        WHERE events.id = :event_id AND NOT d.seated AND d.status IS DISTINCT FROM d.previous
+        RETURNING events.id
+    ),
+    upsert AS (
+        -- Reading counters makes it run first, so a new RSVP row is always inserted after
+        -- the event row update (an unreferenced CTE would only run after the main query)
+        INSERT INTO event_attendees (event_id, user_id, rsvp_status, waitlisted_at)
+        SELECT :event_id, :user_id, d.status, CASE WHEN d.status = 'waitlisted' THEN now() END
+        FROM decision d
+        WHERE (SELECT count(*) FROM counters) >= 0
+        ON CONFLICT ON CONSTRAINT unique_event_attendee DO UPDATE
+        SET rsvp_status = EXCLUDED.rsvp_status,
+            waitlisted_at = CASE
+                WHEN EXCLUDED.rsvp_status <> 'waitlisted' THEN NULL
+                ELSE COALESCE(event_attendees.waitlisted_at, EXCLUDED.waitlisted_at)
+            END,
+            updated_at = now()
+        RETURNING event_attendees.id
+    )
+    SELECT d.status, d.previous FROM decision d, upsert u
+""")
+
+# Fill free seats from the waitlist, first come first served, and move the counters.
+# Runs only when seats free up. Waitlisted rows locked by an RSVP in flight are skipped
+# rather than waited for: that RSVP holds its own row and waits for the event row,
+# which this statement already holds.
+_PROMOTE_SQL = text("""
+    WITH event AS (
+        SELECT GREATEST(max_attendees - going_count, 0) AS seats
+        FROM events
+        WHERE id = :event_id AND max_attendees IS NOT NULL AND waitlisted_count > 0
+        FOR UPDATE
+    ),
+    promoted AS (
+        UPDATE event_attendees
+        SET rsvp_status = 'going', waitlisted_at = NULL, updated_at = now()
+        WHERE id IN (
+            SELECT id FROM event_attendees
+            WHERE event_id = :event_id AND rsvp_status = 'waitlisted'
+            ORDER BY waitlisted_at, id
+            LIMIT COALESCE((SELECT seats FROM event), 0)
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING user_id
+    ),
+    counters AS (
+        UPDATE events
+        SET going_count = going_count + (SELECT count(*) FROM promoted),
+            waitlisted_count = waitlisted_count - (SELECT count(*) FROM promoted)
+        WHERE id = :event_id AND EXISTS (SELECT 1 FROM promoted)
+    )
+    SELECT user_id FROM promoted
+""")
+
+
+def set_rsvp(db: Session, event_id: int, user_id: int, status: str) -> Optional[str]:
+    """
+    Record a user's RSVP, enforcing capacity (caller commits).
+    Asking to go to a full event puts the user on the waitlist; leaving the
+    going list promotes the longest-waiting users into the freed seats.
+    The event row is never locked up front: capacity is claimed with an atomic
+    conditional update, and the row is held only from that update to commit.
+    Concurrent RSVPs from the same user to the same event run one after another.
+
+    Args:
+        db: Database session
+        event_id: ID of the event
+        user_id: ID of the responding user
+        status: Requested status, one of RSVP_STATUSES
+
+    Returns:
+        The status actually stored ("waitlisted" if the event was full),
+        or None if the event does not exist
+    """
+    params = {"event_id": event_id, "user_id": user_id, "status": status}
+    db.execute(_RSVP_LOCK_SQL, params)
+    row = db.execute(_RSVP_SQL, params).first()
+    if row is None:
+        return None
+    if row.previous == "going" and row.status != "going":
+        promote_waitlist(db, event_id)
+    return row.status
+
+
+def promote_waitlist(db: Session, event_id: int) -> List[int]:
+    """
+    Move waitlisted users into free seats, first come first served (caller commits).
+
+    Args:
+        db: Database session
+        event_id: ID of the event, with any capacity change already flushed
+
+    Returns:
+        IDs of the promoted users
+    """
+    promoted = [row.user_id for row in db.execute(_PROMOTE_SQL, {"event_id": event_id})]
+    if promoted:
+        print(f"[RSVPS] Promoted {len(promoted)} waitlisted users for event {event_id}")
+    return promoted
+
+
+_RECOUNT_SQL = text("""
+    UPDATE events e
+    SET going_count = c.going, interested_count = c.interested,
+        declined_count = c.declined, waitlisted_count = c.waitlisted
+    FROM (
+        SELECT ev.id,
+               COUNT(a.id) FILTER (WHERE a.rsvp_status = 'going') AS going,
+               COUNT(a.id) FILTER (WHERE a.rsvp_status = 'interested') AS interested,
+               COUNT(a.id) FILTER (WHERE a.rsvp_status = 'declined') AS declined,
+               COUNT(a.id) FILTER (WHERE a.rsvp_status = 'waitlisted') AS waitlisted
+        FROM events ev
+        LEFT JOIN event_attendees a ON a.event_id = ev.id
+        WHERE ev.id = ANY(:ids)
+        GROUP BY ev.id
+    ) c
+    WHERE e.id = c.id
+      AND (e.going_count, e.interested_count, e.declined_count, e.waitlisted_count)
+          IS DISTINCT FROM (c.going, c.interested, c.declined, c.waitlisted)
+""")
+
+
+def reconcile(batch_size: int = 1000) -> int:
+    """
+    Recount RSVP counters from event_attendees and fix any that drifted.
+    Each batch of events is locked before it is counted, so RSVPs committed
+    concurrently are either included in the count or applied after it.
+
+    Args:
+        batch_size: Events locked and recounted per transaction
+
+    Returns:
+        Number of events whose counters were corrected
+    """
+    db = SessionLocal()
+    fixed = 0
+    try:
+        last_id = 0
+        while True:
+            ids = [row.id for row in db.query(Event.id).filter(
+                Event.id > last_id
+            ).order_by(Event.id).limit(batch_size).with_for_update().all()]
+            if not ids:
+                break
+            # A new statement sees every RSVP committed before the locks were granted
+            fixed += db.execute(_RECOUNT_SQL, {"ids": ids}).rowcount
+            db.commit()
+            last_id = ids[-1]
+    finally:
+        db.close()
+    print(f"[RSVPS] Reconciled counters; {fixed} events had drifted")
+    return fixed
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "reconcile":
+        reconcile()
+    else:
+        print(__doc__)
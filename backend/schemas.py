@@ -2,10 +2,13 @@
 Pydantic schemas for request/response validation.
 Defines the structure of API request and response bodies.
 """
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, EmailStr, constr, validator
 from typing import Optional, List
 from datetime import datetime
 
+# Interests and event tags; matches the interests.label column
+InterestLabel = constr(max_length=100)
+
 
 # User Schemas
 class UserBase(BaseModel):
@@ -14,7 +17,7 @@ class UserBase(BaseModel):
     name: str
     school: str
     year: str
-    interests: Optional[List[str]] = []
+    interests: Optional[List[InterestLabel]] = []
     height_cm: Optional[int] = None
     weight_kg: Optional[int] = None
     nationality: Optional[str] = None
@@ -50,7 +53,7 @@ class UserUpdate(BaseModel):
     name: Optional[str] = None
     school: Optional[str] = None
     year: Optional[str] = None
-    interests: Optional[List[str]] = None
+    interests: Optional[List[InterestLabel]] = None
     avatar_url: Optional[str] = None
     height_cm: Optional[int] = None
     weight_kg: Optional[int] = None
@@ -93,7 +96,7 @@ class UserRegisterStep2(BaseModel):
     name: str
     school: str
     year: str
-    interests: Optional[List[str]] = []
+    interests: Optional[List[InterestLabel]] = []
     height_cm: Optional[int] = None
     weight_kg: Optional[int] = None
     nationality: Optional[str] = None
@@ -137,6 +140,12 @@ class DateRequestResponse(BaseModel):
         from_attributes = True
 
 
+class DateRequestPage(BaseModel):
+    """Schema for one keyset page of date requests."""
+    items: List[DateRequestResponse]
+    next_cursor: Optional[str] = None
+
+
 class DateRequestUpdate(BaseModel):
     """Schema for updating date request status."""
     status: str  # 'accepted' or 'rejected'
@@ -155,7 +164,7 @@ class EventCreate(BaseModel):
     description: Optional[str] = None
     location: str
     event_time: datetime
-    tags: Optional[List[str]] = []
+    tags: Optional[List[InterestLabel]] = []
     max_attendees: Optional[int] = None
     image_url: Optional[str] = None
 
@@ -173,7 +182,11 @@ class EventResponse(BaseModel):
     image_url: Optional[str]
     created_at: datetime
     creator: UserResponse
-    attendee_count: Optional[int] = 0
+    attendee_count: Optional[int] = 0  # Same as going_count
+    going_count: int = 0
+    interested_count: int = 0
+    declined_count: int = 0
+    waitlisted_count: int = 0
     
     class Config:
         from_attributes = True
@@ -185,11 +198,23 @@ class EventUpdate(BaseModel):
     description: Optional[str] = None
     location: Optional[str] = None
     event_time: Optional[datetime] = None
-    tags: Optional[List[str]] = None
+    tags: Optional[List[InterestLabel]] = None
     max_attendees: Optional[int] = None
     image_url: Optional[str] = None
 
 
+class EventPage(BaseModel):
+    """Schema for one keyset page of events."""
+    items: List[EventResponse]
+    next_cursor: Optional[str] = None
+
+
+class TagFacet(BaseModel):
+    """Schema for an event tag and its number of upcoming events."""
+    tag: str
+    count: int
+
+
 # Event Attendee Schemas
 class EventRSVP(BaseModel):
     """Schema for RSVP to an event."""
@@ -215,7 +240,7 @@ class MessageResponse(BaseModel):
     sender_id: int
     receiver_id: int
     content: str
-    is_read: bool
+    is_read: bool  # Derived from the receiver's read cursor
     created_at: datetime
     sender: UserResponse
     receiver: UserResponse
@@ -224,6 +249,33 @@ class MessageResponse(BaseModel):
         from_attributes = True
 
 
+class MessagePage(BaseModel):
+    """Schema for one keyset page of messages."""
+    items: List[MessageResponse]
+    next_cursor: Optional[str] = None
+
+
+class ConversationReadUpdate(BaseModel):
+    """Schema for marking a conversation read."""
+    up_to_message_id: Optional[int] = None  # Latest message seen; None marks everything read
+
+
+class ConversationResponse(BaseModel):
+    """Schema for one conversation in the inbox."""
+    user: UserResponse  # The other participant
+    last_message_id: int
+    last_message: str
+    last_sender_id: int
+    last_message_at: datetime
+    unread_count: int  # Messages from user not yet read
+
+
+class ConversationPage(BaseModel):
+    """Schema for one keyset page of conversations."""
+    items: List[ConversationResponse]
+    next_cursor: Optional[str] = None
+
+
 # Match Schemas
 class MatchResponse(BaseModel):
     """Schema for match response."""
@@ -236,6 +288,12 @@ class MatchResponse(BaseModel):
     match_score: float
 
 
+class MatchPage(BaseModel):
+    """Schema for one page of browsed matches."""
+    items: List[MatchResponse]
+    next_cursor: Optional[str] = None  # Pass back to get the next page; None on the last page
+
+
 # Verification Schema
 class VerificationRequest(BaseModel):
     """Schema for email verification."""
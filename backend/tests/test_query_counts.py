@@ -0,0 +1,108 @@
+"""
+Query-count regression tests for list endpoints.
+A listing must run a fixed number of queries whatever its row count (no N+1).
+Needs a disposable Postgres database: TEST_DATABASE_URL=postgresql://... pytest tests
+"""
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+import pytest
+
+if not os.environ.get("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+os.environ["DATABASE_URL"] = os.environ["TEST_DATABASE_URL"]
+os.environ.setdefault("SECRET_KEY", "test-secret-key-" + "x" * 16)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from auth import create_access_token
+from database import SessionLocal, engine
+from models import DateRequest, Event, Message, User
+import main
+
+client = TestClient(main.app)
+
+
+class QueryCounter:
+    """Counts statements sent to the database while active."""
+
+    def __init__(self):
+        self.count = 0
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+
+
+def _make_user(db, label: str) -> User:
+    user = User(
+        email=f"{label}-{uuid.uuid4().hex[:12]}@usc.edu",
+        password_hash="x",
+        name=label,
+        school="USC",
+        year="Junior",
+        interests=[],
+        is_verified=True,
+        profile_completed=True
+    )
+    db.add(user)
+    db.flush()
+    return user
+
+
+@pytest.fixture
+def viewer():
+    db = SessionLocal()
+    try:
+        user = _make_user(db, "viewer")
+        db.commit()
+        yield user.id
+    finally:
+        db.close()
+
+
+def _add_rows(viewer_id: int, count: int):
+    """Add a date request and a message to the viewer and an event, each from a new user."""
+    db = SessionLocal()
+    try:
+        for i in range(count):
+            other = _make_user(db, f"other{i}")
+            db.add(DateRequest(sender_id=other.id, receiver_id=viewer_id, message="hi"))
+            db.add(Message(sender_id=other.id, receiver_id=viewer_id, content="hi"))
+            db.add(Event(
+                creator_id=other.id,
+                title=f"Event {i}",
+                location="Campus",
+                event_time=datetime.utcnow() + timedelta(days=i + 1)
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _count_queries(path: str, viewer_id: int) -> int:
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(viewer_id)})}"}
+    with QueryCounter() as counter:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+    return counter.count
+
+
+@pytest.mark.parametrize("path", ["/api/date-requests?limit=100", "/api/events?limit=100", "/api/messages?limit=100"])
+def test_list_query_count_is_constant(viewer, path):
+    _add_rows(viewer, 2)
+    few = _count_queries(path, viewer)
+
+    _add_rows(viewer, 10)
+    many = _count_queries(path, viewer)
+
+    assert many == few
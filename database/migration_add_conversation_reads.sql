@@ -0,0 +1,26 @@
+-- Migration: Per-conversation read cursors replacing messages.is_read
+
+CREATE TABLE IF NOT EXISTS conversation_reads (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE, -- The reader
+    other_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE, -- The partner
+    last_read_message_id INTEGER NOT NULL, -- Messages from other_id up to this ID are read
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, other_id)
+);
+
+-- Partners' cursors, for read receipts on the user's own messages
+CREATE INDEX IF NOT EXISTS ix_conversation_reads_other_id ON conversation_reads (other_id);
+
+-- Start each cursor at the newest message already marked read
+INSERT INTO conversation_reads (user_id, other_id, last_read_message_id)
+SELECT receiver_id, sender_id, max(id)
+FROM messages
+WHERE is_read
+GROUP BY receiver_id, sender_id
+ON CONFLICT (user_id, other_id) DO NOTHING;
+
+CREATE INDEX IF NOT EXISTS idx_messages_receiver_sender_id ON messages (receiver_id, sender_id, id);
+DROP INDEX IF EXISTS idx_messages_unread;
+
+-- Once every worker runs the cursor-based code, the old flag can go:
+-- ALTER TABLE messages DROP COLUMN is_read;
@@ -0,0 +1,24 @@
+-- Migration: One row per (user, partner) pointing at their latest message
+-- GET /api/conversations pages through these instead of every message the user has (backend/conversations.py)
+
+CREATE TABLE IF NOT EXISTS conversations (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE, -- The inbox owner
+    other_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE, -- The partner
+    last_message_id INTEGER NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    last_message_at TIMESTAMP NOT NULL, -- created_at of last_message_id
+    PRIMARY KEY (user_id, other_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_conversations_other_id ON conversations (other_id);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_last_message ON conversations (user_id, last_message_at, last_message_id);
+
+-- Backfill from existing messages, both directions
+INSERT INTO conversations (user_id, other_id, last_message_id, last_message_at)
+SELECT DISTINCT ON (user_id, other_id) user_id, other_id, id, created_at
+FROM (
+    SELECT sender_id AS user_id, receiver_id AS other_id, id, created_at FROM messages
+    UNION ALL
+    SELECT receiver_id AS user_id, sender_id AS other_id, id, created_at FROM messages
+) mine
+ORDER BY user_id, other_id, created_at DESC, id DESC
+ON CONFLICT (user_id, other_id) DO NOTHING;
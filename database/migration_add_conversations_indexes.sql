@@ -0,0 +1,5 @@
+-- Migration: Indexes behind GET /api/conversations (latest message and unread count per partner)
+
+CREATE INDEX IF NOT EXISTS idx_messages_sender_receiver_time ON messages (sender_id, receiver_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_receiver_sender_time ON messages (receiver_id, sender_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_unread ON messages (receiver_id, sender_id) WHERE NOT is_read;
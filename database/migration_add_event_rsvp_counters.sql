@@ -0,0 +1,19 @@
+-- Migration: Per-status RSVP counters on events
+-- Kept up to date by the RSVP endpoint; `python rsvps.py reconcile` recounts them if they drift
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS going_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE events ADD COLUMN IF NOT EXISTS interested_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE events ADD COLUMN IF NOT EXISTS declined_count INTEGER NOT NULL DEFAULT 0;
+
+-- Backfill from existing RSVPs
+UPDATE events e
+SET going_count = c.going, interested_count = c.interested, declined_count = c.declined
+FROM (
+    SELECT event_id,
+           COUNT(*) FILTER (WHERE rsvp_status = 'going') AS going,
+           COUNT(*) FILTER (WHERE rsvp_status = 'interested') AS interested,
+           COUNT(*) FILTER (WHERE rsvp_status = 'declined') AS declined
+    FROM event_attendees
+    GROUP BY event_id
+) c
+WHERE e.id = c.event_id;
@@ -0,0 +1,14 @@
+-- Migration: Per-(tag, day) event counts backing the tag facets endpoint
+-- Fill it afterwards with: python event_feed.py rebuild-tag-counts
+
+CREATE TABLE IF NOT EXISTS event_tag_counts (
+    tag_id INTEGER NOT NULL REFERENCES interests(id) ON DELETE CASCADE,
+    day DATE NOT NULL, -- UTC date of event_time
+    event_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (tag_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS ix_event_tag_counts_day ON event_tag_counts (day);
+
+-- Tag search (&& for any, @> for all); already present if migration_add_interest_vocabulary.sql ran
+CREATE INDEX IF NOT EXISTS idx_events_tag_ids_gin ON events USING GIN (tag_ids);
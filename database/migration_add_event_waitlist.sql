@@ -0,0 +1,9 @@
+-- Migration: Event capacity enforcement with a FIFO waitlist
+-- RSVPs to a full event are stored as 'waitlisted' and promoted in waitlisted_at order as seats free up
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS waitlisted_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE event_attendees ADD COLUMN IF NOT EXISTS waitlisted_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_event_attendees_waitlist
+    ON event_attendees (event_id, waitlisted_at)
+    WHERE rsvp_status = 'waitlisted';
@@ -0,0 +1,7 @@
+-- Migration: Upcoming-events feed with keyset pagination on (event_time, id)
+-- Run `python event_feed.py archive` periodically (e.g. hourly cron) to move past events out of the live index
+
+ALTER TABLE events ADD COLUMN IF NOT EXISTS archived BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_events_time_id ON events (event_time, id);
+CREATE INDEX IF NOT EXISTS idx_events_live_time_id ON events (event_time, id) WHERE NOT archived;
@@ -0,0 +1,4 @@
+-- Migration: MinHash signature of each user's interest IDs for LSH candidate generation
+-- Run `python interests.py backfill` afterwards; signatures are recomputed whenever interests change
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS interest_minhash BYTEA;
@@ -0,0 +1,24 @@
+-- Migration: Canonical interest vocabulary with integer IDs
+-- After running this, fill the new ID columns with: python interests.py backfill
+
+CREATE TABLE IF NOT EXISTS interests (
+    id SERIAL PRIMARY KEY,
+    slug VARCHAR(100) UNIQUE NOT NULL, -- Normalized lookup form
+    label VARCHAR(100) NOT NULL, -- Display form
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS interest_aliases (
+    alias VARCHAR(100) PRIMARY KEY, -- Normalized synonym
+    interest_id INTEGER NOT NULL REFERENCES interests(id) ON DELETE CASCADE
+);
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS interest_ids INTEGER[];
+ALTER TABLE events ADD COLUMN IF NOT EXISTS tag_ids INTEGER[];
+
+-- Interest overlap (&&, @>) on integer sets
+CREATE INDEX IF NOT EXISTS idx_users_interest_ids_gin ON users USING GIN (interest_ids);
+CREATE INDEX IF NOT EXISTS idx_events_tag_ids_gin ON events USING GIN (tag_ids);
+
+-- SQL-side match scoring now compares interest_ids, so the text[] index is unused
+DROP INDEX IF EXISTS idx_users_interests_gin;
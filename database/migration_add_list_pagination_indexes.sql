@@ -0,0 +1,6 @@
+-- Migration: Indexes for keyset pagination of list endpoints on (timestamp, id)
+-- Message threads use idx_messages_*_time from migration_add_conversations_indexes.sql;
+-- the events list uses idx_events_time_id from migration_add_events_feed.sql
+
+CREATE INDEX IF NOT EXISTS idx_date_requests_sender_time_id ON date_requests (sender_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_date_requests_receiver_time_id ON date_requests (receiver_id, created_at, id);
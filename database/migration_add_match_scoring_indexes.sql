@@ -0,0 +1,7 @@
+-- Migration: Indexes for SQL-side match scoring (MATCH_SCORING_MODE=sql)
+-- The candidate filter ORs interest overlap, school and year so Postgres can
+-- combine these indexes with a BitmapOr instead of scanning every user.
+-- Interest overlap uses idx_users_interest_ids_gin (migration_add_interest_vocabulary.sql).
+
+CREATE INDEX IF NOT EXISTS idx_users_year ON users(year);
+CREATE INDEX IF NOT EXISTS idx_users_school ON users(school);
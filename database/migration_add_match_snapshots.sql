@@ -0,0 +1,14 @@
+-- Migration: Ranked match snapshots for cursor pagination (/api/matches/browse)
+-- Rows expire after MATCH_SNAPSHOT_TTL_SECONDS and are pruned as new snapshots are created
+
+CREATE TABLE IF NOT EXISTS match_snapshots (
+    id VARCHAR(32) PRIMARY KEY, -- Random token embedded in cursors
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    use_ai BOOLEAN DEFAULT FALSE,
+    candidate_ids INTEGER[] NOT NULL, -- In rank order
+    scores FLOAT[] NOT NULL, -- Parallel to candidate_ids
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_match_snapshots_user_id ON match_snapshots(user_id);
+CREATE INDEX IF NOT EXISTS idx_match_snapshots_created_at ON match_snapshots(created_at);
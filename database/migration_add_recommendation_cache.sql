@@ -0,0 +1,13 @@
+-- Migration: Use the matches table as a per-user top-K recommendation cache
+-- Rows are directed: user1_id is the viewer, user2_id the recommended user
+
+CREATE TABLE IF NOT EXISTS recommendation_state (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    size INTEGER DEFAULT 0, -- Number of cached rows
+    min_score FLOAT, -- Score of the lowest cached row (K-th best)
+    dirty BOOLEAN DEFAULT FALSE, -- True until the list is recomputed
+    computed_at TIMESTAMP
+);
+
+-- Serve a user's cached list in rank order
+CREATE INDEX IF NOT EXISTS idx_matches_user1_score ON matches(user1_id, match_score DESC);
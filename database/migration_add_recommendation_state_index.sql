@@ -0,0 +1,3 @@
+-- Migration: Lets incremental recommendation refreshes skip lists a changed profile cannot enter
+
+CREATE INDEX IF NOT EXISTS idx_recommendation_state_min_score ON recommendation_state (min_score) WHERE NOT dirty;
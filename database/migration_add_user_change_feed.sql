@@ -0,0 +1,40 @@
+-- Migration: NOTIFY user_changes when matching-relevant user data changes
+-- Each worker LISTENs and updates its in-memory LSH and ANN indexes (backend/change_feed.py)
+
+CREATE OR REPLACE FUNCTION notify_user_change() RETURNS trigger AS $$
+DECLARE
+    changed_id INTEGER;
+BEGIN
+    IF TG_TABLE_NAME = 'users' THEN
+        changed_id := COALESCE(NEW.id, OLD.id);
+    ELSE
+        changed_id := COALESCE(NEW.user_id, OLD.user_id);
+    END IF;
+    PERFORM pg_notify('user_changes', json_build_object('table', TG_TABLE_NAME, 'op', TG_OP, 'id', changed_id)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_notify_insert_delete ON users;
+CREATE TRIGGER users_notify_insert_delete
+    AFTER INSERT OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_user_change();
+
+-- Only fields the matching indexes read; other profile edits stay quiet
+DROP TRIGGER IF EXISTS users_notify_update ON users;
+CREATE TRIGGER users_notify_update
+    AFTER UPDATE ON users
+    FOR EACH ROW
+    WHEN (
+        OLD.is_verified IS DISTINCT FROM NEW.is_verified
+        OR OLD.school IS DISTINCT FROM NEW.school
+        OR OLD.year IS DISTINCT FROM NEW.year
+        OR OLD.interest_ids IS DISTINCT FROM NEW.interest_ids
+        OR OLD.interest_minhash IS DISTINCT FROM NEW.interest_minhash
+    )
+    EXECUTE FUNCTION notify_user_change();
+
+DROP TRIGGER IF EXISTS user_embeddings_notify ON user_embeddings;
+CREATE TRIGGER user_embeddings_notify
+    AFTER INSERT OR UPDATE OR DELETE ON user_embeddings
+    FOR EACH ROW EXECUTE FUNCTION notify_user_change();
@@ -0,0 +1,10 @@
+-- Migration: Add persistent profile embeddings for AI matching
+-- Each profile is embedded once and re-embedded only when its text hash changes
+
+CREATE TABLE IF NOT EXISTS user_embeddings (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    text_hash VARCHAR(64) NOT NULL, -- SHA-256 of model name + profile text
+    model VARCHAR(100) NOT NULL,
+    embedding BYTEA NOT NULL, -- Unit-normalized float32 vector
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
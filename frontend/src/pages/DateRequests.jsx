@@ -2,12 +2,15 @@ import { useState, useEffect } from 'react'
 import { useSearchParams } from 'react-router-dom'
 import { useAuth } from '../contexts/AuthContext'
 import api from '../services/api'
+import { connectSocket } from '../services/socket'
 
 export default function DateRequests() {
   const { user } = useAuth()
   const [searchParams] = useSearchParams()
   const [requests, setRequests] = useState([])
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [showForm, setShowForm] = useState(false)
   const [formData, setFormData] = useState({
     receiver_id: '',
@@ -25,12 +28,23 @@ export default function DateRequests() {
     }
   }, [statusFilter])
 
+  // Accepted/rejected requests are pushed by the server
+  useEffect(() => {
+    const socket = connectSocket()
+    socket.on('date_request', (updated) => {
+      setRequests((current) => current.map((request) => (request.id === updated.id ? updated : request)))
+    })
+    socket.on('resync', () => fetchRequests())
+    return () => socket.disconnect()
+  }, [statusFilter])
+
   const fetchRequests = async () => {
     try {
       setLoading(true)
       const params = statusFilter ? { status_filter: statusFilter } : {}
-      const response = await api.get('/api/date-requests', { params })
-      setRequests(response.data)
+      const response = await api.get('/api/date-requests', { params: { ...params, limit: 20 } })
+      setRequests(response.data.items)
+      setNextCursor(response.data.next_cursor)
     } catch (error) {
       console.error('Failed to fetch date requests:', error)
     } finally {
@@ -38,6 +52,22 @@ export default function DateRequests() {
     }
   }
 
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true)
+      const params = statusFilter ? { status_filter: statusFilter } : {}
+      const response = await api.get('/api/date-requests', {
+        params: { ...params, limit: 20, cursor: nextCursor },
+      })
+      setRequests((current) => [...current, ...response.data.items])
+      setNextCursor(response.data.next_cursor)
+    } catch (error) {
+      console.error('Failed to load more date requests:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleSubmit = async (e) => {
     e.preventDefault()
     try {
@@ -189,6 +219,18 @@ export default function DateRequests() {
           })}
         </div>
       )}
+
+      {nextCursor && (
+        <div className="text-center mt-8">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="bg-white hover:bg-gray-50 border border-gray-300 text-gray-700 py-2 px-6 rounded-md text-sm font-medium disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   )
 }
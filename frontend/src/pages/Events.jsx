@@ -1,11 +1,18 @@
 import { useState, useEffect } from 'react'
 import { useAuth } from '../contexts/AuthContext'
 import api from '../services/api'
+import { connectSocket } from '../services/socket'
 
 export default function Events() {
   const { user } = useAuth()
   const [events, setEvents] = useState([])
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const [facets, setFacets] = useState([])
+  const [recommended, setRecommended] = useState([])
+  const [selectedTags, setSelectedTags] = useState([])
+  const [matchAll, setMatchAll] = useState(false)
   const [showForm, setShowForm] = useState(false)
   const [formData, setFormData] = useState({
     title: '',
@@ -18,14 +25,66 @@ export default function Events() {
   })
 
   useEffect(() => {
-    fetchEvents()
+    fetchFacets()
+    fetchRecommended()
+  }, [])
+
+  // Live RSVP counts for events we created or responded to
+  useEffect(() => {
+    const socket = connectSocket()
+    socket.on('rsvp', ({ event_id, going_count, interested_count, declined_count, waitlisted_count }) => {
+      setEvents((current) =>
+        current.map((event) =>
+          event.id === event_id
+            ? { ...event, going_count, interested_count, declined_count, waitlisted_count, attendee_count: going_count }
+            : event
+        )
+      )
+    })
+    return () => socket.disconnect()
   }, [])
 
+  useEffect(() => {
+    fetchEvents()
+  }, [selectedTags, matchAll])
+
+  // FastAPI expects repeated keys (tags=a&tags=b) rather than tags[]=a
+  const feedRequest = (params) =>
+    api.get('/api/events/feed', {
+      params: { limit: 20, tags: selectedTags, tag_match: matchAll ? 'all' : 'any', ...params },
+      paramsSerializer: { indexes: null },
+    })
+
+  const fetchFacets = async () => {
+    try {
+      const response = await api.get('/api/events/facets')
+      setFacets(response.data)
+    } catch (error) {
+      console.error('Failed to fetch tags:', error)
+    }
+  }
+
+  const fetchRecommended = async () => {
+    try {
+      const response = await api.get('/api/events/recommended', { params: { limit: 3 } })
+      setRecommended(response.data)
+    } catch (error) {
+      console.error('Failed to fetch recommended events:', error)
+    }
+  }
+
+  const toggleTag = (tag) => {
+    setSelectedTags((current) =>
+      current.includes(tag) ? current.filter((t) => t !== tag) : [...current, tag]
+    )
+  }
+
   const fetchEvents = async () => {
     try {
       setLoading(true)
-      const response = await api.get('/api/events')
-      setEvents(response.data)
+      const response = await feedRequest({})
+      setEvents(response.data.items)
+      setNextCursor(response.data.next_cursor)
     } catch (error) {
       console.error('Failed to fetch events:', error)
     } finally {
@@ -33,6 +92,19 @@ export default function Events() {
     }
   }
 
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true)
+      const response = await feedRequest({ cursor: nextCursor })
+      setEvents((current) => [...current, ...response.data.items])
+      setNextCursor(response.data.next_cursor)
+    } catch (error) {
+      console.error('Failed to load more events:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleSubmit = async (e) => {
     e.preventDefault()
     try {
@@ -58,6 +130,7 @@ export default function Events() {
         image_url: '',
       })
       fetchEvents()
+      fetchFacets()
     } catch (error) {
       alert(error.response?.data?.detail || 'Failed to create event')
     }
@@ -65,8 +138,12 @@ export default function Events() {
 
   const handleRSVP = async (eventId, status) => {
     try {
-      await api.post(`/api/events/${eventId}/rsvp`, { rsvp_status: status })
+      const response = await api.post(`/api/events/${eventId}/rsvp`, { rsvp_status: status })
+      if (response.data.rsvp_status === 'waitlisted') {
+        alert(response.data.message)
+      }
       fetchEvents()
+      fetchRecommended()
     } catch (error) {
       alert(error.response?.data?.detail || 'Failed to RSVP')
     }
@@ -169,8 +246,54 @@ export default function Events() {
         </div>
       )}
 
+      {recommended.length > 0 && (
+        <div className="bg-indigo-50 rounded-lg p-4 mb-6">
+          <h2 className="text-lg font-semibold text-indigo-900 mb-2">Recommended for you</h2>
+          <ul className="space-y-1">
+            {recommended.map((event) => (
+              <li key={event.id} className="text-sm text-indigo-800">
+                <span className="font-medium">{event.title}</span>
+                {' · '}
+                {new Date(event.event_time).toLocaleString()}
+                {' · '}
+                {event.location}
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
+
+      {facets.length > 0 && (
+        <div className="flex flex-wrap items-center gap-2 mb-6">
+          {facets.map((facet) => (
+            <button
+              key={facet.tag}
+              onClick={() => toggleTag(facet.tag)}
+              className={`px-3 py-1 rounded-full text-sm ${
+                selectedTags.includes(facet.tag)
+                  ? 'bg-indigo-600 text-white'
+                  : 'bg-indigo-100 text-indigo-800 hover:bg-indigo-200'
+              }`}
+            >
+              {facet.tag} ({facet.count})
+            </button>
+          ))}
+          {selectedTags.length > 1 && (
+            <label className="flex items-center text-sm text-gray-700 ml-2">
+              <input
+                type="checkbox"
+                checked={matchAll}
+                onChange={(e) => setMatchAll(e.target.checked)}
+                className="mr-1"
+              />
+              Match all tags
+            </label>
+          )}
+        </div>
+      )}
+
       {events.length === 0 ? (
-        <div className="text-center py-12 text-gray-500">No events found</div>
+        <div className="text-center py-12 text-gray-500">No upcoming events</div>
       ) : (
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
           {events.map((event) => (
@@ -194,6 +317,16 @@ export default function Events() {
                     <span className="font-medium">Attendees:</span> {event.attendee_count || 0}
                     {event.max_attendees && ` / ${event.max_attendees}`}
                   </p>
+                  {event.waitlisted_count > 0 && (
+                    <p className="text-sm">
+                      <span className="font-medium">Waitlist:</span> {event.waitlisted_count}
+                    </p>
+                  )}
+                  {event.interested_count > 0 && (
+                    <p className="text-sm">
+                      <span className="font-medium">Interested:</span> {event.interested_count}
+                    </p>
+                  )}
                 </div>
                 {event.tags && event.tags.length > 0 && (
                   <div className="flex flex-wrap gap-2 mb-4">
@@ -232,6 +365,18 @@ export default function Events() {
           ))}
         </div>
       )}
+
+      {nextCursor && (
+        <div className="text-center mt-8">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="bg-white hover:bg-gray-50 border border-gray-300 text-gray-700 py-2 px-6 rounded-md text-sm font-medium disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   )
 }
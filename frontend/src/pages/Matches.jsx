@@ -6,6 +6,8 @@ export default function Matches() {
   const [matches, setMatches] = useState([])
   const [loading, setLoading] = useState(true)
   const [useAI, setUseAI] = useState(false)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   useEffect(() => {
     fetchMatches()
@@ -14,10 +16,11 @@ export default function Matches() {
   const fetchMatches = async () => {
     try {
       setLoading(true)
-      const response = await api.get('/api/matches', {
+      const response = await api.get('/api/matches/browse', {
         params: { limit: 20, use_ai: useAI },
       })
-      setMatches(response.data)
+      setMatches(response.data.items)
+      setNextCursor(response.data.next_cursor)
     } catch (error) {
       console.error('Failed to fetch matches:', error)
     } finally {
@@ -25,6 +28,26 @@ export default function Matches() {
     }
   }
 
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true)
+      const response = await api.get('/api/matches/browse', {
+        params: { limit: 20, cursor: nextCursor },
+      })
+      setMatches((current) => [...current, ...response.data.items])
+      setNextCursor(response.data.next_cursor)
+    } catch (error) {
+      if (error.response?.status === 400) {
+        // Snapshot expired; start over from a fresh ranking
+        fetchMatches()
+      } else {
+        console.error('Failed to load more matches:', error)
+      }
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   if (loading) {
     return <div className="text-center py-12">Loading matches...</div>
   }
@@ -128,6 +151,18 @@ export default function Matches() {
           ))}
         </div>
       )}
+
+      {nextCursor && (
+        <div className="text-center mt-8">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="bg-white hover:bg-gray-50 border border-gray-300 text-gray-700 py-2 px-6 rounded-md text-sm font-medium disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   )
 }
@@ -2,16 +2,20 @@ import { useState, useEffect, useRef } from 'react'
 import { useSearchParams } from 'react-router-dom'
 import { useAuth } from '../contexts/AuthContext'
 import api from '../services/api'
+import { connectSocket } from '../services/socket'
 
 export default function Messages() {
   const { user } = useAuth()
   const [searchParams] = useSearchParams()
   const [conversations, setConversations] = useState([])
+  const [conversationsCursor, setConversationsCursor] = useState(null)
   const [messages, setMessages] = useState([])
+  const [messagesCursor, setMessagesCursor] = useState(null)
   const [selectedUser, setSelectedUser] = useState(null)
   const [newMessage, setNewMessage] = useState('')
   const [loading, setLoading] = useState(true)
   const messagesEndRef = useRef(null)
+  const selectedUserRef = useRef(null)
 
   useEffect(() => {
     fetchConversations()
@@ -22,14 +26,47 @@ export default function Messages() {
   }, [])
 
   useEffect(() => {
+    selectedUserRef.current = selectedUser
     if (selectedUser) {
       fetchMessages(selectedUser)
     }
   }, [selectedUser])
 
+  // Messages and read receipts are pushed by the server instead of polled
+  useEffect(() => {
+    if (!user) return
+    const socket = connectSocket()
+    socket.on('message', (msg) => {
+      const otherUserId = msg.sender_id === user.id ? msg.receiver_id : msg.sender_id
+      if (otherUserId === selectedUserRef.current) {
+        setMessages((prev) => (prev.some((m) => m.id === msg.id) ? prev : [...prev, msg]))
+        if (msg.receiver_id === user.id) {
+          api.put(`/api/conversations/${otherUserId}/read`, { up_to_message_id: msg.id })
+        }
+      }
+      fetchConversations()
+    })
+    // The partner read our messages up to last_read_message_id
+    socket.on('conversation_read', ({ user_id, last_read_message_id }) => {
+      if (user_id !== selectedUserRef.current) return
+      setMessages((prev) =>
+        prev.map((m) =>
+          m.sender_id === user.id && m.id <= last_read_message_id ? { ...m, is_read: true } : m
+        )
+      )
+    })
+    // Pushes may have been missed (or were too large to push); refetch
+    socket.on('resync', () => {
+      fetchConversations()
+      if (selectedUserRef.current) fetchMessages(selectedUserRef.current)
+    })
+    return () => socket.disconnect()
+  }, [user?.id])
+
+  // Only when a newer message arrives, not when older ones are loaded
   useEffect(() => {
     scrollToBottom()
-  }, [messages])
+  }, [messages[messages.length - 1]?.id])
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
@@ -37,28 +74,10 @@ export default function Messages() {
 
   const fetchConversations = async () => {
     try {
-      const response = await api.get('/api/messages')
-      // Group messages by other user
-      const userMap = new Map()
-      response.data.forEach((msg) => {
-        const otherUser = msg.sender_id === user?.id ? msg.receiver : msg.sender
-        if (!userMap.has(otherUser.id)) {
-          userMap.set(otherUser.id, {
-            user: otherUser,
-            lastMessage: msg,
-            unread: msg.receiver_id === user?.id && !msg.is_read,
-          })
-        } else {
-          const existing = userMap.get(otherUser.id)
-          if (new Date(msg.created_at) > new Date(existing.lastMessage.created_at)) {
-            existing.lastMessage = msg
-          }
-          if (msg.receiver_id === user?.id && !msg.is_read) {
-            existing.unread = true
-          }
-        }
-      })
-      setConversations(Array.from(userMap.values()))
+      // One row per conversation partner, most recent first
+      const response = await api.get('/api/conversations', { params: { limit: 20 } })
+      setConversations(response.data.items)
+      setConversationsCursor(response.data.next_cursor)
     } catch (error) {
       console.error('Failed to fetch conversations:', error)
     } finally {
@@ -66,35 +85,66 @@ export default function Messages() {
     }
   }
 
+  const loadMoreConversations = async () => {
+    try {
+      const response = await api.get('/api/conversations', {
+        params: { limit: 20, cursor: conversationsCursor },
+      })
+      setConversations((current) => [...current, ...response.data.items])
+      setConversationsCursor(response.data.next_cursor)
+    } catch (error) {
+      console.error('Failed to load more conversations:', error)
+    }
+  }
+
   const fetchMessages = async (otherUserId) => {
     try {
+      // Newest page first; shown oldest to newest
       const response = await api.get('/api/messages', {
-        params: { other_user_id: otherUserId },
-      })
-      setMessages(response.data)
-      // Mark messages as read
-      response.data.forEach((msg) => {
-        if (msg.receiver_id === user?.id && !msg.is_read) {
-          api.put(`/api/messages/${msg.id}/read`)
-        }
+        params: { other_user_id: otherUserId, limit: 50 },
       })
+      const page = [...response.data.items].reverse()
+      setMessages(page)
+      setMessagesCursor(response.data.next_cursor)
+      // Mark the whole thread read with one call
+      const unread = page.filter((msg) => msg.receiver_id === user?.id && !msg.is_read)
+      if (unread.length > 0) {
+        api.put(`/api/conversations/${otherUserId}/read`, {
+          up_to_message_id: unread[unread.length - 1].id,
+        })
+      }
+      setConversations((prev) =>
+        prev.map((c) => (c.user.id === otherUserId ? { ...c, unread_count: 0 } : c))
+      )
     } catch (error) {
       console.error('Failed to fetch messages:', error)
     }
   }
 
+  const loadOlderMessages = async () => {
+    try {
+      const response = await api.get('/api/messages', {
+        params: { other_user_id: selectedUser, limit: 50, cursor: messagesCursor },
+      })
+      setMessages((current) => [...[...response.data.items].reverse(), ...current])
+      setMessagesCursor(response.data.next_cursor)
+    } catch (error) {
+      console.error('Failed to load older messages:', error)
+    }
+  }
+
   const sendMessage = async (e) => {
     e.preventDefault()
     if (!newMessage.trim() || !selectedUser) return
 
     try {
-      await api.post('/api/messages', {
+      const response = await api.post('/api/messages', {
         receiver_id: selectedUser,
         content: newMessage,
       })
       setNewMessage('')
-      fetchMessages(selectedUser)
-      fetchConversations()
+      // The socket may have delivered it already
+      setMessages((prev) => (prev.some((m) => m.id === response.data.id) ? prev : [...prev, response.data]))
     } catch (error) {
       alert(error.response?.data?.detail || 'Failed to send message')
     }
@@ -142,17 +192,27 @@ export default function Messages() {
                   <div className="flex-1 min-w-0">
                     <div className="flex items-center justify-between">
                       <p className="text-sm font-medium text-gray-900">{conv.user.name}</p>
-                      {conv.unread && (
-                        <span className="w-2 h-2 bg-indigo-600 rounded-full"></span>
+                      {conv.unread_count > 0 && (
+                        <span className="px-2 text-xs text-white bg-indigo-600 rounded-full">
+                          {conv.unread_count}
+                        </span>
                       )}
                     </div>
                     <p className="text-sm text-gray-500 truncate">
-                      {conv.lastMessage.content}
+                      {conv.last_message}
                     </p>
                   </div>
                 </div>
               </div>
             ))}
+            {conversationsCursor && (
+              <button
+                onClick={loadMoreConversations}
+                className="w-full p-3 text-sm text-indigo-600 hover:bg-gray-50"
+              >
+                Load more
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -167,6 +227,16 @@ export default function Messages() {
               </h3>
             </div>
             <div className="flex-1 overflow-y-auto p-4 space-y-4">
+              {messagesCursor && (
+                <div className="text-center">
+                  <button
+                    onClick={loadOlderMessages}
+                    className="text-sm text-indigo-600 hover:text-indigo-800"
+                  >
+                    Load older messages
+                  </button>
+                </div>
+              )}
               {messages.map((msg) => {
                 const isOwn = msg.sender_id === user?.id
                 return (
@@ -0,0 +1,11 @@
+import { io } from 'socket.io-client'
+import api from './api'
+
+// Socket.IO connection for real-time updates (new messages, read receipts).
+// The server disconnects sockets once their token expires; reconnects read the current token.
+export function connectSocket() {
+  return io(api.defaults.baseURL, {
+    path: '/ws/socket.io',
+    auth: (cb) => cb({ token: localStorage.getItem('token') }),
+  })
+}